@@ -32,6 +32,7 @@ class AttachmentViewSet(viewsets.ModelViewSet):
     queryset = Attachment.objects.all()
     serializer_class = AttachmentSerializer
     permission_classes = [IsAuthenticated]
+    keyset_ordering = ('-uploaded_at', '-id')
 
 
 class DigitalWalletViewSet(viewsets.ModelViewSet):
@@ -1,32 +1,61 @@
 from urllib.parse import parse_qs
 from channels.db import database_sync_to_async
-from rest_framework_simplejwt.tokens import UntypedToken
-from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+from rest_framework_simplejwt.exceptions import TokenError
 from django.contrib.auth.models import AnonymousUser
 from channels.middleware import BaseMiddleware
 from django.conf import settings
-from jwt import decode as jwt_decode
+from utils.ttl_cache import TTLCache
+import time
+
+# Claims of tokens already verified in this process, kept until the token expires.
+verified_tokens = TTLCache(settings.WS_TOKEN_CACHE_SIZE, ttl=api_settings.ACCESS_TOKEN_LIFETIME.total_seconds())
+# Users by id for WebSocket scopes; accounts.signals drops an entry when the user changes.
+cached_users = TTLCache(settings.WS_AUTH_CACHE_SIZE, ttl=settings.WS_AUTH_CACHE_TTL)
+
+def verify_token(token):
+    """
+    Return the claims of a valid access token, or None.
+
+    The signature, expiry and token type are checked in a single decode, and
+    the claims of a good token are remembered until it expires, so a client
+    reconnecting with the same token is not verified again.
+    """
+    claims = verified_tokens.get(token)
+    if claims is not None:
+        return claims
+    try:
+        claims = AccessToken(token).payload
+    except TokenError:
+        return None
+    verified_tokens.set(token, claims, ttl=claims['exp'] - time.time())
+    return claims
 
 @database_sync_to_async
-def get_user(user_id):
+def load_user(user_id):
     from .models import CustomUser
     try:
         return CustomUser.objects.get(id=user_id)
     except CustomUser.DoesNotExist:
+        return None
+
+async def get_user(user_id):
+    from .models import CustomUser
+    # Tokens carry the id as a string; key the cache by the pk itself so accounts.signals can evict it.
+    user_id = CustomUser._meta.pk.to_python(user_id)
+    user = await cached_users.get_or_load(user_id, lambda: load_user(user_id))
+    if user is None or not user.is_active:
         return AnonymousUser()
+    return user
 
 class JwtAuthMiddleware(BaseMiddleware):
     async def __call__(self, scope, receive, send):
         query_string = scope['query_string'].decode()
         token_param = parse_qs(query_string).get('token')
-        if token_param:
-            token = token_param[0]
-            try:
-                UntypedToken(token)
-                decoded_data = jwt_decode(token, settings.SIMPLE_JWT['SIGNING_KEY'], algorithms=[settings.SIMPLE_JWT['ALGORITHM']])
-                scope['user'] = await get_user(decoded_data['user_id'])
-            except (InvalidToken, TokenError):
-                scope['user'] = AnonymousUser()
+        claims = verify_token(token_param[0]) if token_param else None
+        if claims is not None and api_settings.USER_ID_CLAIM in claims:
+            scope['user'] = await get_user(claims[api_settings.USER_ID_CLAIM])
         else:
             scope['user'] = AnonymousUser()
         return await super().__call__(scope, receive, send)
\ No newline at end of file
@@ -1,3 +1,75 @@
-from django.test import TestCase
+from accounts import middleware
+from accounts.middleware import JwtAuthMiddleware, cached_users, verified_tokens
+from accounts.models import CustomUser
+from channels.db import database_sync_to_async
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from communications import membership
+from communications.membership import conversation_members
+from communications.models import Conversation, ConversationParticipant
+from communications.routing import websocket_urlpatterns
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+from unittest import mock
+from utils.testing import ServiceTransactionTestCase
+import asyncio
+import time
 
-# Create your tests here.
+
+class WebsocketAuthTests(ServiceTransactionTestCase):
+    USERS = 50
+    CONNECTS = 2000
+
+    def setUp(self):
+        super().setUp()
+        for cache in (verified_tokens, cached_users, conversation_members):
+            cache.clear()
+        self.application = JwtAuthMiddleware(URLRouter(websocket_urlpatterns))
+        self.conversation = Conversation.objects.create(title='Co-op')
+        # Without passwords: hashing fifty of them costs more than the storm itself.
+        self.users = CustomUser.objects.bulk_create(
+            CustomUser(username=f'member{n}', email=f'member{n}@example.com') for n in range(self.USERS)
+        )
+        for user in self.users:
+            ConversationParticipant.objects.create(conversation=self.conversation, user=user)
+        self.tokens = [str(AccessToken.for_user(user)) for user in self.users]
+
+    async def connect(self, token):
+        communicator = WebsocketCommunicator(self.application, f'/ws/chat/{self.conversation.id}/?token={token}')
+        connected, _ = await communicator.connect(timeout=30)
+        return communicator, connected
+
+    async def test_connect_storm_loads_each_user_and_member_set_once(self):
+        decode = mock.Mock(wraps=AccessToken)
+        load_user = mock.Mock(wraps=middleware.load_user)
+        load_members = mock.Mock(wraps=membership.load_members)
+        with mock.patch.object(middleware, 'AccessToken', decode), \
+                mock.patch.object(middleware, 'load_user', load_user), \
+                mock.patch.object(membership, 'load_members', load_members):
+            started = time.monotonic()
+            results = await asyncio.gather(*(
+                self.connect(self.tokens[n % self.USERS]) for n in range(self.CONNECTS)
+            ))
+            elapsed = time.monotonic() - started
+            await asyncio.gather(*(communicator.disconnect() for communicator, _ in results))
+
+        self.assertTrue(all(connected for _, connected in results))
+        self.assertEqual(decode.call_count, self.USERS)
+        self.assertEqual(load_user.call_count, self.USERS)
+        self.assertEqual(load_members.call_count, 1)
+        # 2000 connects took about 6000 queries and 8s before the caches; the
+        # bound leaves room for slow machines.
+        self.assertLess(elapsed, 20)
+
+    async def test_refresh_token_is_refused(self):
+        communicator, connected = await self.connect(str(RefreshToken.for_user(self.users[0])))
+        self.assertFalse(connected)
+
+    async def test_deactivated_user_is_refused(self):
+        communicator, connected = await self.connect(self.tokens[0])
+        self.assertTrue(connected)
+        await communicator.disconnect()
+        user = self.users[0]
+        user.is_active = False
+        await database_sync_to_async(user.save)()
+        communicator, connected = await self.connect(self.tokens[0])
+        self.assertFalse(connected)
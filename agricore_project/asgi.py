@@ -5,6 +5,7 @@ from channels.routing import ProtocolTypeRouter, URLRouter
 from channels.security.websocket import WebsocketDenier
 from accounts.middleware import JwtAuthMiddleware
 from communications.routing import websocket_urlpatterns
+from farms.routing import websocket_urlpatterns as farm_websocket_urlpatterns
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'agricore_project.settings')
 
@@ -13,6 +14,6 @@ django_asgi_app = get_asgi_application()
 application = ProtocolTypeRouter({
     "http": django_asgi_app,
     "websocket": JwtAuthMiddleware(
-        URLRouter(websocket_urlpatterns)
+        URLRouter(websocket_urlpatterns + farm_websocket_urlpatterns)
     ),
 })
\ No newline at end of file
@@ -80,8 +80,41 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'utils.request_logging.RequestLoggingMiddleware',
 ]
 
+# ==================== LOGGING ====================
+# Request logs are sampled, formatted lazily as JSON and written from a background
+# thread; payloads are off by default and truncated to REQUEST_LOG_MAX_PAYLOAD chars.
+REQUEST_LOG_SAMPLE_RATE = env.float('REQUEST_LOG_SAMPLE_RATE', default=0.01)
+REQUEST_LOG_PAYLOADS = env.bool('REQUEST_LOG_PAYLOADS', default=False)
+REQUEST_LOG_MAX_PAYLOAD = env.int('REQUEST_LOG_MAX_PAYLOAD', default=1024)
+REQUEST_LOG_QUEUE_SIZE = env.int('REQUEST_LOG_QUEUE_SIZE', default=10000)
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'json': {
+            '()': 'utils.request_logging.JSONFormatter',
+        },
+    },
+    'handlers': {
+        'requests': {
+            '()': 'utils.request_logging.AsyncStreamHandler',
+            'queue_size': REQUEST_LOG_QUEUE_SIZE,
+            'formatter': 'json',
+        },
+    },
+    'loggers': {
+        'agricore.requests': {
+            'handlers': ['requests'],
+            'level': env('REQUEST_LOG_LEVEL', default='INFO'),
+            'propagate': False,
+        },
+    },
+}
+
 # ==================== URLS & ASGI/WSGI ====================
 ROOT_URLCONF = 'agricore_project.urls'
 WSGI_APPLICATION = 'agricore_project.wsgi.application'
@@ -109,6 +142,11 @@ STATIC_URL = '/static/'
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+# Generated files (reports, exports) go to Supabase Storage, or under MEDIA_ROOT with 'local'.
+FILE_STORAGE_BACKEND = env('FILE_STORAGE_BACKEND', default='supabase')
+FILE_STORAGE_LOCAL_ROOT = env('FILE_STORAGE_LOCAL_ROOT', default=str(MEDIA_ROOT))
+# Private buckets (reports) with 'local'; never served as media, only through signed URLs.
+FILE_STORAGE_PRIVATE_ROOT = env('FILE_STORAGE_PRIVATE_ROOT', default=str(BASE_DIR / 'private'))
 
 # ==================== AUTH & JWT ====================
 AUTH_USER_MODEL = 'accounts.CustomUser'
@@ -120,6 +158,8 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    'DEFAULT_PAGINATION_CLASS': 'utils.pagination.KeysetPagination',
+    'PAGE_SIZE': env.int('API_PAGE_SIZE', default=50),
 }
 
 SIMPLE_JWT = {
@@ -128,6 +168,29 @@ SIMPLE_JWT = {
     'AUTH_HEADER_TYPES': ('Bearer',),
 }
 
+# WebSocket connects: verified token claims and user/membership lookups are cached per process.
+WS_TOKEN_CACHE_SIZE = env.int('WS_TOKEN_CACHE_SIZE', default=10000)
+WS_AUTH_CACHE_SIZE = env.int('WS_AUTH_CACHE_SIZE', default=10000)
+WS_AUTH_CACHE_TTL = env.int('WS_AUTH_CACHE_TTL', default=30)
+# Compact WebSocket protocols (utils.wire): frames this large or larger are deflated; 0 turns compression off.
+WS_COMPRESS_MIN_BYTES = env.int('WS_COMPRESS_MIN_BYTES', default=1024)
+# Largest client frame accepted, after inflating; larger ones close the socket.
+WS_MAX_FRAME_BYTES = env.int('WS_MAX_FRAME_BYTES', default=64 * 1024)
+
+# Chat write-behind: broadcast first, then store messages in batches and ack them (communications.write_behind).
+CHAT_WRITE_BEHIND = env.bool('CHAT_WRITE_BEHIND', default=False)
+CHAT_WRITE_BATCH_SIZE = env.int('CHAT_WRITE_BATCH_SIZE', default=200)
+CHAT_WRITE_FLUSH_MS = env.int('CHAT_WRITE_FLUSH_MS', default=50)
+CHAT_WRITE_MAX_PENDING = env.int('CHAT_WRITE_MAX_PENDING', default=10000)
+CHAT_WRITE_MAX_BACKOFF_MS = env.int('CHAT_WRITE_MAX_BACKOFF_MS', default=5000)
+# Chat search: text search configuration (PostgreSQL) and how often new messages are indexed.
+CHAT_SEARCH_CONFIG = env('CHAT_SEARCH_CONFIG', default='simple')
+CHAT_SEARCH_INDEX_INTERVAL = env.int('CHAT_SEARCH_INDEX_INTERVAL', default=10)
+# Chat presence and typing (communications.presence): seconds a connection stays online without a
+# heartbeat, and how long a typing indicator lasts unless refreshed.
+CHAT_PRESENCE_TTL = env.int('CHAT_PRESENCE_TTL', default=60)
+CHAT_TYPING_TTL = env.int('CHAT_TYPING_TTL', default=6)
+
 # ==================== CORS ====================
 CORS_ALLOW_ALL_ORIGINS = env.bool('CORS_ALLOW_ALL_ORIGINS', default=False)
 CORS_ALLOWED_ORIGINS = env.list('CORS_ALLOWED_ORIGINS')
@@ -144,6 +207,28 @@ CHANNEL_LAYERS = {
     },
 }
 
+# Send farm update events from a background thread after commit instead of inline.
+FARMS_BROADCAST_ASYNC = env.bool('FARMS_BROADCAST_ASYNC', default=True)
+# Per-farm change streams kept in Redis so WebSocket clients can resume after a reconnect.
+FARMS_CDC_JOURNAL_MAXLEN = env.int('FARMS_CDC_JOURNAL_MAXLEN', default=10000)
+FARMS_CDC_REPLAY_LIMIT = env.int('FARMS_CDC_REPLAY_LIMIT', default=1000)
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+    },
+}
+FARMS_PAYLOAD_CACHE_TTL = env.int('FARMS_PAYLOAD_CACHE_TTL', default=60 * 15)
+
+# Sensor time series: readings are buffered in Redis and flushed in batches by Celery beat.
+FARMS_TS_BUFFERED = env.bool('FARMS_TS_BUFFERED', default=True)
+FARMS_TS_FLUSH_BATCH = env.int('FARMS_TS_FLUSH_BATCH', default=5000)
+FARMS_TS_FLUSH_INTERVAL = env.int('FARMS_TS_FLUSH_INTERVAL', default=10)
+FARMS_TS_MAX_POINTS = env.int('FARMS_TS_MAX_POINTS', default=5000)
+FARMS_TS_CLAIM_TIMEOUT = env.int('FARMS_TS_CLAIM_TIMEOUT', default=300)
+FARMS_TS_PARTITION_MONTHS_AHEAD = env.int('FARMS_TS_PARTITION_MONTHS_AHEAD', default=2)
+
 # ==================== CELERY ====================
 CELERY_BROKER_URL = REDIS_URL
 CELERY_RESULT_BACKEND = REDIS_URL
@@ -156,6 +241,26 @@ CELERY_BEAT_SCHEDULE = {
         'task': 'ai.tasks.generate_daily_predictions',
         'schedule': timedelta(days=1),
     },
+    'flush-sensor-readings': {
+        'task': 'farms.tasks.flush_sensor_readings',
+        'schedule': timedelta(seconds=FARMS_TS_FLUSH_INTERVAL),
+    },
+    'ensure-sensor-partitions': {
+        'task': 'farms.tasks.ensure_sensor_partitions',
+        'schedule': timedelta(days=1),
+    },
+    'update-analytics-aggregates': {
+        'task': 'analytics.tasks.update_analytics_aggregates',
+        'schedule': timedelta(minutes=1),
+    },
+    'index-chat-messages': {
+        'task': 'communications.tasks.index_messages',
+        'schedule': timedelta(seconds=CHAT_SEARCH_INDEX_INTERVAL),
+    },
+    'expire-chat-presence': {
+        'task': 'communications.tasks.expire_presence',
+        'schedule': timedelta(seconds=CHAT_PRESENCE_TTL / 2),
+    },
 }
 
 # ==================== SUPABASE & AI KEYS ====================
@@ -164,6 +269,34 @@ SUPABASE_ANON_KEY = env('SUPABASE_ANON_KEY')
 SUPABASE_SERVICE_ROLE_KEY = env('SUPABASE_SERVICE_ROLE_KEY')
 GROQ_API_KEY = env('GROQ_API_KEY')
 
+# ==================== AI PIPELINE ====================
+AI_LLM_BACKEND = env('AI_LLM_BACKEND', default='groq')  # 'groq' or 'fake' (offline benchmarking)
+AI_FAKE_LLM_LATENCY = env.float('AI_FAKE_LLM_LATENCY', default=0.2)
+AI_PREDICTION_CHUNK_SIZE = env.int('AI_PREDICTION_CHUNK_SIZE', default=50)
+AI_PREDICTION_CONCURRENCY = env.int('AI_PREDICTION_CONCURRENCY', default=8)
+AI_PREDICTION_MAX_RETRIES = env.int('AI_PREDICTION_MAX_RETRIES', default=3)
+AI_PREDICTION_RETRY_BACKOFF = env.float('AI_PREDICTION_RETRY_BACKOFF', default=1.0)
+AI_LLM_CACHE_TTL = env.int('AI_LLM_CACHE_TTL', default=60 * 60 * 24 * 7)
+AI_LLM_CACHE_LOCAL_SIZE = env.int('AI_LLM_CACHE_LOCAL_SIZE', default=512)
+AI_LLM_CACHE_LOCAL_TTL = env.int('AI_LLM_CACHE_LOCAL_TTL', default=300)
+AI_LLM_CACHE_STATS_FLUSH = env.int('AI_LLM_CACHE_STATS_FLUSH', default=10)
+AI_RECEIPT_SPOOL_MAX_MEMORY = env.int('AI_RECEIPT_SPOOL_MAX_MEMORY', default=2 * 1024 * 1024)
+AI_RECEIPT_MAX_DOWNLOAD_BYTES = env.int('AI_RECEIPT_MAX_DOWNLOAD_BYTES', default=50 * 1024 * 1024)
+AI_RECEIPT_MAX_PAGES = env.int('AI_RECEIPT_MAX_PAGES', default=10)
+AI_RECEIPT_BATCH_WORKERS = env.int('AI_RECEIPT_BATCH_WORKERS', default=8)
+
+# ==================== REPORTS ====================
+REPORT_CHUNK_ROWS = env.int('REPORT_CHUNK_ROWS', default=1000)
+REPORT_ITERATOR_CHUNK_SIZE = env.int('REPORT_ITERATOR_CHUNK_SIZE', default=2000)
+# CSV reports go to this private bucket; report status hands out signed URLs valid this many seconds.
+REPORT_STORAGE_BUCKET = env('REPORT_STORAGE_BUCKET', default='reports')
+REPORT_URL_TTL = env.int('REPORT_URL_TTL', default=300)
+
+# ==================== CSV IMPORT ====================
+IMPORT_BATCH_SIZE = env.int('IMPORT_BATCH_SIZE', default=1000)
+IMPORT_MAX_BATCH_SIZE = env.int('IMPORT_MAX_BATCH_SIZE', default=10000)
+IMPORT_MAX_ERRORS = env.int('IMPORT_MAX_ERRORS', default=1000)
+
 # ==================== INTERNATIONALIZATION ====================
 LANGUAGE_CODE = 'en-us'
 TIME_ZONE = 'UTC'
@@ -2,6 +2,7 @@ from django.contrib import admin
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from utils.supabase_storage import serve_signed_file
 
 from accounts.api.views import (
     CustomUserViewSet,
@@ -143,5 +144,6 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/auth/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('api/auth/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('api/files/<str:token>/', serve_signed_file, name='signed-file'),
     path('api/', include(router.urls)),
 ]
\ No newline at end of file
@@ -1,5 +1,8 @@
 from rest_framework import viewsets
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.decorators import action
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
+from rest_framework.response import Response
+from ai.cache import llm_cache
 from ai.models import AILog, Prediction, Alert
 from .serializers import AILogSerializer, PredictionSerializer, AlertSerializer
 
@@ -7,6 +10,7 @@ class AILogViewSet(viewsets.ModelViewSet):
     queryset = AILog.objects.all()
     serializer_class = AILogSerializer
     permission_classes = [IsAuthenticated]
+    max_page_size = 100
 
     def get_queryset(self):
         return self.queryset.filter(user=self.request.user)
@@ -14,10 +18,15 @@ class AILogViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
+    @action(detail=False, methods=['get'], url_path='cache-stats', permission_classes=[IsAdminUser])
+    def cache_stats(self, request):
+        return Response(llm_cache.stats())
+
 class PredictionViewSet(viewsets.ModelViewSet):
     queryset = Prediction.objects.all()
     serializer_class = PredictionSerializer
     permission_classes = [IsAuthenticated]
+    keyset_ordering = ('-generated_at', '-id')
 
     def get_queryset(self):
         return self.queryset.filter(farm__owner=self.request.user)
@@ -0,0 +1,160 @@
+from collections import Counter, OrderedDict
+from django.conf import settings
+from django.core.cache import caches
+import hashlib
+import json
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+STATS_KEYS = ('hits_local', 'hits_shared', 'misses', 'tokens_saved', 'latency_saved_ms')
+
+
+def normalize_prompt(prompt):
+    """Collapse whitespace so cosmetic differences in a prompt share one cache entry."""
+    return ' '.join(prompt.split())
+
+
+class LLMResponseCache:
+    """
+    Content-addressed cache for chat completions.
+
+    Entries are keyed on a hash of the model, the normalized prompt and the
+    request parameters, and live in two tiers: a small in-process LRU and the
+    shared Django cache (Redis). clear() bumps a generation counter in the
+    shared tier, which retires every existing entry at once; other workers'
+    local tiers catch up within AI_LLM_CACHE_LOCAL_TTL seconds.
+
+    Hit and miss counters are tallied in process and added to the shared
+    totals at most every AI_LLM_CACHE_STATS_FLUSH seconds, so a local hit
+    never leaves the process.
+    """
+    prefix = 'llm-cache'
+
+    def __init__(self, alias='default', local_size=None, ttl=None, local_ttl=None, stats_flush=None):
+        self.alias = alias
+        self.local_size = settings.AI_LLM_CACHE_LOCAL_SIZE if local_size is None else local_size
+        self.ttl = settings.AI_LLM_CACHE_TTL if ttl is None else ttl
+        self.local_ttl = settings.AI_LLM_CACHE_LOCAL_TTL if local_ttl is None else local_ttl
+        self.stats_flush = settings.AI_LLM_CACHE_STATS_FLUSH if stats_flush is None else stats_flush
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+        self._pending = Counter()
+        self._flushed_at = time.monotonic()
+
+    @property
+    def shared(self):
+        return caches[self.alias]
+
+    def make_key(self, model, prompt, **params):
+        payload = json.dumps(
+            {'model': model, 'prompt': normalize_prompt(prompt), 'params': params},
+            sort_keys=True,
+            default=str,
+        )
+        return f"{self.prefix}:{hashlib.sha256(payload.encode('utf-8')).hexdigest()}"
+
+    def get(self, key):
+        """Return the cached entry ({'content', 'tokens', 'latency'}) or None, recording the outcome."""
+        entry = self._get_local(key)
+        if entry is not None:
+            self._record('hits_local', entry)
+            return entry
+
+        generation_key = f'{self.prefix}:generation'
+        found = self.shared.get_many([key, generation_key])
+        entry = found.get(key)
+        if entry is not None and entry.get('generation') == found.get(generation_key, 0):
+            self._set_local(key, entry)
+            self._record('hits_shared', entry)
+            return entry
+
+        self._record('misses')
+        return None
+
+    def set(self, key, content, tokens=0, latency=0.0):
+        entry = {
+            'content': content,
+            'tokens': tokens or 0,
+            'latency': latency,
+            'generation': self.shared.get(f'{self.prefix}:generation', 0),
+        }
+        self.shared.set(key, entry, timeout=self.ttl)
+        self._set_local(key, entry)
+        return entry
+
+    def invalidate(self, model, prompt, **params):
+        """Drop the entry for one exact request from both tiers."""
+        key = self.make_key(model, prompt, **params)
+        with self._lock:
+            self._local.pop(key, None)
+        self.shared.delete(key)
+
+    def clear(self):
+        """Retire every entry in the shared tier and empty this process's local tier."""
+        generation_key = f'{self.prefix}:generation'
+        self.shared.add(generation_key, 0, timeout=None)
+        self.shared.incr(generation_key)
+        with self._lock:
+            self._local.clear()
+
+    def stats(self):
+        self.flush_stats()
+        counters = self.shared.get_many([f'{self.prefix}:stats:{name}' for name in STATS_KEYS])
+        stats = {name: counters.get(f'{self.prefix}:stats:{name}', 0) for name in STATS_KEYS}
+        lookups = stats['hits_local'] + stats['hits_shared'] + stats['misses']
+        stats['hit_rate'] = round((lookups - stats['misses']) / lookups, 4) if lookups else 0.0
+        return stats
+
+    def _get_local(self, key):
+        with self._lock:
+            item = self._local.get(key)
+            if item is None:
+                return None
+            expires_at, entry = item
+            if expires_at < time.monotonic():
+                del self._local[key]
+                return None
+            self._local.move_to_end(key)
+            return entry
+
+    def _set_local(self, key, entry):
+        if self.local_size <= 0:
+            return
+        with self._lock:
+            self._local[key] = (time.monotonic() + self.local_ttl, entry)
+            self._local.move_to_end(key)
+            while len(self._local) > self.local_size:
+                self._local.popitem(last=False)
+
+    def _record(self, outcome, entry=None):
+        with self._lock:
+            self._pending[outcome] += 1
+            if entry is not None:
+                self._pending['tokens_saved'] += entry.get('tokens', 0)
+                self._pending['latency_saved_ms'] += int(entry.get('latency', 0) * 1000)
+            due = time.monotonic() - self._flushed_at >= self.stats_flush
+        if due:
+            self.flush_stats()
+
+    def flush_stats(self):
+        """Add this process's counters to the shared totals. Counts are kept for the next try if that fails."""
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+            self._flushed_at = time.monotonic()
+        try:
+            for name, amount in pending.items():
+                if not amount:
+                    continue
+                stats_key = f'{self.prefix}:stats:{name}'
+                self.shared.add(stats_key, 0, timeout=None)
+                self.shared.incr(stats_key, amount)
+                pending[name] = 0
+        except Exception as e:
+            logger.warning(f"Failed to flush LLM cache stats: {e}")
+            with self._lock:
+                self._pending.update(pending)
+
+llm_cache = LLMResponseCache()
@@ -0,0 +1,80 @@
+from datetime import timedelta
+from django.db.models import Avg, Count, DecimalField, ExpressionWrapper, F, Q, Sum, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from crops.models import Crop
+from farms.models import EnvironmentalData
+from inventory.models import ProductionRecord
+
+WINDOWS = (7, 30, 90)
+GDD_BASE_TEMPERATURE = 10  # degrees Celsius, the usual base for temperate field crops
+
+ENVIRONMENT_FIELDS = ('temperature', 'rainfall', 'humidity', 'soil_moisture')
+
+
+def build_farm_features(farm_ids=None, as_of=None):
+    """
+    Build the prediction feature vector for many farms at once.
+
+    Every feature is computed by the database as a conditional aggregate grouped
+    by farm, so a run costs three queries no matter how many farms or readings
+    there are. Returns {farm_id: {feature_name: value}}; features without data
+    are None.
+    """
+    as_of = as_of or timezone.now().date()
+    since = {window: as_of - timedelta(days=window) for window in WINDOWS}
+    longest = max(WINDOWS)
+
+    environment = EnvironmentalData.objects.filter(date__gt=since[longest], date__lte=as_of)
+    production = ProductionRecord.objects.filter(date__gt=since[longest], date__lte=as_of)
+    crops = Crop.objects.all()
+    if farm_ids is not None:
+        environment = environment.filter(farm_id__in=farm_ids)
+        production = production.filter(farm_id__in=farm_ids)
+        crops = crops.filter(field__farm_id__in=farm_ids)
+
+    env_aggregates = {}
+    for window in WINDOWS:
+        in_window = Q(date__gt=since[window])
+        for name in ENVIRONMENT_FIELDS:
+            env_aggregates[f'{name}_mean_{window}d'] = Avg(name, filter=in_window)
+        env_aggregates[f'rainfall_total_{window}d'] = Sum('rainfall', filter=in_window)
+    degree_days = ExpressionWrapper(
+        Greatest(F('temperature') - Value(GDD_BASE_TEMPERATURE), Value(0)),
+        output_field=DecimalField(max_digits=7, decimal_places=2),
+    )
+    env_aggregates[f'growing_degree_days_{longest}d'] = Sum(degree_days)
+    env_aggregates['readings'] = Count('id')
+
+    features = {}
+    for row in environment.values('farm_id').annotate(**env_aggregates).order_by():
+        features.setdefault(row.pop('farm_id'), {}).update(row)
+
+    production_rows = production.values('farm_id').annotate(
+        **{
+            f'production_value_{window}d': Sum('value_estimate', filter=Q(date__gt=since[window]))
+            for window in WINDOWS
+        }
+    ).order_by()
+    for row in production_rows:
+        features.setdefault(row.pop('farm_id'), {}).update(row)
+
+    crop_rows = crops.values('field__farm_id').annotate(
+        crop_count=Count('id'),
+        yield_estimate_total=Sum('yield_estimate'),
+    ).order_by()
+    for row in crop_rows:
+        features.setdefault(row.pop('field__farm_id'), {}).update(row)
+
+    empty = dict.fromkeys(list(env_aggregates) + [
+        f'production_value_{window}d' for window in WINDOWS
+    ] + ['crop_count', 'yield_estimate_total'])
+    empty.update(readings=0, crop_count=0)
+    for farm_id in (farm_ids if farm_ids is not None else list(features)):
+        vector = dict(empty)
+        vector.update(features.get(farm_id, {}))
+        features[farm_id] = {
+            name: value if value is None or isinstance(value, int) else round(float(value), 2)
+            for name, value in vector.items()
+        }
+    return features
@@ -0,0 +1,139 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from types import SimpleNamespace
+import asyncio
+import hashlib
+import json
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = "llama3-8b-8192"  # Groq's free Llama 3 model
+
+
+def get_client():
+    """Blocking chat-completions client for the configured backend."""
+    if settings.AI_LLM_BACKEND == 'fake':
+        return FakeLLMClient()
+    from groq import Groq
+    return Groq(api_key=settings.GROQ_API_KEY)
+
+
+def get_async_client():
+    """Asyncio chat-completions client for the configured backend."""
+    if settings.AI_LLM_BACKEND == 'fake':
+        return AsyncFakeLLMClient()
+    from groq import AsyncGroq
+    return AsyncGroq(api_key=settings.GROQ_API_KEY)
+
+
+def complete(client, prompt, model=DEFAULT_MODEL, use_cache=True, **params):
+    """
+    Run a single-message chat completion through the response cache.
+
+    Returns (content, tokens_used, cached); tokens_used is 0 on a cache hit.
+    """
+    from .cache import llm_cache
+
+    key = llm_cache.make_key(model, prompt, **params)
+    if use_cache:
+        entry = _cache_get(key)
+        if entry is not None:
+            return entry['content'], 0, True
+
+    started = time.monotonic()
+    response = client.chat.completions.create(
+        model=model,
+        messages=[{"role": "user", "content": prompt}],
+        **params
+    )
+    content = response.choices[0].message.content
+    tokens = _total_tokens(response)
+    if use_cache:
+        _cache_set(key, content, tokens=tokens, latency=time.monotonic() - started)
+    return content, tokens, False
+
+
+async def acomplete(async_client, prompt, model=DEFAULT_MODEL, use_cache=True, **params):
+    """Asyncio counterpart of complete(); the shared cache tier is reached off the event loop."""
+    from .cache import llm_cache
+
+    key = llm_cache.make_key(model, prompt, **params)
+    if use_cache:
+        entry = await sync_to_async(_cache_get, thread_sensitive=False)(key)
+        if entry is not None:
+            return entry['content'], 0, True
+
+    started = time.monotonic()
+    response = await async_client.chat.completions.create(
+        model=model,
+        messages=[{"role": "user", "content": prompt}],
+        **params
+    )
+    content = response.choices[0].message.content
+    tokens = _total_tokens(response)
+    if use_cache:
+        await sync_to_async(_cache_set, thread_sensitive=False)(
+            key, content, tokens=tokens, latency=time.monotonic() - started
+        )
+    return content, tokens, False
+
+
+def _cache_get(key):
+    # The cache only saves calls; when it is unreachable, ask the model.
+    from .cache import llm_cache
+    try:
+        return llm_cache.get(key)
+    except Exception as e:
+        logger.warning(f"LLM cache lookup failed, calling the model: {e}")
+        return None
+
+
+def _cache_set(key, content, **kwargs):
+    from .cache import llm_cache
+    try:
+        llm_cache.set(key, content, **kwargs)
+    except Exception as e:
+        logger.warning(f"Failed to cache LLM response: {e}")
+
+
+def _total_tokens(response):
+    usage = getattr(response, 'usage', None)
+    return getattr(usage, 'total_tokens', 0) or 0
+
+
+def _fake_completion(model, messages):
+    prompt = messages[-1]['content']
+    digest = hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+    content = json.dumps({'value': int(digest[:4], 16) % 1000, 'unit': 'kg'})
+    return SimpleNamespace(
+        model=model,
+        choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+        usage=SimpleNamespace(total_tokens=len(prompt.split()) + 8),
+    )
+
+
+class FakeLLMClient:
+    """
+    Offline stand-in for the Groq client with the same `chat.completions.create`
+    surface. Answers are deterministic per prompt and each call sleeps for
+    AI_FAKE_LLM_LATENCY seconds, so throughput can be measured without network.
+    """
+
+    def __init__(self, latency=None):
+        self.latency = settings.AI_FAKE_LLM_LATENCY if latency is None else latency
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, model, messages, **kwargs):
+        time.sleep(self.latency)
+        return _fake_completion(model, messages)
+
+
+class AsyncFakeLLMClient(FakeLLMClient):
+    async def _create(self, model, messages, **kwargs):
+        await asyncio.sleep(self.latency)
+        return _fake_completion(model, messages)
+
+    async def close(self):
+        pass
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:27
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ai", "0001_initial"),
+        ("farms", "0002_access_path_indexes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="ailog",
+            index=models.Index(
+                fields=["user", "-created_at", "-id"], name="ailog_user_created_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="alert",
+            index=models.Index(
+                fields=["farm", "resolved", "due_date"],
+                name="alert_farm_resolved_due_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ai", "0002_access_path_indexes"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="alert",
+            name="alert_farm_resolved_due_idx",
+        ),
+        migrations.AddIndex(
+            model_name="alert",
+            index=models.Index(
+                condition=models.Q(("resolved", False)),
+                fields=["farm", "due_date"],
+                name="alert_farm_open_due_idx",
+            ),
+        ),
+    ]
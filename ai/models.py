@@ -1,5 +1,6 @@
 from django.db import models
 from farms.models import Farm
+from farms.cdc import track_changes
 from crops.models import Crop
 from accounts.models import CustomUser
 
@@ -16,6 +17,12 @@ class AILog(models.Model):
     tokens_used = models.IntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id'], name='ailog_user_created_idx'),
+        ]
+
+@track_changes(farm_path='farm')
 class Prediction(models.Model):
     farm = models.ForeignKey(Farm, on_delete=models.CASCADE, null=True, blank=True)
     crop = models.ForeignKey(Crop, on_delete=models.CASCADE, null=True, blank=True)
@@ -28,6 +35,7 @@ class Prediction(models.Model):
     explanation = models.TextField()
     generated_at = models.DateTimeField(auto_now_add=True)
 
+@track_changes(farm_path='farm')
 class Alert(models.Model):
     farm = models.ForeignKey(Farm, on_delete=models.CASCADE)
     type = models.CharField(max_length=50)
@@ -38,4 +46,11 @@ class Alert(models.Model):
     due_date = models.DateTimeField(blank=True, null=True)
     sent_to_email = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
-    resolved = models.BooleanField(default=False)
\ No newline at end of file
+    resolved = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [
+            # Partial: filter(resolved=False) compiles to NOT resolved, which only a
+            # partial index's condition matches on SQLite.
+            models.Index(fields=['farm', 'due_date'], condition=models.Q(resolved=False), name='alert_farm_open_due_idx'),
+        ]
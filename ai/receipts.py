@@ -0,0 +1,81 @@
+from django.conf import settings
+from PyPDF2 import PdfReader
+from requests.adapters import HTTPAdapter
+import magic
+import re
+import requests
+import tempfile
+
+MIME_SNIFF_BYTES = 8192
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+# A receipt is usable once it shows a total and a date; later pages rarely add anything.
+TOTAL_PATTERN = re.compile(r'\b(?:grand\s+)?total\b[^\d\n]{0,20}\d', re.IGNORECASE)
+DATE_PATTERN = re.compile(r'\b\d{1,4}[/.-]\d{1,2}[/.-]\d{1,4}\b')
+
+
+class ReceiptError(Exception):
+    pass
+
+
+def get_http_session():
+    """Keep-alive session whose connection pool is sized for AI_RECEIPT_BATCH_WORKERS threads."""
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=settings.AI_RECEIPT_BATCH_WORKERS,
+        max_retries=2,
+    )
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def download_attachment(url, session=None):
+    """
+    Stream `url` into a spooled temporary file and return (file, mime).
+
+    Only the first MIME_SNIFF_BYTES are handed to libmagic, the body is kept in
+    memory up to AI_RECEIPT_SPOOL_MAX_MEMORY bytes before spilling to disk, and
+    downloads larger than AI_RECEIPT_MAX_DOWNLOAD_BYTES are refused. The caller
+    owns (and must close) the returned file.
+    """
+    http = session or requests
+    spool = tempfile.SpooledTemporaryFile(max_size=settings.AI_RECEIPT_SPOOL_MAX_MEMORY)
+    try:
+        with http.get(url, timeout=10, stream=True) as response:
+            response.raise_for_status()
+            head = b''
+            size = 0
+            for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                size += len(chunk)
+                if size > settings.AI_RECEIPT_MAX_DOWNLOAD_BYTES:
+                    raise ReceiptError(f"Attachment exceeds {settings.AI_RECEIPT_MAX_DOWNLOAD_BYTES} bytes")
+                if len(head) < MIME_SNIFF_BYTES:
+                    head += chunk[:MIME_SNIFF_BYTES - len(head)]
+                spool.write(chunk)
+    except BaseException:
+        spool.close()
+        raise
+    spool.seek(0)
+    return spool, magic.from_buffer(head, mime=True)
+
+
+def extract_receipt_text(fileobj):
+    """
+    Extract text page by page, stopping after AI_RECEIPT_MAX_PAGES pages or as
+    soon as a total and a date have both been seen.
+    """
+    reader = PdfReader(fileobj)
+    parts = []
+    found_total = found_date = False
+    for index, page in enumerate(reader.pages):
+        if index >= settings.AI_RECEIPT_MAX_PAGES:
+            break
+        extracted = page.extract_text() or ''
+        parts.append(extracted)
+        found_total = found_total or bool(TOTAL_PATTERN.search(extracted))
+        found_date = found_date or bool(DATE_PATTERN.search(extracted))
+        if found_total and found_date:
+            break
+    return ''.join(parts)
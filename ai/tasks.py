@@ -1,19 +1,23 @@
-from celery import shared_task
-from groq import Groq  # Use Groq instead of OpenAI
+from celery import shared_task, chord
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from django.conf import settings
-from PyPDF2 import PdfReader
-import magic
+from django.core.exceptions import ValidationError
+from django.db import transaction
 import requests
-from io import BytesIO
 from accounts.models import Attachment
 from crops.models import CropExpense
 from .models import AILog, Prediction
+from .features import build_farm_features
+from .receipts import ReceiptError, download_attachment, extract_receipt_text, get_http_session
+from .llm import DEFAULT_MODEL, acomplete, complete, get_client, get_async_client
 from farms.models import Farm
+import asyncio
 import json
 import logging
+import random
 
 logger = logging.getLogger(__name__)
-client = Groq(api_key=settings.GROQ_API_KEY)  # Initialize Groq client
+client = get_client()  # Groq, or the offline fake when AI_LLM_BACKEND='fake'
 
 @shared_task
 def analyze_receipt(attachment_id):
@@ -24,90 +28,229 @@ def analyze_receipt(attachment_id):
         return f"Attachment {attachment_id} not found"
 
     try:
-        response = requests.get(attachment.url, timeout=10)
-        response.raise_for_status()
-    except requests.RequestException as e:
-        logger.error(f"Failed to download attachment {attachment_id}: {str(e)}")
-        return f"Failed to download attachment: {str(e)}"
-
-    file_content = BytesIO(response.content)
-    mime = magic.from_buffer(file_content.getvalue(), mime=True)
-    if mime != 'application/pdf':
-        logger.error(f"Attachment {attachment_id} is not a PDF: {mime}")
-        return f"Invalid PDF: {mime}"
+        prompt, result, data, tokens_used = _read_receipt(attachment)
+        expense, log = _receipt_rows(attachment, prompt, result, data, tokens_used)
+    except ReceiptError as e:
+        return str(e)
 
+    expense.save()
+    log.save()
+    return result
+
+@shared_task
+def analyze_receipts_batch(attachment_ids):
+    """
+    Analyze many receipts in one task: attachments are loaded in one query,
+    downloads and completions run on a thread pool sharing one pooled HTTP
+    session, and the resulting CropExpense and AILog rows are bulk inserted.
+    """
+    attachments = list(Attachment.objects.filter(id__in=attachment_ids).select_related('uploaded_by'))
+    failed = {
+        attachment_id: f"Attachment {attachment_id} not found"
+        for attachment_id in set(attachment_ids) - {attachment.id for attachment in attachments}
+    }
+
+    session = get_http_session()
+    expenses, logs = [], []
     try:
-        reader = PdfReader(file_content)
-        text = ''
-        for page in reader.pages:
-            extracted = page.extract_text() or ''
-            text += extracted
-    except Exception as e:
-        logger.error(f"Failed to extract text from PDF {attachment_id}: {str(e)}")
-        return f"PDF extraction failed: {str(e)}"
+        with ThreadPoolExecutor(max_workers=settings.AI_RECEIPT_BATCH_WORKERS) as executor:
+            futures = {executor.submit(_read_receipt, attachment, session): attachment for attachment in attachments}
+            for future in as_completed(futures):
+                attachment = futures[future]
+                try:
+                    expense, log = _receipt_rows(attachment, *future.result())
+                except ReceiptError as e:
+                    failed[attachment.id] = str(e)
+                    continue
+                expenses.append(expense)
+                logs.append(log)
+    finally:
+        session.close()
+
+    # One expense pointing at a missing crop would abort the whole bulk insert;
+    # assign_tenancy leaves those without a farm.
+    rows = []
+    for expense, log in zip(CropExpense.assign_tenancy(expenses), logs):
+        if expense.farm_id is None:
+            logger.warning(f"Rejected receipt {log.context_id}: crop {expense.crop_id} does not exist")
+            failed[log.context_id] = f"Crop {expense.crop_id} does not exist"
+            continue
+        rows.append((expense, log))
+
+    with transaction.atomic():
+        CropExpense.objects.bulk_create([expense for expense, _ in rows])
+        AILog.objects.bulk_create([log for _, log in rows])
+    return {'processed': len(rows), 'failed': failed}
+
+def _read_receipt(attachment, session=None):
+    """
+    Download, extract and analyze one receipt.
+
+    Returns (prompt, result, data, tokens_used); failures are logged and raised
+    as ReceiptError carrying the message analyze_receipt reports.
+    """
+    try:
+        file_content, mime = download_attachment(attachment.url, session=session)
+    except (requests.RequestException, ReceiptError) as e:
+        logger.error(f"Failed to download attachment {attachment.id}: {str(e)}")
+        raise ReceiptError(f"Failed to download attachment: {str(e)}")
+
+    with file_content:
+        if mime != 'application/pdf':
+            logger.error(f"Attachment {attachment.id} is not a PDF: {mime}")
+            raise ReceiptError(f"Invalid PDF: {mime}")
+
+        try:
+            text = extract_receipt_text(file_content)
+        except Exception as e:
+            logger.error(f"Failed to extract text from PDF {attachment.id}: {str(e)}")
+            raise ReceiptError(f"PDF extraction failed: {str(e)}")
 
     prompt = f"Extract expense details from this receipt: {text}. Output JSON with amount, category, date, vendor."
     try:
-        response = client.chat.completions.create(
-            model="llama3-8b-8192",  # Groq's free Llama 3 model
-            messages=[{"role": "user", "content": prompt}]
-        )
-        result = response.choices[0].message.content
+        result, tokens_used, _ = complete(client, prompt)
     except Exception as e:
-        logger.error(f"Groq API call failed for attachment {attachment_id}: {str(e)}")
-        return f"Groq API error: {str(e)}"
+        logger.error(f"Groq API call failed for attachment {attachment.id}: {str(e)}")
+        raise ReceiptError(f"Groq API error: {str(e)}")
 
     try:
         data = json.loads(result)
     except json.JSONDecodeError as e:
-        logger.error(f"Invalid JSON response for attachment {attachment_id}: {result}")
-        return f"Invalid JSON response: {str(e)}"
+        logger.error(f"Invalid JSON response for attachment {attachment.id}: {result}")
+        raise ReceiptError(f"Invalid JSON response: {str(e)}")
+    return prompt, result, data, tokens_used
+
+def _receipt_rows(attachment, prompt, result, data, tokens_used):
+    """
+    Build (unsaved) the CropExpense and AILog rows for an analyzed receipt.
 
-    expense = CropExpense.objects.create(
-        crop_id=attachment.owner_id if attachment.owner_type == 'expense' else None,
+    The model's answer is coerced and validated field by field; a receipt
+    that does not yield a valid expense is logged and raised as ReceiptError.
+    """
+    if attachment.owner_type != 'expense':
+        logger.warning(f"Rejected receipt {attachment.id}: not linked to a crop expense")
+        raise ReceiptError(f"Attachment {attachment.id} is not linked to a crop expense")
+    if not isinstance(data, dict):
+        logger.warning(f"Rejected receipt {attachment.id}: expected a JSON object, got {result}")
+        raise ReceiptError("Invalid JSON response: expected an object")
+
+    expense = CropExpense(
+        crop_id=attachment.owner_id,
         amount=data.get('amount', 0),
         currency='USD',
         category=data.get('category', ''),
         incurred_on=data.get('date', None),
         additional_notes=data.get('vendor', '')
     )
-    AILog.objects.create(
+    try:
+        # Runs each field's to_python() and validators; the crop is checked in bulk by the caller.
+        expense.clean_fields(exclude=['crop', 'farm', 'owner'])
+    except ValidationError as e:
+        logger.warning(f"Rejected receipt {attachment.id}: {e.message_dict}")
+        raise ReceiptError(f"Invalid receipt data: {e.message_dict}")
+
+    log = AILog(
         user=attachment.uploaded_by,
         context_type='receipt',
         context_id=attachment.id,
         prompt=prompt,
         response=result,
-        model='llama3-8b-8192'  # Log Groq model
+        model=DEFAULT_MODEL,
+        tokens_used=tokens_used
     )
-    return result
+    return expense, log
 
 @shared_task
 def generate_daily_predictions():
-    for farm in Farm.objects.all():
-        # Dummy inputs; replace with real data (e.g., from env data, crops)
-        inputs = {'temperature': 25, 'rainfall': 10}  # Example
-        prompt = f"Predict yield for farm {farm.id} based on {inputs}."
-        try:
-            response = client.chat.completions.create(
-                model="llama3-8b-8192",  # Groq's free Llama 3 model
-                messages=[{"role": "user", "content": prompt}]
-            )
-            result_str = response.choices[0].message.content
-        except Exception as e:
-            logger.error(f"Groq API call failed for farm {farm.id}: {str(e)}")
-            continue  # Skip to next farm
+    """
+    Build the feature matrix for every farm in one pass, then fan out one
+    predict_farm_chunk sub-task per AI_PREDICTION_CHUNK_SIZE farms and collect
+    the per-chunk counts in summarize_predictions.
+    """
+    farm_ids = list(Farm.objects.order_by('id').values_list('id', flat=True))
+    if not farm_ids:
+        return {'farms': 0, 'created': 0, 'failed': 0}
+
+    features = build_farm_features(farm_ids)
+    # Celery's JSON serializer would turn int dict keys into strings, so ship pairs.
+    rows = [[farm_id, features[farm_id]] for farm_id in farm_ids]
+    chunk_size = settings.AI_PREDICTION_CHUNK_SIZE
+    chunks = [rows[i:i + chunk_size] for i in range(0, len(rows), chunk_size)]
+    chord(predict_farm_chunk.s(chunk) for chunk in chunks)(summarize_predictions.s())
+    return {'farms': len(farm_ids), 'chunks': len(chunks)}
+
+
+@shared_task
+def predict_farm_chunk(farm_features):
+    inputs_by_farm = {farm_id: inputs for farm_id, inputs in farm_features}
+    results = asyncio.run(_predict_farms(inputs_by_farm))
 
+    predictions = []
+    failed = 0
+    for farm_id, inputs in inputs_by_farm.items():
+        result_str = results.get(farm_id)
+        if result_str is None:
+            failed += 1
+            continue
         try:
             result = json.loads(result_str)
         except json.JSONDecodeError:
-            logger.error(f"Invalid JSON response for farm {farm.id}: {result_str}")
+            logger.error(f"Invalid JSON response for farm {farm_id}: {result_str}")
             result = {'value': 0}
-
-        Prediction.objects.create(
-            farm=farm,
+        predictions.append(Prediction(
+            farm_id=farm_id,
             prediction_type='yield',
             inputs=inputs,
             result=result,
             confidence=0.9,
-            explanation='AI generated based on weather data'
-        )
\ No newline at end of file
+            explanation='AI generated based on weather, crop and production history'
+        ))
+
+    Prediction.objects.bulk_create(predictions)
+    return {'farms': len(inputs_by_farm), 'created': len(predictions), 'failed': failed}
+
+
+@shared_task
+def summarize_predictions(chunk_results):
+    summary = {'farms': 0, 'created': 0, 'failed': 0}
+    for chunk in chunk_results:
+        for key in summary:
+            summary[key] += chunk.get(key, 0)
+    logger.info(
+        "Daily predictions: %(created)s created, %(failed)s failed across %(farms)s farms",
+        summary,
+    )
+    return summary
+
+
+async def _predict_farms(inputs_by_farm):
+    """Run one completion per farm with at most AI_PREDICTION_CONCURRENCY in flight."""
+    async_client = get_async_client()
+    semaphore = asyncio.Semaphore(settings.AI_PREDICTION_CONCURRENCY)
+
+    async def predict(farm_id, inputs):
+        # Keep farm ids out of the prompt so farms with identical features share a cache entry.
+        prompt = f"Predict yield for a farm based on {json.dumps(inputs, sort_keys=True)}."
+        async with semaphore:
+            return farm_id, await _complete_with_retry(async_client, prompt, f"farm {farm_id}")
+
+    try:
+        pairs = await asyncio.gather(*(predict(farm_id, inputs) for farm_id, inputs in inputs_by_farm.items()))
+    finally:
+        await async_client.close()
+    return dict(pairs)
+
+
+async def _complete_with_retry(async_client, prompt, label):
+    """Return the completion text, or None once AI_PREDICTION_MAX_RETRIES attempts have failed."""
+    max_retries = settings.AI_PREDICTION_MAX_RETRIES
+    for attempt in range(max_retries + 1):
+        try:
+            content, _, _ = await acomplete(async_client, prompt)
+            return content
+        except Exception as e:
+            if attempt == max_retries:
+                logger.error(f"Groq API call failed for {label} after {attempt + 1} attempts: {str(e)}")
+                return None
+            delay = settings.AI_PREDICTION_RETRY_BACKOFF * (2 ** attempt)
+            await asyncio.sleep(delay + random.uniform(0, delay / 2))
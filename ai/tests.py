@@ -1,3 +1,484 @@
-from django.test import TestCase
+from accounts.models import Attachment
+from agricore_project.celery import app
+from ai.cache import LLMResponseCache, llm_cache
+from ai.features import build_farm_features
+from ai.llm import DEFAULT_MODEL, AsyncFakeLLMClient, FakeLLMClient, _fake_completion, acomplete, complete
+from ai.models import AILog, Alert, Prediction
+from ai.receipts import MIME_SNIFF_BYTES, ReceiptError, download_attachment, extract_receipt_text
+from ai.tasks import (
+    _complete_with_retry, _predict_farms, analyze_receipt, analyze_receipts_batch, generate_daily_predictions,
+    predict_farm_chunk,
+)
+from asgiref.sync import async_to_sync
+from celery import chord
+from crops.models import CropExpense
+from datetime import date, timedelta
+from decimal import Decimal
+from django.core.cache import caches
+from django.db import connection
+from django.test import SimpleTestCase, override_settings, tag
+from farms.models import EnvironmentalData, Farm
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from inventory.models import ProductionRecord
+from PyPDF2 import PageObject, PdfWriter
+from PyPDF2.generic import DecodedStreamObject, DictionaryObject, NameObject
+from unittest import mock
+from utils.testing import QueryPlanMixin, ServiceTestCase, local_services, make_crop, make_farm, make_field, make_user
+import asyncio
+import io
+import json
+import requests
+import threading
+import time
 
-# Create your tests here.
+
+class AccessPathIndexTests(QueryPlanMixin, ServiceTestCase):
+    def test_open_alerts_by_due_date_use_partial_index(self):
+        farm = make_farm(make_user('owner'))
+        Alert.objects.create(farm=farm, type='task', title='Spray', message='', related_table='crops', related_id=1)
+        self.assertUsesIndex(Alert.objects.filter(farm=farm, resolved=False).order_by('due_date'), 'alert_farm_open_due_idx')
+
+
+@local_services
+class LLMResponseCacheTests(SimpleTestCase):
+    def setUp(self):
+        caches['default'].clear()
+        self.cache = LLMResponseCache(stats_flush=3600)
+        self.key = self.cache.make_key(DEFAULT_MODEL, 'How much maize?')
+
+    def test_local_hit_stays_in_process(self):
+        self.cache.set(self.key, 'answer', tokens=12, latency=0.5)
+        with mock.patch.object(LLMResponseCache, 'shared', new_callable=mock.PropertyMock) as shared:
+            for _ in range(100):
+                self.assertEqual(self.cache.get(self.key)['content'], 'answer')
+        shared.assert_not_called()
+        stats = self.cache.stats()
+        self.assertEqual(stats['hits_local'], 100)
+        self.assertEqual(stats['tokens_saved'], 1200)
+        self.assertEqual(stats['latency_saved_ms'], 50000)
+
+    def test_counters_flush_once_interval_passes(self):
+        self.cache.stats_flush = 0
+        self.cache.get(self.key)
+        self.assertEqual(caches['default'].get(f'{self.cache.prefix}:stats:misses'), 1)
+
+    def test_failed_flush_keeps_counts(self):
+        self.cache.get(self.key)
+        with mock.patch.object(caches['default'], 'incr', side_effect=ConnectionError), self.assertLogs('ai.cache', 'WARNING'):
+            self.cache.flush_stats()
+        self.assertEqual(self.cache.stats()['misses'], 1)
+
+
+@local_services
+class CompleteTests(SimpleTestCase):
+    def setUp(self):
+        caches['default'].clear()
+
+    def test_cache_outage_falls_through_to_model(self):
+        broken = mock.patch.multiple(llm_cache, get=mock.Mock(side_effect=ConnectionError), set=mock.Mock(side_effect=ConnectionError))
+        with broken, self.assertLogs('ai.llm', 'WARNING'):
+            content, tokens, cached = complete(FakeLLMClient(latency=0), 'How much maize?')
+            acontent, _, acached = async_to_sync(acomplete)(AsyncFakeLLMClient(latency=0), 'How much maize?')
+        self.assertFalse(cached)
+        self.assertFalse(acached)
+        self.assertGreater(tokens, 0)
+        self.assertEqual(acontent, content)
+
+    def test_second_call_is_served_from_cache(self):
+        client = FakeLLMClient(latency=0)
+        with mock.patch.object(client.chat.completions, 'create', wraps=client.chat.completions.create) as create:
+            first = complete(client, 'How  much maize?')
+            second = complete(client, 'How much maize?')
+        self.assertEqual(create.call_count, 1)
+        self.assertEqual(second, (first[0], 0, True))
+
+
+class ReceiptBatchTests(ServiceTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = make_user('owner')
+        self.crop = make_crop(make_field(make_farm(self.user)))
+
+    def attach(self, owner_id=None, owner_type='expense'):
+        return Attachment.objects.create(
+            owner_type=owner_type, owner_id=owner_id or self.crop.id, filename='r.pdf',
+            url='https://example.com/r.pdf', uploaded_by=self.user,
+        )
+
+    def analyze(self, answers):
+        def read(attachment, session=None):
+            data = answers[attachment.id]
+            return 'prompt', json.dumps(data), data, 10
+        with mock.patch('ai.tasks._read_receipt', side_effect=read), self.assertLogs('ai.tasks', 'WARNING') as logs:
+            result = analyze_receipts_batch(list(answers))
+        return result, logs.output
+
+    def test_answers_are_coerced_and_bad_rows_rejected(self):
+        good = self.attach()
+        bad_amount = self.attach()
+        bad_date = self.attach()
+        missing_crop = self.attach(owner_id=999999)
+        not_an_object = self.attach()
+        result, logs = self.analyze({
+            good.id: {'amount': '12.50', 'category': 'seed', 'date': '2026-03-01', 'vendor': 'Agrovet'},
+            bad_amount.id: {'amount': '$12', 'category': 'seed', 'date': '2026-03-01'},
+            bad_date.id: {'amount': 5, 'category': 'seed', 'date': 'March'},
+            missing_crop.id: {'amount': 5, 'category': 'seed', 'date': '2026-03-01'},
+            not_an_object.id: [1, 2],
+        })
+
+        self.assertEqual(result['processed'], 1)
+        self.assertEqual(set(result['failed']), {bad_amount.id, bad_date.id, missing_crop.id, not_an_object.id})
+        for attachment in (bad_amount, bad_date, missing_crop, not_an_object):
+            self.assertTrue(any(f'Rejected receipt {attachment.id}:' in line for line in logs))
+        expense = CropExpense.objects.get()
+        self.assertEqual((expense.amount, expense.incurred_on), (Decimal('12.50'), date(2026, 3, 1)))
+        self.assertEqual(expense.farm_id, self.crop.field.farm_id)
+        self.assertEqual(AILog.objects.get().context_id, good.id)
+
+    def test_single_receipt_is_saved_and_returns_the_answer(self):
+        attachment = self.attach()
+        data = {'amount': '12.50', 'category': 'seed', 'date': '2026-03-01', 'vendor': 'Agrovet'}
+        with mock.patch('ai.tasks._read_receipt', return_value=('prompt', json.dumps(data), data, 10)):
+            self.assertEqual(analyze_receipt(attachment.id), json.dumps(data))
+        expense = CropExpense.objects.get()
+        self.assertEqual((expense.amount, expense.farm_id), (Decimal('12.50'), self.crop.field.farm_id))
+        self.assertEqual(AILog.objects.get().tokens_used, 10)
+
+    def test_single_receipt_with_bad_data_is_rejected(self):
+        attachment = self.attach()
+        data = {'amount': '$12', 'category': 'seed', 'date': '2026-03-01'}
+        with mock.patch('ai.tasks._read_receipt', return_value=('prompt', json.dumps(data), data, 10)), \
+                self.assertLogs('ai.tasks', 'WARNING'):
+            self.assertIn('Invalid receipt data', analyze_receipt(attachment.id))
+        self.assertFalse(CropExpense.objects.exists())
+
+
+class FarmFeatureTests(ServiceTestCase):
+    AS_OF = date(2026, 6, 30)
+
+    @classmethod
+    def setUpTestData(cls):
+        owner = make_user('owner')
+        cls.farm, cls.empty = make_farm(owner), make_farm(owner, name='Empty')
+        readings = [
+            # days before AS_OF, temperature, rainfall, humidity, soil moisture
+            (-1, '30.00', '9.00', '50.00', '10.00'),  # after AS_OF: ignored
+            (1, '20.00', '5.00', '60.00', '30.00'),
+            (7, '12.00', '1.00', '50.00', '20.00'),  # not inside the 7 day window
+            (10, '14.00', '10.00', '70.00', '40.00'),
+            (60, '8.00', '20.00', '80.00', '50.00'),
+            (100, '30.00', '40.00', '90.00', '60.00'),  # outside every window
+        ]
+        EnvironmentalData.objects.bulk_create(
+            EnvironmentalData(
+                farm=cls.farm, date=cls.AS_OF - timedelta(days=days), temperature=Decimal(temperature),
+                rainfall=Decimal(rainfall), humidity=Decimal(humidity), soil_moisture=Decimal(soil),
+            )
+            for days, temperature, rainfall, humidity, soil in readings
+        )
+        for days, value in ((3, '100.00'), (40, '50.00'), (120, '75.00')):
+            ProductionRecord.objects.create(
+                farm=cls.farm, date=cls.AS_OF - timedelta(days=days), item_type='maize', quantity=Decimal('1.00'),
+                unit='kg', value_estimate=Decimal(value),
+            )
+        field = make_field(cls.farm)
+        make_crop(field, yield_estimate=Decimal('10.00'))
+        make_crop(field, yield_estimate=Decimal('5.50'))
+
+    def test_windows_match_hand_computed_values(self):
+        with self.assertNumQueries(3):
+            features = build_farm_features([self.farm.id, self.empty.id], as_of=self.AS_OF)
+        farm = features[self.farm.id]
+        self.assertEqual(farm['readings'], 4)
+        self.assertEqual(
+            [farm[f'temperature_mean_{window}d'] for window in (7, 30, 90)], [20.0, round(46 / 3, 2), 13.5],
+        )
+        self.assertEqual([farm[f'rainfall_total_{window}d'] for window in (7, 30, 90)], [5.0, 16.0, 36.0])
+        self.assertEqual((farm['humidity_mean_30d'], farm['soil_moisture_mean_90d']), (60.0, 35.0))
+        # max(temperature - 10, 0) summed: 10 + 2 + 4 + 0.
+        self.assertEqual(farm['growing_degree_days_90d'], 16.0)
+        self.assertEqual(
+            [farm[f'production_value_{window}d'] for window in (7, 30, 90)], [100.0, 100.0, 150.0],
+        )
+        self.assertEqual((farm['crop_count'], farm['yield_estimate_total']), (2, 15.5))
+
+        empty = features[self.empty.id]
+        self.assertEqual((empty['readings'], empty['crop_count']), (0, 0))
+        self.assertEqual({value for name, value in empty.items() if name not in ('readings', 'crop_count')}, {None})
+
+    def test_query_count_does_not_grow_with_farms(self):
+        owner = make_user('other')
+        farm_ids = [make_farm(owner).id for _ in range(20)]
+        with self.assertNumQueries(3):
+            self.assertEqual(len(build_farm_features(farm_ids, as_of=self.AS_OF)), 20)
+
+
+@tag('slow')
+class FarmFeatureScaleTests(ServiceTestCase):
+    """A few seconds; run with `manage.py test --tag slow`."""
+    FARMS = 10_000
+    DAYS = 30
+
+    @classmethod
+    def setUpTestData(cls):
+        owner = make_user('owner')
+        Farm.objects.bulk_create(
+            Farm(owner=owner, name=f'Farm {i}', type='mixed', country='KE', state='Nakuru', city='Nakuru',
+                 address='1 Farm Road', total_size=Decimal('10.00'), size_unit='ha')
+            for i in range(cls.FARMS)
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {EnvironmentalData._meta.db_table}
+                    (farm_id, date, temperature, rainfall, humidity, soil_moisture, pest_alerts, additional_info,
+                     created_at)
+                WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < %s)
+                SELECT farm.id, date('2026-06-30', '-' || n.i || ' days'), 10 + n.i % 15, n.i % 4, 60, 30, '', '{{}}',
+                    '2026-06-30 00:00:00'
+                FROM {Farm._meta.db_table} farm, n
+                """,
+                [cls.DAYS],
+            )
+
+    def test_ten_thousand_farms_in_three_queries(self):
+        farm_ids = list(Farm.objects.values_list('id', flat=True))
+        started = time.perf_counter()
+        with self.assertNumQueries(3):
+            features = build_farm_features(farm_ids, as_of=date(2026, 6, 30))
+        elapsed = time.perf_counter() - started
+        print(f'\nfeatures: {self.FARMS:,} farms x {self.DAYS} readings in {elapsed:.2f}s')
+        self.assertEqual(len(features), self.FARMS)
+        self.assertEqual({vector['readings'] for vector in features.values()}, {self.DAYS})
+        self.assertLess(elapsed, 30)
+
+
+def make_pdf(texts):
+    """A PDF with one page of Helvetica text per entry in `texts`."""
+    writer = PdfWriter()
+    for text in texts:
+        page = PageObject.create_blank_page(width=612, height=792)
+        font = DictionaryObject({
+            NameObject('/Type'): NameObject('/Font'), NameObject('/Subtype'): NameObject('/Type1'),
+            NameObject('/BaseFont'): NameObject('/Helvetica'),
+        })
+        page[NameObject('/Resources')] = DictionaryObject({NameObject('/Font'): DictionaryObject({NameObject('/F1'): font})})
+        content = DecodedStreamObject()
+        content.set_data(f'BT /F1 12 Tf 72 720 Td ({text}) Tj ET'.encode())
+        page[NameObject('/Contents')] = content
+        writer.add_page(page)
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Serves the server's bodies: path -> (chunk, repeat), written chunk by chunk."""
+
+    def do_GET(self):
+        chunk, repeat = self.server.bodies[self.path]
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(chunk) * repeat))
+        self.end_headers()
+        try:
+            for _ in range(repeat):
+                self.wfile.write(chunk)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, *args):
+        pass
+
+
+class StubServerMixin:
+    """Runs a local HTTP server for the class; register bodies with serve()."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+        cls.server.bodies = {}
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.addClassCleanup(cls.server.server_close)
+        cls.addClassCleanup(cls.server.shutdown)
+
+    def serve(self, path, chunk, repeat=1):
+        self.server.bodies[path] = (chunk, repeat)
+        return f'http://127.0.0.1:{self.server.server_port}{path}'
+
+
+KB = 1024
+
+
+class ReceiptDownloadTests(StubServerMixin, SimpleTestCase):
+    @override_settings(AI_RECEIPT_MAX_DOWNLOAD_BYTES=256 * KB)
+    def test_download_over_size_cap_is_refused(self):
+        self.assertEqual(download_attachment(self.serve('/ok', b'x' * 64 * KB, 4))[0].read(), b'x' * 256 * KB)
+        with self.assertRaisesRegex(ReceiptError, 'exceeds'):
+            download_attachment(self.serve('/big', b'x' * 64 * KB, 8))
+
+    @override_settings(AI_RECEIPT_SPOOL_MAX_MEMORY=128 * KB)
+    def test_large_body_spills_to_disk(self):
+        small, _ = download_attachment(self.serve('/small', b'x' * 64 * KB))
+        large, _ = download_attachment(self.serve('/large', b'x' * 64 * KB, 4))
+        with small, large:
+            self.assertEqual((small._rolled, large._rolled), (False, True))
+            self.assertEqual(len(large.read()), 256 * KB)
+
+    def test_mime_is_sniffed_from_the_first_bytes(self):
+        pdf = make_pdf(['Total 12.50 on 2026-03-01'])
+        spool, mime = download_attachment(self.serve('/receipt.pdf', pdf))
+        spool.close()
+        self.assertEqual(mime, 'application/pdf')
+        with mock.patch('ai.receipts.magic.from_buffer', return_value='application/octet-stream') as sniff:
+            download_attachment(self.serve('/blob', b'x' * 64 * KB, 16))[0].close()
+        self.assertEqual(len(sniff.call_args.args[0]), MIME_SNIFF_BYTES)
+
+    def test_extraction_stops_once_total_and_date_are_seen(self):
+        pdf = make_pdf(['Agrovet Ltd', 'Total 12.50 on 2026-03-01', 'Thank you', 'Page 4'])
+        self.assertEqual(extract_receipt_text(io.BytesIO(pdf)), 'Agrovet LtdTotal 12.50 on 2026-03-01')
+
+    @override_settings(AI_RECEIPT_MAX_PAGES=3)
+    def test_extraction_stops_at_page_limit(self):
+        pdf = make_pdf([f'Page {number}' for number in range(1, 6)])
+        self.assertEqual(extract_receipt_text(io.BytesIO(pdf)), 'Page 1Page 2Page 3')
+
+
+def peak_rss_growth(fn):
+    """Bytes the process's resident set peaked above its size before `fn()` ran (Linux only)."""
+    def status(field):
+        with open('/proc/self/status') as handle:
+            return next(int(line.split()[1]) * KB for line in handle if line.startswith(field))
+    with open('/proc/self/clear_refs', 'w') as handle:
+        handle.write('5')  # reset VmHWM to the current RSS
+    before = status('VmRSS')
+    fn()
+    return status('VmHWM') - before
+
+
+@tag('slow')
+class ReceiptMemoryTests(StubServerMixin, SimpleTestCase):
+    """A few seconds; run with `manage.py test --tag slow`. Reads /proc, so Linux only."""
+    SIZE_MB = 40
+
+    def test_download_peak_rss_stays_flat(self):
+        url = self.serve('/scan.pdf', b'%PDF' + b'x' * (KB * KB - 4), self.SIZE_MB)
+
+        def spooled():
+            spool, _ = download_attachment(url)
+            spool.close()
+
+        def buffered():
+            requests.get(url, timeout=10).content
+
+        spooled_peak, buffered_peak = peak_rss_growth(spooled), peak_rss_growth(buffered)
+        print(f'\nreceipt download of {self.SIZE_MB} MB: peak RSS +{spooled_peak / KB / KB:.1f} MB spooled, '
+              f'+{buffered_peak / KB / KB:.1f} MB read into memory')
+        self.assertLess(spooled_peak, 16 * KB * KB)
+
+
+class RateLimitError(Exception):
+    pass
+
+
+class FlakyLLMClient(AsyncFakeLLMClient):
+    """AsyncFakeLLMClient that fails the first `failures` calls and records how many run at once."""
+
+    def __init__(self, latency=0, failures=0):
+        super().__init__(latency=latency)
+        self.failures = failures
+        self.calls = self.in_flight = self.max_in_flight = 0
+
+    async def _create(self, model, messages, **kwargs):
+        self.calls += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if self.calls <= self.failures:
+                raise RateLimitError('429 Too Many Requests')
+            if not self.latency:
+                return _fake_completion(model, messages)
+            return await super()._create(model, messages, **kwargs)
+        finally:
+            self.in_flight -= 1
+
+
+@override_settings(AI_LLM_BACKEND='fake', AI_FAKE_LLM_LATENCY=0, AI_PREDICTION_RETRY_BACKOFF=1.0)
+class PredictionTests(ServiceTestCase):
+    def setUp(self):
+        super().setUp()
+        llm_cache.clear()
+        self.addCleanup(llm_cache.clear)
+
+    def features(self, count):
+        return {farm_id: {'readings': farm_id} for farm_id in range(1, count + 1)}
+
+    @override_settings(AI_PREDICTION_CHUNK_SIZE=2)
+    def test_daily_predictions_fan_out_in_chunks(self):
+        owner = make_user('owner')
+        farms = [make_farm(owner, name=f'Farm {i}') for i in range(5)]
+        self.addCleanup(setattr, app.conf, 'task_always_eager', app.conf.task_always_eager)
+        app.conf.task_always_eager = True
+        header = []
+
+        def fan_out(tasks):
+            header.extend(tasks)
+            return chord(header)
+
+        with mock.patch('ai.tasks.chord', side_effect=fan_out), self.assertLogs('ai.tasks', 'INFO') as logs:
+            self.assertEqual(generate_daily_predictions(), {'farms': 5, 'chunks': 3})
+        self.assertEqual([[farm_id for farm_id, _ in task.args[0]] for task in header],
+                         [[farms[0].id, farms[1].id], [farms[2].id, farms[3].id], [farms[4].id]])
+        self.assertEqual(Prediction.objects.count(), 5)
+        self.assertIn('Daily predictions: 5 created, 0 failed across 5 farms', logs.output[-1])
+
+    @override_settings(AI_PREDICTION_CONCURRENCY=3)
+    def test_concurrency_is_bounded(self):
+        client = FlakyLLMClient(latency=0.01)
+        with mock.patch('ai.tasks.get_async_client', return_value=client):
+            results = asyncio.run(_predict_farms(self.features(12)))
+        self.assertEqual(sorted(results), list(range(1, 13)))
+        self.assertTrue(all(json.loads(result)['unit'] == 'kg' for result in results.values()))
+        self.assertEqual((client.calls, client.max_in_flight), (12, 3))
+
+    @override_settings(AI_PREDICTION_MAX_RETRIES=3)
+    def test_rate_limits_are_retried_with_backoff(self):
+        client = FlakyLLMClient(failures=2)
+        with mock.patch('ai.tasks.asyncio.sleep', new_callable=mock.AsyncMock) as sleep, \
+                mock.patch('ai.tasks.random.uniform', return_value=0):
+            content = asyncio.run(_complete_with_retry(client, 'Predict yield for farm 1.', 'farm 1'))
+        self.assertEqual(json.loads(content)['unit'], 'kg')
+        self.assertEqual([call.args[0] for call in sleep.await_args_list], [1.0, 2.0])
+
+    @override_settings(AI_PREDICTION_MAX_RETRIES=2)
+    def test_farm_is_counted_as_failed_after_last_retry(self):
+        farm = make_farm(make_user('owner'))
+        client = FlakyLLMClient(failures=100)
+        with mock.patch('ai.tasks.get_async_client', return_value=client), \
+                mock.patch('ai.tasks.asyncio.sleep', new_callable=mock.AsyncMock), self.assertLogs('ai.tasks', 'ERROR'):
+            result = predict_farm_chunk([[farm.id, {'readings': 0}]])
+        self.assertEqual(result, {'farms': 1, 'created': 0, 'failed': 1})
+        self.assertEqual(client.calls, 3)
+        self.assertFalse(Prediction.objects.exists())
+
+
+@tag('slow')
+@override_settings(AI_LLM_BACKEND='fake', AI_FAKE_LLM_LATENCY=0.05, AI_PREDICTION_CONCURRENCY=16)
+class PredictionThroughputTests(ServiceTestCase):
+    """A few seconds; run with `manage.py test --tag slow`."""
+    FARMS = 400
+
+    def test_chunk_throughput_against_fake_model(self):
+        llm_cache.clear()
+        self.addCleanup(llm_cache.clear)
+        owner = make_user('owner')
+        farm_ids = [make_farm(owner, name=f'Farm {i}').id for i in range(self.FARMS)]
+        started = time.perf_counter()
+        result = predict_farm_chunk([[farm_id, {'readings': farm_id}] for farm_id in farm_ids])
+        elapsed = time.perf_counter() - started
+        self.assertEqual(result['created'], self.FARMS)
+        rate = self.FARMS / elapsed
+        print(f'\npredictions: {rate:,.0f} farms/s at 16 concurrent 50 ms calls (sequential: 20 farms/s)')
+        # 16 in flight at 50 ms each is 320 farms/s at best.
+        self.assertGreater(rate, 0.6 * 16 / 0.05)
@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from analytics.models import AnalyticsAggregate, Report, FarmFinance
+from analytics.reports import REPORT_TYPES
 
 class AnalyticsAggregateSerializer(serializers.ModelSerializer):
     class Meta:
@@ -10,6 +11,22 @@ class ReportSerializer(serializers.ModelSerializer):
     class Meta:
         model = Report
         fields = '__all__'
+        read_only_fields = [
+            'generated_data', 'status', 'error', 'row_count', 'chunk_count', 'file_path', 'completed_at',
+        ]
+
+    def validate_report_type(self, value):
+        if value not in REPORT_TYPES:
+            raise serializers.ValidationError(f"Report type must be one of: {sorted(REPORT_TYPES)}")
+        return value
+
+    def validate(self, attrs):
+        builder = REPORT_TYPES.get(attrs.get('report_type', getattr(self.instance, 'report_type', None)))
+        if builder is not None:
+            error = builder.validate_parameters(attrs.get('parameters') or {})
+            if error:
+                raise serializers.ValidationError({'parameters': error})
+        return attrs
 
 class FarmFinanceSerializer(serializers.ModelSerializer):
     class Meta:
@@ -1,12 +1,24 @@
-from rest_framework import viewsets
+from django.conf import settings
+from django.db import transaction
+from django.urls import reverse
+from rest_framework import status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
 from analytics.models import AnalyticsAggregate, Report, FarmFinance
+from analytics.tasks import generate_report
+from farms.importer import CSVImportMixin
+from farms.models import Farm
+from utils.export import ExportMixin
+from utils.supabase_storage import get_storage
 from .serializers import AnalyticsAggregateSerializer, ReportSerializer, FarmFinanceSerializer
 
 class AnalyticsAggregateViewSet(viewsets.ModelViewSet):
     queryset = AnalyticsAggregate.objects.all()
     serializer_class = AnalyticsAggregateSerializer
     permission_classes = [IsAuthenticated]
+    keyset_ordering = ('-calculated_at', '-id')
 
     def get_queryset(self):
         return self.queryset.filter(farm__owner=self.request.user)
@@ -19,10 +31,71 @@ class ReportViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         return self.queryset.filter(farm__owner=self.request.user)
 
-class FarmFinanceViewSet(viewsets.ModelViewSet):
+    def create(self, request, *args, **kwargs):
+        """Queue the report for generation and answer 202 with the URL to poll."""
+        serializer = self.get_serializer(data=request.data)
+        serializer.fields['farm'].queryset = Farm.objects.filter(owner=request.user)
+        serializer.is_valid(raise_exception=True)
+        report = serializer.save(status='pending')
+        transaction.on_commit(lambda: generate_report.delay(report.id))
+
+        status_url = request.build_absolute_uri(reverse('report-status', args=[report.id]))
+        return Response(
+            {**serializer.data, 'status_url': status_url},
+            status=status.HTTP_202_ACCEPTED,
+            headers={'Location': status_url},
+        )
+
+    @action(detail=True, methods=['get'], url_path='status', url_name='status')
+    def report_status(self, request, pk=None):
+        report = self.get_object()
+        data = {
+            'id': report.id,
+            'status': report.status,
+            'error': report.error,
+            'row_count': report.row_count,
+            'chunk_count': report.chunk_count,
+            'completed_at': report.completed_at,
+        }
+        if report.status == 'completed':
+            if report.file_path:
+                storage = get_storage(settings.REPORT_STORAGE_BUCKET)
+                data['file_url'] = request.build_absolute_uri(
+                    storage.signed_url(report.file_path, settings.REPORT_URL_TTL)
+                )
+            else:
+                data['rows_url'] = request.build_absolute_uri(reverse('report-rows', args=[report.id]))
+        return Response(data)
+
+    @action(detail=True, methods=['get'], url_path='rows')
+    def rows(self, request, pk=None):
+        """One stored page of the report's rows: ?chunk=0,1,... up to chunk_count - 1."""
+        report = self.get_object()
+        try:
+            index = int(request.query_params.get('chunk', 0))
+        except ValueError:
+            raise NotFound("Invalid chunk.")
+        chunk = report.chunks.filter(index=index).values_list('rows', flat=True).first()
+        if chunk is None:
+            raise NotFound("Chunk not found.")
+
+        next_url = None
+        if index + 1 < report.chunk_count:
+            next_url = request.build_absolute_uri(f"{reverse('report-rows', args=[report.id])}?chunk={index + 1}")
+        return Response({
+            'columns': report.generated_data.get('columns', []),
+            'chunk': index,
+            'chunk_count': report.chunk_count,
+            'next': next_url,
+            'rows': chunk,
+        })
+
+class FarmFinanceViewSet(ExportMixin, CSVImportMixin, viewsets.ModelViewSet):
     queryset = FarmFinance.objects.all()
     serializer_class = FarmFinanceSerializer
     permission_classes = [IsAuthenticated]
+    max_page_size = 500
+    import_kind = 'finance'
 
     def get_queryset(self):
         return self.queryset.filter(farm__owner=self.request.user)
\ No newline at end of file
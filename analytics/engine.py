@@ -0,0 +1,267 @@
+from collections import defaultdict
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+from django.db import IntegrityError, transaction
+from django.db.models import Max
+from django.utils import timezone
+from crops.models import CropExpense
+from farms.cdc import publish_bulk
+from inventory.models import ProductionRecord
+from livestock.models import LivestockExpense
+from .models import AggregationWatermark, AnalyticsAggregate, FarmFinance
+
+# Source rows can commit out of id order, so each pass also rechecks this many
+# ids below a farm's watermark for rows it skipped; the ids it has counted in
+# that window are kept on the watermark so nothing is counted twice.
+LOOKBACK_IDS = 1000
+
+SEASONS = {12: 'DJF', 1: 'DJF', 2: 'DJF', 3: 'MAM', 4: 'MAM', 5: 'MAM',
+           6: 'JJA', 7: 'JJA', 8: 'JJA', 9: 'SON', 10: 'SON', 11: 'SON'}
+
+
+def _finance(row):
+    if row['type'] == 'income':
+        return [('revenue', row['date'], row['amount'])]
+    # Ledger expenses linked to a crop/livestock expense are already counted from that row.
+    if row['related_id'] is None:
+        return [(f"spend:{row['category']}", row['date'], row['amount'])]
+    return []
+
+
+def _expense(row):
+    return [(f"spend:{row['category']}", row['incurred_on'], row['amount'])]
+
+
+def _production(row):
+    return [(f"production:{row['item_type']}", row['date'], row['quantity'])]
+
+
+# source name -> (model, columns read, row -> [(metric_type, date, value)])
+SOURCES = {
+    'finance': (FarmFinance, ('farm_id', 'type', 'category', 'related_id', 'amount', 'date'), _finance),
+    'crop_expense': (CropExpense, ('farm_id', 'category', 'amount', 'incurred_on'), _expense),
+    'livestock_expense': (LivestockExpense, ('farm_id', 'category', 'amount', 'incurred_on'), _expense),
+    'production': (ProductionRecord, ('farm_id', 'item_type', 'quantity', 'date'), _production),
+}
+SOURCE_NAMES = {model: name for name, (model, _, _) in SOURCES.items()}
+
+
+def period_keys(day):
+    """The day, ISO week, month and meteorological season containing `day`, e.g. 'season:2026-SON'."""
+    if isinstance(day, datetime):
+        day = day.astimezone(dt_timezone.utc).date() if timezone.is_aware(day) else day.date()
+    iso_year, iso_week, _ = day.isocalendar()
+    season_year = day.year + 1 if day.month == 12 else day.year
+    return (
+        ('day', f'day:{day.isoformat()}'),
+        ('week', f'week:{iso_year}-W{iso_week:02d}'),
+        ('month', f'month:{day:%Y-%m}'),
+        ('season', f'season:{season_year}-{SEASONS[day.month]}'),
+    )
+
+
+def add_contributions(deltas, source, row, sign=1):
+    """Add (or with sign=-1 remove) one source row's contribution to `deltas`."""
+    _, _, contributions = SOURCES[source]
+    for metric_type, day, value in contributions(row):
+        if row['farm_id'] is None or day is None or value is None:
+            continue
+        for _, period in period_keys(day):
+            deltas[(row['farm_id'], period, metric_type[:50])] += sign * Decimal(value)
+
+
+def apply_deltas(deltas):
+    """
+    Fold {(farm_id, period, metric_type): delta} into AnalyticsAggregate with
+    one locking read, one bulk_update and one bulk_create.
+
+    Several sources write the same spend:<category> rows while holding only
+    their own watermark locks, so the rows are locked before they are read.
+    Rows that do not exist yet are created in a savepoint; if another writer
+    creates one first, the unique constraint rejects the insert and the fold
+    is retried once against the rows that now exist.
+    """
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    try:
+        _apply_deltas(deltas)
+    except IntegrityError:
+        _apply_deltas(deltas)
+
+
+def _apply_deltas(deltas):
+    farm_ids, periods, metrics = (set(part) for part in zip(*deltas))
+    existing = {
+        (aggregate.farm_id, aggregate.period, aggregate.metric_type): aggregate
+        for aggregate in AnalyticsAggregate.objects.select_for_update()
+        .filter(farm_id__in=farm_ids, period__in=periods, metric_type__in=metrics)
+        .order_by('pk')
+    }
+
+    now = timezone.now()
+    changed, created = [], []
+    for key, delta in deltas.items():
+        aggregate = existing.get(key)
+        if aggregate is None:
+            farm_id, period, metric_type = key
+            created.append(AnalyticsAggregate(
+                farm_id=farm_id,
+                period=period,
+                metric_type=metric_type,
+                metric_value=delta,
+                metadata={'grain': period.split(':', 1)[0], 'source': 'engine'},
+            ))
+        else:
+            aggregate.metric_value += delta
+            aggregate.calculated_at = now
+            changed.append(aggregate)
+    if created:
+        with transaction.atomic():
+            AnalyticsAggregate.objects.bulk_create(created, batch_size=1000)
+        publish_bulk(AnalyticsAggregate, created, 'create')
+    if changed:
+        AnalyticsAggregate.objects.bulk_update(changed, ['metric_value', 'calculated_at'], batch_size=1000)
+        publish_bulk(AnalyticsAggregate, changed, 'update', fields=['metric_value', 'calculated_at'])
+
+
+def lock_watermark(source, farm_id):
+    watermark, _ = AggregationWatermark.objects.select_for_update().get_or_create(source=source, farm_id=farm_id)
+    return watermark
+
+
+def is_counted(last_id, recent_ids, pk):
+    """Whether the row with `pk` has been folded in, given its farm watermark's last_id and recent_ids."""
+    if pk > last_id:
+        return False
+    return pk <= last_id - LOOKBACK_IDS or pk in recent_ids
+
+
+def process_farm(farm_id, sources=None, batch_size=5000):
+    """
+    Fold every row added since the farm's watermarks into its aggregates,
+    including rows in the lookback window that committed after higher ids
+    were processed; returns rows processed.
+    """
+    processed = 0
+    for source in sources or SOURCES:
+        model, columns, _ = SOURCES[source]
+        while True:
+            with transaction.atomic():
+                watermark = lock_watermark(source, farm_id)
+                rows = list(
+                    model.objects.filter(farm_id=farm_id, pk__gt=max(watermark.last_id - LOOKBACK_IDS, 0))
+                    .exclude(pk__in=watermark.recent_ids)
+                    .order_by('pk')
+                    .values('pk', *columns)[:batch_size]
+                )
+                if not rows:
+                    break
+                deltas = defaultdict(Decimal)
+                for row in rows:
+                    add_contributions(deltas, source, row)
+                apply_deltas(deltas)
+                watermark.last_id = max(watermark.last_id, rows[-1]['pk'])
+                floor = watermark.last_id - LOOKBACK_IDS
+                watermark.recent_ids = sorted(
+                    pk for pk in {*watermark.recent_ids, *(row['pk'] for row in rows)} if pk > floor
+                )
+                watermark.save(update_fields=['last_id', 'recent_ids', 'updated_at'])
+            processed += len(rows)
+            if len(rows) < batch_size:
+                break
+    return processed
+
+
+def sweep(batch_size=5000):
+    """
+    Process every farm that has rows beyond the sweep position of some source.
+
+    The sweep position (watermark with farm=None) only narrows the search to
+    the newest ids, less the lookback window; per-farm watermarks decide what
+    actually gets counted, so running the sweep twice never double counts.
+    """
+    processed = 0
+    for source, (model, _, _) in SOURCES.items():
+        with transaction.atomic():
+            position = lock_watermark(source, None)
+            newest = model.objects.filter(pk__gt=max(position.last_id - LOOKBACK_IDS, 0))
+            high = newest.aggregate(high=Max('pk'))['high']
+            if high is None:
+                continue
+            farm_ids = set(newest.filter(pk__lte=high).values_list('farm_id', flat=True).distinct()) - {None}
+            position.last_id = high
+            position.save(update_fields=['last_id', 'updated_at'])
+        for farm_id in farm_ids:
+            processed += process_farm(farm_id, sources=[source], batch_size=batch_size)
+    return processed
+
+
+def reset_farm(farm_id):
+    """Drop a farm's engine-maintained aggregates and watermarks so process_farm() rebuilds them."""
+    with transaction.atomic():
+        AggregationWatermark.objects.filter(farm_id=farm_id).delete()
+        AnalyticsAggregate.objects.filter(farm_id=farm_id, metadata__source='engine').delete()
+
+
+def counted_values(model, instance):
+    """The columns of `instance` that its analytics source counts, or None if `model` is not a source."""
+    source = SOURCE_NAMES.get(model)
+    if source is None:
+        return None
+    _, columns, _ = SOURCES[source]
+    return {name: getattr(instance, name) for name in columns}
+
+
+def apply_row_change(source, previous, current, pk):
+    """
+    Turn an update or delete of an already counted row into a delta.
+
+    `previous` and `current` are column dicts (either may be None). A side is
+    applied only if its farm's watermark has passed `pk`; rows beyond it are
+    still waiting for process_farm(), which will read their latest values.
+    """
+    apply_row_changes(source, [(pk, previous, current)])
+
+
+def apply_row_changes(source, changes):
+    """
+    apply_row_change() for many (pk, previous, current) rows. The farms'
+    existing watermarks are locked once each; a farm without one has nothing
+    counted yet, so there is nothing to fold (and nothing is created for it).
+    """
+    farm_ids = {
+        values['farm_id'] for _, previous, current in changes
+        for values in (previous, current) if values and values['farm_id'] is not None
+    }
+    watermarks = {
+        farm_id: (last_id, set(recent_ids))
+        for farm_id, last_id, recent_ids in AggregationWatermark.objects.select_for_update()
+        .filter(source=source, farm_id__in=farm_ids).order_by('farm_id')
+        .values_list('farm_id', 'last_id', 'recent_ids')
+    }
+    deltas = defaultdict(Decimal)
+    for pk, previous, current in changes:
+        for values, sign in ((previous, -1), (current, 1)):
+            if values and values['farm_id'] in watermarks and is_counted(*watermarks[values['farm_id']], pk):
+                add_contributions(deltas, source, values, sign)
+    apply_deltas(deltas)
+
+
+def fold_bulk_update(model, previous, instances):
+    """
+    Fold rows written with bulk_update(), which sends no signals, into the
+    aggregates. `previous` maps pk to the counted_values() taken before the
+    instances were changed.
+    """
+    source = SOURCE_NAMES.get(model)
+    if source is None:
+        return
+    changes = []
+    for instance in instances:
+        current = counted_values(model, instance)
+        if current != previous.get(instance.pk):
+            changes.append((instance.pk, previous.get(instance.pk), current))
+    if changes:
+        with transaction.atomic():
+            apply_row_changes(source, changes)
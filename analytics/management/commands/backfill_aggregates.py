@@ -0,0 +1,58 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Max
+
+from analytics.engine import SOURCES, lock_watermark, process_farm, reset_farm
+from farms.models import Farm
+
+
+class Command(BaseCommand):
+    help = "Populate AnalyticsAggregate from the source tables, one farm per worker thread."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--farm', action='append', type=int, dest='farms', help="Limit to a farm id (repeatable).")
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--rebuild', action='store_true', help="Drop existing engine aggregates and recompute.")
+
+    def handle(self, *args, **options):
+        if options['workers'] <= 0 or options['batch_size'] <= 0:
+            raise CommandError("--workers and --batch-size must be positive.")
+
+        farm_ids = options['farms'] or list(Farm.objects.order_by('pk').values_list('pk', flat=True))
+        if not options['farms']:
+            # Every farm is about to be brought up to date, so the sweep can start from here.
+            with transaction.atomic():
+                for source, (model, _, _) in SOURCES.items():
+                    position = lock_watermark(source, None)
+                    position.last_id = model.objects.aggregate(high=Max('pk'))['high'] or 0
+                    position.save(update_fields=['last_id', 'updated_at'])
+
+        # SQLite allows a single writer; parallel workers would only fail with "database is locked".
+        workers = 1 if connection.vendor == 'sqlite' else options['workers']
+        total = 0
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(self.backfill_farm, farm_id, options['rebuild'], options['batch_size']): farm_id
+                for farm_id in farm_ids
+            }
+            for future in as_completed(futures):
+                farm_id = futures[future]
+                try:
+                    processed = future.result()
+                except Exception as e:
+                    self.stderr.write(f"Farm {farm_id}: failed: {e}")
+                    continue
+                total += processed
+                self.stdout.write(f"Farm {farm_id}: {processed} rows processed")
+        self.stdout.write(f"{len(farm_ids)} farms, {total} rows processed")
+
+    def backfill_farm(self, farm_id, rebuild, batch_size):
+        try:
+            if rebuild:
+                reset_farm(farm_id)
+            return process_farm(farm_id, batch_size=batch_size)
+        finally:
+            # Each worker thread has its own connection; don't leave it open.
+            connection.close()
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("analytics", "0001_initial"),
+        ("farms", "0002_access_path_indexes"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="analyticsaggregate",
+            index=models.Index(
+                fields=["farm", "metric_type", "period"],
+                name="aggregate_farm_metric_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="farmfinance",
+            index=models.Index(fields=["farm", "-date"], name="finance_farm_date_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="farmfinance",
+            index=models.Index(
+                fields=["farm", "-created_at", "-id"], name="finance_farm_created_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="report",
+            index=models.Index(
+                fields=["farm", "-created_at", "-id"], name="report_farm_created_idx"
+            ),
+        ),
+    ]
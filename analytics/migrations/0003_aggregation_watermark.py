@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("analytics", "0002_access_path_indexes"),
+        ("farms", "0003_sensor_timeseries"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AggregationWatermark",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("source", models.CharField(max_length=50)),
+                ("last_id", models.BigIntegerField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "farm",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="farms.farm",
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("source", "farm"), name="watermark_source_farm_uniq"
+                    ),
+                    models.UniqueConstraint(
+                        condition=models.Q(("farm__isnull", True)),
+                        fields=("source",),
+                        name="watermark_source_sweep_uniq",
+                    ),
+                ],
+            },
+        ),
+    ]
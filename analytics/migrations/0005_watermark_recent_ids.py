@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:40
+
+from django.db import migrations, models
+
+LOOKBACK_IDS = 1000
+
+# analytics.engine.SOURCES at the time of this migration.
+SOURCE_MODELS = {
+    "finance": ("analytics", "FarmFinance"),
+    "crop_expense": ("crops", "CropExpense"),
+    "livestock_expense": ("livestock", "LivestockExpense"),
+    "production": ("inventory", "ProductionRecord"),
+}
+
+
+def seed_recent_ids(apps, schema_editor):
+    # Rows up to last_id were counted by the id-only watermark; record the ones
+    # inside the lookback window so the engine does not count them again.
+    AggregationWatermark = apps.get_model("analytics", "AggregationWatermark")
+    for watermark in AggregationWatermark.objects.filter(
+        farm__isnull=False, last_id__gt=0
+    ):
+        model = apps.get_model(*SOURCE_MODELS[watermark.source])
+        watermark.recent_ids = list(
+            model.objects.filter(
+                farm_id=watermark.farm_id,
+                pk__gt=watermark.last_id - LOOKBACK_IDS,
+                pk__lte=watermark.last_id,
+            )
+            .order_by("pk")
+            .values_list("pk", flat=True)
+        )
+        watermark.save(update_fields=["recent_ids"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("analytics", "0004_async_reports"),
+        ("crops", "0005_crop_tenancy"),
+        ("inventory", "0002_access_path_indexes"),
+        ("livestock", "0005_livestockunit_tenancy"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="aggregationwatermark",
+            name="recent_ids",
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.RunPython(seed_recent_ids, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:05
+
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+
+def merge_duplicates(apps, schema_editor):
+    # Racing writers could each create the same aggregate, every copy holding
+    # part of the total; fold the copies into the oldest row.
+    AnalyticsAggregate = apps.get_model("analytics", "AnalyticsAggregate")
+    duplicates = (
+        AnalyticsAggregate.objects.values("farm_id", "period", "metric_type")
+        .annotate(rows=Count("pk"), keep=Min("pk"), total=Sum("metric_value"))
+        .filter(rows__gt=1)
+    )
+    for group in duplicates.iterator():
+        copies = AnalyticsAggregate.objects.filter(
+            farm_id=group["farm_id"],
+            period=group["period"],
+            metric_type=group["metric_type"],
+        )
+        copies.filter(pk=group["keep"]).update(metric_value=group["total"])
+        copies.exclude(pk=group["keep"]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("analytics", "0005_watermark_recent_ids"),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="analyticsaggregate",
+            constraint=models.UniqueConstraint(
+                fields=("farm", "period", "metric_type"),
+                name="aggregate_farm_period_metric_uniq",
+            ),
+        ),
+    ]
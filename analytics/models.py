@@ -1,6 +1,8 @@
 from django.db import models
 from farms.models import Farm
+from farms.cdc import track_changes
 
+@track_changes(farm_path='farm')
 class AnalyticsAggregate(models.Model):
     farm = models.ForeignKey(Farm, on_delete=models.CASCADE)
     period = models.CharField(max_length=20)
@@ -9,14 +11,53 @@ class AnalyticsAggregate(models.Model):
     metadata = models.JSONField(default=dict)
     calculated_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['farm', 'metric_type', 'period'], name='aggregate_farm_metric_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['farm', 'period', 'metric_type'], name='aggregate_farm_period_metric_uniq'),
+        ]
+
 class Report(models.Model):
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+
     farm = models.ForeignKey(Farm, on_delete=models.CASCADE)
     report_type = models.CharField(max_length=50)
     parameters = models.JSONField(default=dict)
+    # Summary only; the rows live in ReportChunk or in the file at file_path.
     generated_data = models.JSONField(default=dict)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    error = models.TextField(blank=True)
+    row_count = models.PositiveIntegerField(default=0)
+    chunk_count = models.PositiveIntegerField(default=0)
+    file_path = models.CharField(max_length=255, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     generated_at = models.DateTimeField(auto_now=True)
+    completed_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['farm', '-created_at', '-id'], name='report_farm_created_idx'),
+        ]
+
+class ReportChunk(models.Model):
+    """One page of a generated report's rows, written by analytics.reports."""
+    report = models.ForeignKey(Report, on_delete=models.CASCADE, related_name='chunks')
+    index = models.PositiveIntegerField()
+    rows = models.JSONField(default=list)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['report', 'index'], name='reportchunk_report_index_uniq'),
+        ]
 
+@track_changes(farm_path='farm')
 class FarmFinance(models.Model):
     farm = models.ForeignKey(Farm, on_delete=models.CASCADE)
     type = models.CharField(max_length=20)
@@ -26,4 +67,31 @@ class FarmFinance(models.Model):
     currency = models.CharField(max_length=3, default='USD')
     description = models.TextField(blank=True)
     date = models.DateTimeField()
-    created_at = models.DateTimeField(auto_now_add=True)
\ No newline at end of file
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['farm', '-date'], name='finance_farm_date_idx'),
+            models.Index(fields=['farm', '-created_at', '-id'], name='finance_farm_created_idx'),
+        ]
+
+class AggregationWatermark(models.Model):
+    """
+    Highest source row id already folded into AnalyticsAggregate, per source
+    table and farm. The row with farm=None is the sweep's position across all
+    farms. See analytics.engine.
+    """
+    source = models.CharField(max_length=50)
+    farm = models.ForeignKey(Farm, on_delete=models.CASCADE, null=True, blank=True)
+    last_id = models.BigIntegerField(default=0)
+    # Ids within the engine's lookback window below last_id that are already counted.
+    recent_ids = models.JSONField(default=list, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['source', 'farm'], name='watermark_source_farm_uniq'),
+            models.UniqueConstraint(
+                fields=['source'], condition=models.Q(farm__isnull=True), name='watermark_source_sweep_uniq'
+            ),
+        ]
@@ -0,0 +1,192 @@
+from collections import defaultdict
+from decimal import Decimal
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from crops.models import CropExpense
+from inventory.models import ProductionRecord
+from livestock.models import LivestockExpense
+from utils.supabase_storage import get_storage
+from .models import FarmFinance, ReportChunk
+import csv
+import json
+import tempfile
+
+FORMATS = ('chunks', 'csv')
+
+
+class ReportBuilder:
+    """
+    Streams one report type's rows from the source tables.
+
+    `rows()` yields tuples matching `columns` straight from a server-side
+    iterator, so memory stays flat however many years a report spans;
+    `summarize()` folds each row into the small `summary` kept on the Report.
+    """
+    columns = ()
+
+    def __init__(self, report):
+        self.report = report
+        self.start = parse_date(report.parameters.get('start') or '')
+        self.end = parse_date(report.parameters.get('end') or '')
+        self.summary = {}
+
+    @classmethod
+    def validate_parameters(cls, parameters):
+        for key in ('start', 'end'):
+            if parameters.get(key) and parse_date(str(parameters[key])) is None:
+                return f"'{key}' must be a date in YYYY-MM-DD format."
+        if parameters.get('format', 'chunks') not in FORMATS:
+            return f"'format' must be one of {list(FORMATS)}."
+        return None
+
+    def date_range(self, lookup):
+        filters = {}
+        if self.start:
+            filters[f'{lookup}__gte'] = self.start
+        if self.end:
+            filters[f'{lookup}__lte'] = self.end
+        return filters
+
+    def iterate(self, queryset, *fields):
+        return queryset.values_list(*fields).iterator(chunk_size=settings.REPORT_ITERATOR_CHUNK_SIZE)
+
+    def rows(self):
+        raise NotImplementedError
+
+    def summarize(self, row):
+        pass
+
+    def finish(self):
+        return self.summary
+
+
+class FinanceReport(ReportBuilder):
+    columns = ('date', 'type', 'category', 'amount', 'currency', 'description')
+
+    def __init__(self, report):
+        super().__init__(report)
+        self.by_type = defaultdict(Decimal)
+        self.by_category = defaultdict(Decimal)
+
+    def rows(self):
+        queryset = FarmFinance.objects.filter(farm=self.report.farm, **self.date_range('date__date')).order_by('date', 'id')
+        return self.iterate(queryset, *self.columns)
+
+    def summarize(self, row):
+        _, type_, category, amount, _, _ = row
+        self.by_type[type_] += amount
+        self.by_category[category] += amount
+
+    def finish(self):
+        return {
+            'totals_by_type': dict(self.by_type),
+            'totals_by_category': dict(self.by_category),
+            'net': self.by_type.get('income', Decimal(0)) - self.by_type.get('expense', Decimal(0)),
+        }
+
+
+class ExpenseReport(ReportBuilder):
+    columns = ('source', 'incurred_on', 'category', 'amount', 'currency', 'additional_notes')
+
+    def __init__(self, report):
+        super().__init__(report)
+        self.by_category = defaultdict(Decimal)
+
+    def rows(self):
+        fields = self.columns[1:]
+        for source, model in (('crop', CropExpense), ('livestock', LivestockExpense)):
+            queryset = model.objects.filter(farm=self.report.farm, **self.date_range('incurred_on')).order_by('incurred_on', 'id')
+            for row in self.iterate(queryset, *fields):
+                yield (source, *row)
+
+    def summarize(self, row):
+        self.by_category[row[2]] += row[3]
+
+    def finish(self):
+        return {'totals_by_category': dict(self.by_category), 'total': sum(self.by_category.values(), Decimal(0))}
+
+
+class ProductionReport(ReportBuilder):
+    columns = ('date', 'item_type', 'quantity', 'unit', 'value_estimate', 'notes')
+
+    def __init__(self, report):
+        super().__init__(report)
+        self.quantities = defaultdict(Decimal)
+
+    def rows(self):
+        queryset = ProductionRecord.objects.filter(farm=self.report.farm, **self.date_range('date')).order_by('date', 'id')
+        return self.iterate(queryset, *self.columns)
+
+    def summarize(self, row):
+        self.quantities[f'{row[1]} ({row[3]})'] += row[2]
+
+    def finish(self):
+        return {'quantity_by_item': dict(self.quantities)}
+
+
+REPORT_TYPES = {
+    'finance': FinanceReport,
+    'expenses': ExpenseReport,
+    'production': ProductionReport,
+}
+
+
+def _jsonable(value):
+    return json.loads(json.dumps(value, cls=DjangoJSONEncoder))
+
+
+def generate(report):
+    """
+    Build `report` and store its rows: as ReportChunk pages of
+    REPORT_CHUNK_ROWS rows, or with format='csv' as a file in the configured
+    storage backend. Only the summary is kept in generated_data.
+    """
+    builder = REPORT_TYPES[report.report_type](report)
+    if report.parameters.get('format') == 'csv':
+        row_count, chunk_count = _write_csv(report, builder)
+    else:
+        row_count, chunk_count = _write_chunks(report, builder)
+
+    report.generated_data = _jsonable({'columns': builder.columns, 'summary': builder.finish()})
+    report.row_count = row_count
+    report.chunk_count = chunk_count
+    report.status = 'completed'
+    report.error = ''
+    report.completed_at = timezone.now()
+    report.save()
+
+
+def _write_chunks(report, builder):
+    ReportChunk.objects.filter(report=report).delete()
+    row_count = chunk_count = 0
+    page = []
+    for row in builder.rows():
+        builder.summarize(row)
+        page.append(row)
+        if len(page) == settings.REPORT_CHUNK_ROWS:
+            ReportChunk.objects.create(report=report, index=chunk_count, rows=_jsonable(page))
+            row_count += len(page)
+            chunk_count += 1
+            page = []
+    if page:
+        ReportChunk.objects.create(report=report, index=chunk_count, rows=_jsonable(page))
+        row_count += len(page)
+        chunk_count += 1
+    return row_count, chunk_count
+
+
+def _write_csv(report, builder):
+    row_count = 0
+    with tempfile.NamedTemporaryFile('w', newline='', suffix='.csv') as handle:
+        writer = csv.writer(handle)
+        writer.writerow(builder.columns)
+        for row in builder.rows():
+            builder.summarize(row)
+            writer.writerow(row)
+            row_count += 1
+        handle.flush()
+        path = f'reports/{report.farm_id}/{report.id}-{report.report_type}.csv'
+        report.file_path = get_storage(settings.REPORT_STORAGE_BUCKET).save(path, handle.name, 'text/csv')
+    return row_count, 0
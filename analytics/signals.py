@@ -0,0 +1,64 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_init, post_save, pre_save
+from farms.models import Farm
+from .engine import SOURCE_NAMES, SOURCES, apply_row_change
+
+# New rows are picked up by the update_analytics_aggregates sweep through the
+# watermarks. Edits and deletes of rows it has already counted are folded in
+# here, inside the writing transaction and under the farm's watermark lock, so
+# a concurrent sweep can neither miss nor double count them.
+
+
+def _columns(sender, instance):
+    _, columns, _ = SOURCES[SOURCE_NAMES[sender]]
+    return {name: getattr(instance, name) for name in columns}
+
+
+def remember_counted_values(sender, instance, **kwargs):
+    # Taken from __dict__ as the row is loaded, so it costs no query; rows
+    # loaded with some of the columns deferred are read in load_counted_values.
+    _, columns, _ = SOURCES[SOURCE_NAMES[sender]]
+    loaded = instance.__dict__
+    if all(name in loaded for name in columns):
+        instance._aggregate_previous = {name: loaded[name] for name in columns}
+
+
+def load_counted_values(sender, instance, raw=False, **kwargs):
+    if raw or instance._state.adding or instance.pk is None or '_aggregate_previous' in instance.__dict__:
+        return
+    _, columns, _ = SOURCES[SOURCE_NAMES[sender]]
+    instance._aggregate_previous = sender.objects.filter(pk=instance.pk).values(*columns).first()
+
+
+def fold_update(sender, instance, created=False, raw=False, **kwargs):
+    previous = instance.__dict__.pop('_aggregate_previous', None)
+    current = _columns(sender, instance)
+    instance._aggregate_previous = current
+    if created or raw or previous is None or current == previous:
+        return
+    with transaction.atomic():
+        apply_row_change(SOURCE_NAMES[sender], previous, current, instance.pk)
+
+
+def _deletes_farms(origin):
+    # Deleting a farm, or the user owning it, cascades to its aggregates and
+    # watermarks; folding its rows out first would only write rows for a farm
+    # that is going away.
+    model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return issubclass(model, (Farm, get_user_model()))
+
+
+def fold_delete(sender, instance, origin=None, **kwargs):
+    if _deletes_farms(origin):
+        return
+    with transaction.atomic():
+        apply_row_change(SOURCE_NAMES[sender], _columns(sender, instance), None, instance.pk)
+
+
+for model in SOURCE_NAMES:
+    post_init.connect(remember_counted_values, sender=model, dispatch_uid=f'aggregate_post_init_{model._meta.label}')
+    pre_save.connect(load_counted_values, sender=model, dispatch_uid=f'aggregate_pre_save_{model._meta.label}')
+    post_save.connect(fold_update, sender=model, dispatch_uid=f'aggregate_post_save_{model._meta.label}')
+    post_delete.connect(fold_delete, sender=model, dispatch_uid=f'aggregate_post_delete_{model._meta.label}')
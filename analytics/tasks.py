@@ -0,0 +1,33 @@
+from celery import shared_task
+import logging
+from .engine import process_farm, sweep
+from .models import Report
+from .reports import generate
+
+logger = logging.getLogger(__name__)
+
+@shared_task
+def update_analytics_aggregates():
+    """Fold source rows added since the last run into AnalyticsAggregate."""
+    return sweep()
+
+@shared_task
+def update_farm_aggregates(farm_id):
+    return process_farm(farm_id)
+
+@shared_task
+def generate_report(report_id):
+    try:
+        report = Report.objects.select_related('farm').get(id=report_id)
+    except Report.DoesNotExist:
+        logger.error(f"Report {report_id} not found")
+        return f"Report {report_id} not found"
+
+    Report.objects.filter(id=report_id).update(status='running', error='')
+    try:
+        generate(report)
+    except Exception as e:
+        logger.error(f"Report {report_id} failed: {e}")
+        Report.objects.filter(id=report_id).update(status='failed', error=str(e))
+        raise
+    return report.status
@@ -1,3 +1,300 @@
-from django.test import TestCase
+from analytics.engine import LOOKBACK_IDS, process_farm
+from analytics.models import AggregationWatermark, AnalyticsAggregate, FarmFinance, Report
+from analytics.tasks import generate_report
+from crops.models import CropExpense
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+from django.apps import apps
+from django.conf import settings
+from django.db import connection
+from django.test import override_settings, tag
+from farms.models import Farm
+from utils.testing import (
+    QueryPlanMixin, ServiceTestCase, make_crop, make_crop_expense, make_farm, make_field, make_finance, make_user,
+)
+from unittest import mock
+import importlib
+import os
+import tempfile
+import time
+import tracemalloc
 
-# Create your tests here.
+DAY = datetime(2026, 3, 2, 12, tzinfo=dt_timezone.utc)
+
+
+class AccessPathIndexTests(QueryPlanMixin, ServiceTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.farm = make_farm(make_user('owner'))
+        for _ in range(5):
+            make_finance(cls.farm)
+
+    def test_finance_by_date_uses_farm_date_index(self):
+        self.assertUsesIndex(FarmFinance.objects.filter(farm=self.farm).order_by('-date'), 'finance_farm_date_idx')
+
+    def test_finance_list_uses_farm_created_index(self):
+        self.assertUsesIndex(
+            FarmFinance.objects.filter(farm=self.farm).order_by('-created_at', '-id'), 'finance_farm_created_idx'
+        )
+
+
+class AggregateFoldTests(ServiceTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = make_user('owner')
+        self.farm = make_farm(self.user)
+
+    def spend(self, category='feed'):
+        aggregate = AnalyticsAggregate.objects.filter(
+            farm=self.farm, metric_type=f'spend:{category}', period='day:2026-03-02',
+        ).first()
+        return aggregate and aggregate.metric_value
+
+    def test_deleting_farm_with_counted_rows(self):
+        make_finance(self.farm, date=DAY)
+        make_crop_expense(make_crop(make_field(self.farm)))
+        process_farm(self.farm.id)
+        self.farm.delete()
+        self.assertFalse(AggregationWatermark.objects.exists())
+        self.assertFalse(CropExpense.objects.exists())
+
+    def test_deleting_user_with_uncounted_rows(self):
+        make_finance(self.farm, date=DAY)
+        self.user.delete()
+        self.assertFalse(Farm.objects.exists())
+        self.assertFalse(AggregationWatermark.objects.exists())
+
+    def test_edit_and_delete_fold_into_aggregates(self):
+        finance = make_finance(self.farm, amount='100.00', date=DAY)
+        process_farm(self.farm.id)
+        finance.amount = Decimal('40.00')
+        finance.save()
+        self.assertEqual(self.spend(), Decimal('40.00'))
+        FarmFinance.objects.get(pk=finance.pk).delete()
+        self.assertEqual(self.spend(), Decimal('0.00'))
+
+    def test_update_reads_no_previous_row(self):
+        finance = make_finance(self.farm, date=DAY)
+        process_farm(self.farm.id)
+        finance = FarmFinance.objects.get(pk=finance.pk)
+        finance.amount = Decimal('40.00')
+        # Savepoint, UPDATE, watermark lock, aggregate read and write, savepoint release.
+        with self.assertNumQueries(6):
+            finance.save()
+
+    def test_deferred_columns_are_read_before_save(self):
+        finance = make_finance(self.farm, date=DAY)
+        process_farm(self.farm.id)
+        finance = FarmFinance.objects.only('id').get(pk=finance.pk)
+        finance.amount = Decimal('40.00')
+        finance.save()
+        self.assertEqual(self.spend(), Decimal('40.00'))
+
+    def test_lower_id_committed_late_is_counted_once(self):
+        high = make_finance(self.farm, amount='10.00', date=DAY)
+        # A row whose id was allocated before `high` but whose transaction
+        # committed after the first pass.
+        FarmFinance.objects.filter(pk=high.pk).update(id=high.pk + 5)
+        process_farm(self.farm.id)
+        make_finance(self.farm, amount='1.00', date=DAY, id=high.pk)
+        for _ in range(2):
+            process_farm(self.farm.id)
+        self.assertEqual(self.spend(), Decimal('11.00'))
+
+        late = FarmFinance.objects.get(pk=high.pk)
+        late.amount = Decimal('2.00')
+        late.save()
+        self.assertEqual(self.spend(), Decimal('12.00'))
+
+    def test_lookback_window_is_bounded(self):
+        make_finance(self.farm, amount='10.00', date=DAY, id=LOOKBACK_IDS + 5000)
+        process_farm(self.farm.id)
+        # Below the window: taken as counted by an earlier pass, never rescanned.
+        make_finance(self.farm, amount='1.00', date=DAY, id=3000)
+        process_farm(self.farm.id)
+        watermark = AggregationWatermark.objects.get(source='finance', farm=self.farm)
+        self.assertEqual(watermark.recent_ids, [LOOKBACK_IDS + 5000])
+        self.assertEqual(self.spend(), Decimal('10.00'))
+
+    def test_migration_seeds_recent_ids(self):
+        rows = [make_finance(self.farm, date=DAY) for _ in range(3)]
+        AggregationWatermark.objects.create(source='finance', farm=self.farm, last_id=rows[1].pk)
+        migration = importlib.import_module('analytics.migrations.0005_watermark_recent_ids')
+        migration.seed_recent_ids(apps, None)
+        watermark = AggregationWatermark.objects.get(source='finance', farm=self.farm)
+        self.assertEqual(watermark.recent_ids, [rows[0].pk, rows[1].pk])
+
+    def test_sources_share_one_aggregate_row(self):
+        make_finance(self.farm, amount='10.00', date=DAY)
+        make_crop_expense(make_crop(make_field(self.farm)), amount='5.00', category='feed', incurred_on=DAY.date())
+        process_farm(self.farm.id)
+        self.assertEqual(self.spend(), Decimal('15.00'))
+        self.assertEqual(
+            AnalyticsAggregate.objects.filter(farm=self.farm, metric_type='spend:feed', period='day:2026-03-02').count(),
+            1,
+        )
+
+    def test_row_created_by_another_writer_is_added_to(self):
+        make_finance(self.farm, amount='10.00', date=DAY)
+        locked_read = AnalyticsAggregate.objects.select_for_update
+
+        def racing_writer():
+            # Another source creates the row after this fold read the aggregates.
+            if not AnalyticsAggregate.objects.exists():
+                AnalyticsAggregate.objects.create(
+                    farm=self.farm, period='day:2026-03-02', metric_type='spend:feed', metric_value=Decimal('5.00'),
+                )
+                return AnalyticsAggregate.objects.filter(pk__in=[])
+            return locked_read()
+
+        with mock.patch.object(AnalyticsAggregate.objects, 'select_for_update', side_effect=racing_writer):
+            process_farm(self.farm.id, sources=['finance'])
+        self.assertEqual(self.spend(), Decimal('15.00'))
+
+
+
+@override_settings(REPORT_CHUNK_ROWS=2)
+class ReportTests(ServiceTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = make_user('owner')
+        self.farm = make_farm(self.user)
+        for amount, type_ in (('100.00', 'income'), ('30.00', 'expense'), ('20.00', 'expense')):
+            make_finance(self.farm, amount=amount, type=type_, date=DAY)
+        make_finance(self.farm, amount='999.00', date=datetime(2025, 1, 1, tzinfo=dt_timezone.utc))
+        self.client.force_authenticate(self.user)
+
+    def request(self, **parameters):
+        with mock.patch.object(generate_report, 'delay') as delay, self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/reports/', {
+                'farm': self.farm.id, 'report_type': 'finance', 'parameters': {'start': '2026-01-01', **parameters},
+            }, format='json')
+        self.assertEqual(response.status_code, 202, response.data)
+        delay.assert_called_once_with(response.data['id'])
+        self.assertEqual(self.client.get(response['Location']).data['status'], 'pending')
+        generate_report(response.data['id'])
+        return self.client.get(response['Location']).data
+
+    def test_rows_are_stored_in_pages(self):
+        status = self.request()
+        self.assertEqual((status['status'], status['row_count'], status['chunk_count']), ('completed', 3, 2))
+        first = self.client.get(status['rows_url']).data
+        self.assertEqual(len(first['rows']), 2)
+        second = self.client.get(first['next']).data
+        self.assertEqual((len(second['rows']), second['next']), (1, None))
+        summary = Report.objects.get(pk=status['id']).generated_data['summary']
+        self.assertEqual(summary['net'], '50.00')
+
+    def test_csv_goes_to_private_storage(self):
+        with tempfile.TemporaryDirectory() as public, tempfile.TemporaryDirectory() as private, override_settings(
+            FILE_STORAGE_BACKEND='local', FILE_STORAGE_LOCAL_ROOT=public, FILE_STORAGE_PRIVATE_ROOT=private,
+        ):
+            status = self.request(format='csv')
+            report = Report.objects.get(pk=status['id'])
+            with open(f'{private}/reports/{report.file_path}') as handle:
+                lines = handle.read().splitlines()
+            self.assertEqual(os.listdir(public), [])
+
+            self.client.logout()
+            response = self.client.get(status['file_url'])
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(b''.join(response.streaming_content).decode().splitlines(), lines)
+        self.assertEqual(lines[0], 'date,type,category,amount,currency,description')
+        self.assertEqual(len(lines), 4)
+        self.assertNotIn(report.file_path, status['file_url'])
+
+    def test_signed_file_url_expires(self):
+        with tempfile.TemporaryDirectory() as private, \
+                override_settings(FILE_STORAGE_BACKEND='local', FILE_STORAGE_PRIVATE_ROOT=private):
+            status = self.request(format='csv')
+            later = time.time() + settings.REPORT_URL_TTL + 1
+            with self.assertLogs('agricore.requests', 'WARNING'):
+                with mock.patch('utils.supabase_storage.time.time', return_value=later):
+                    self.assertEqual(self.client.get(status['file_url']).status_code, 404)
+                self.assertEqual(self.client.get(status['file_url'][:-3] + 'xyz/').status_code, 404)
+
+    def test_bad_parameters_are_rejected(self):
+        with self.assertLogs('agricore.requests', 'WARNING'):
+            response = self.client.post('/api/reports/', {
+                'farm': self.farm.id, 'report_type': 'finance', 'parameters': {'start': 'last year'},
+            }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('parameters', response.data)
+
+
+@tag('slow')
+class ExportMemoryTests(ServiceTestCase):
+    """About three minutes; run with `manage.py test --tag slow`."""
+    ROWS = 1_000_000
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_user('owner')
+        farm = make_farm(cls.user)
+        # One INSERT ... SELECT; building a million model instances would take minutes.
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {FarmFinance._meta.db_table}
+                    (farm_id, type, category, related_id, amount, currency, description, date, created_at)
+                WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < %s)
+                SELECT %s, 'expense', 'feed', NULL, 12.50, 'KES', 'Dairy meal', %s, %s FROM n
+                """,
+                [cls.ROWS, farm.id, DAY, DAY],
+            )
+
+    def test_million_row_export_stays_under_memory_ceiling(self):
+        self.client.force_authenticate(self.user)
+        tracemalloc.start()
+        try:
+            response = self.client.get('/api/farm-finances/export/ndjson/')
+            lines = sum(chunk.count(b'\n') for chunk in response.streaming_content)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        self.assertEqual(lines, self.ROWS)
+        # The export itself is about 120 MB; only a couple of chunks may be held at once.
+        self.assertLess(peak, 16 * 1024 * 1024)
+
+
+@tag('slow')
+class ReportMemoryTests(ServiceTestCase):
+    """About a minute; run with `manage.py test --tag slow`."""
+    ROWS = 200_000
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.farm = make_farm(make_user('owner'))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {FarmFinance._meta.db_table}
+                    (farm_id, type, category, related_id, amount, currency, description, date, created_at)
+                WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < %s)
+                SELECT %s, 'expense', 'feed', NULL, 12.50, 'KES', 'Dairy meal', %s, %s FROM n
+                """,
+                [cls.ROWS, cls.farm.id, DAY, DAY],
+            )
+
+    def generate(self, **parameters):
+        report = Report.objects.create(
+            farm=self.farm, report_type='finance', parameters={'start': '2026-01-01', **parameters},
+        )
+        tracemalloc.start()
+        try:
+            generate_report(report.id)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        report.refresh_from_db()
+        self.assertEqual((report.status, report.row_count), ('completed', self.ROWS))
+        return peak
+
+    def test_chunked_report_stays_under_memory_ceiling(self):
+        # A single JSON document of these rows would be about 40 MB in memory.
+        self.assertLess(self.generate(), 16 * 1024 * 1024)
+
+    def test_csv_report_stays_under_memory_ceiling(self):
+        with tempfile.TemporaryDirectory() as private, \
+                override_settings(FILE_STORAGE_BACKEND='local', FILE_STORAGE_PRIVATE_ROOT=private):
+            self.assertLess(self.generate(format='csv'), 16 * 1024 * 1024)
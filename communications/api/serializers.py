@@ -5,13 +5,52 @@ class ConversationSerializer(serializers.ModelSerializer):
     class Meta:
         model = Conversation
         fields = '__all__'
+        read_only_fields = ('last_message', 'last_message_at')
 
 class ConversationParticipantSerializer(serializers.ModelSerializer):
     class Meta:
         model = ConversationParticipant
         fields = '__all__'
+        read_only_fields = ('last_read_id', 'last_read_at', 'unread_count', 'last_activity_at')
 
 class MessageSerializer(serializers.ModelSerializer):
     class Meta:
         model = Message
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+
+class ReadCursorSerializer(serializers.Serializer):
+    message_id = serializers.IntegerField(min_value=1, required=False)
+
+    def validate_message_id(self, value):
+        if not Message.objects.filter(conversation=self.context['conversation'], pk=value).exists():
+            raise serializers.ValidationError('Not a message in this conversation.')
+        return value
+
+
+class InboxSerializer(serializers.ModelSerializer):
+    conversation = ConversationSerializer(read_only=True)
+    last_message = MessageSerializer(source='conversation.last_message', read_only=True)
+
+    class Meta:
+        model = ConversationParticipant
+        fields = ('id', 'conversation', 'last_message', 'unread_count', 'last_read_id', 'last_activity_at')
+
+
+class MessageSearchSerializer(serializers.Serializer):
+    q = serializers.CharField(max_length=200)
+    page = serializers.IntegerField(min_value=1, max_value=100, default=1)
+    page_size = serializers.IntegerField(min_value=1, max_value=100, default=20)
+    highlight = serializers.BooleanField(default=False)
+
+class PresenceQuerySerializer(serializers.Serializer):
+    # Comma-separated, e.g. the conversation ids of one inbox page.
+    conversations = serializers.CharField(max_length=2000)
+
+    def validate_conversations(self, value):
+        try:
+            ids = {int(part) for part in value.split(',') if part.strip()}
+        except ValueError:
+            raise serializers.ValidationError("Expected comma-separated conversation ids.")
+        if not ids or len(ids) > 100:
+            raise serializers.ValidationError("Give between 1 and 100 conversation ids.")
+        return ids
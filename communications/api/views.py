@@ -1,7 +1,14 @@
-from rest_framework import viewsets
+from django.db import transaction
+from rest_framework import status, viewsets
+from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+from communications import presence
+from communications.search import search_messages
 from communications.models import Conversation, ConversationParticipant, Message
-from .serializers import ConversationSerializer, ConversationParticipantSerializer, MessageSerializer
+from .serializers import ConversationSerializer, ConversationParticipantSerializer, MessageSerializer, ReadCursorSerializer, InboxSerializer, MessageSearchSerializer, PresenceQuerySerializer
+import redis
 
 class ConversationViewSet(viewsets.ModelViewSet):
     queryset = Conversation.objects.all()
@@ -11,15 +18,118 @@ class ConversationViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         return self.queryset.filter(participants__user=self.request.user).distinct()
 
+    def get_participant(self, conversation):
+        return ConversationParticipant.objects.filter(conversation=conversation, user=self.request.user).order_by('pk').first()
+
+    @action(detail=True, methods=['get'])
+    def messages(self, request, pk=None):
+        """The conversation's history, newest first, one keyset page at a time."""
+        conversation = self.get_object()
+        queryset = Message.objects.filter(conversation=conversation)
+        page = self.paginate_queryset(queryset)
+        return self.get_paginated_response(MessageSerializer(page, many=True).data)
+
+    @action(detail=True, methods=['post'])
+    def read(self, request, pk=None):
+        """Advance the caller's read cursor to `message_id`, or to the newest message if omitted."""
+        conversation = self.get_object()
+        serializer = ReadCursorSerializer(data=request.data, context={'conversation': conversation})
+        serializer.is_valid(raise_exception=True)
+        message_id = serializer.validated_data.get('message_id')
+        if message_id is None:
+            message_id = Message.objects.filter(conversation=conversation).order_by('-id').values_list('id', flat=True).first() or 0
+        participant = self.get_participant(conversation)
+        participant.mark_read(message_id)
+        return Response({
+            'last_read_id': participant.last_read_id,
+            'last_read_at': participant.last_read_at,
+            'unread': participant.unread_count,
+        })
+
+    @action(detail=False, methods=['get'])
+    def unread(self, request):
+        """Unread message counts of all the caller's conversations, read from the participant counters."""
+        counts = ConversationParticipant.objects.filter(user=request.user).values_list('conversation_id', 'unread_count')
+        return Response({str(conversation_id): unread for conversation_id, unread in counts})
+
+    @action(detail=False, methods=['get'])
+    def inbox(self, request):
+        """
+        The caller's conversations, most recent activity first, each with its
+        last message and unread count. One query per page: a keyset scan of
+        participant_inbox_idx joined to the conversation and its last message.
+        """
+        self.keyset_ordering = ('-last_activity_at', '-id')
+        queryset = ConversationParticipant.objects.filter(user=request.user).select_related(
+            'conversation', 'conversation__last_message',
+        )
+        page = self.paginate_queryset(queryset)
+        return self.get_paginated_response(InboxSerializer(page, many=True).data)
+
+    @action(detail=False, methods=['get'])
+    def presence(self, request):
+        """
+        Who is online in ?conversations=1,2,3 (e.g. one inbox page), as
+        {conversation_id: [{user, online, last_seen}]}. Conversations the
+        caller is not in are left out. One query for the participants, one
+        Redis round trip for their presence.
+        """
+        params = PresenceQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        mine = ConversationParticipant.objects.filter(user=request.user).values('conversation_id')
+        members = list(ConversationParticipant.objects.filter(
+            conversation_id__in=params.validated_data['conversations'],
+        ).filter(conversation_id__in=mine).values_list('conversation_id', 'user_id'))
+        try:
+            states = presence.get_presence({user_id for _, user_id in members})
+        except redis.RedisError:
+            return Response({'detail': "Presence is unavailable."}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        result = {}
+        for conversation_id, user_id in members:
+            result.setdefault(str(conversation_id), []).append({'user': user_id, **states[user_id]})
+        return Response(result)
+
 class ConversationParticipantViewSet(viewsets.ModelViewSet):
     queryset = ConversationParticipant.objects.all()
     serializer_class = ConversationParticipantSerializer
     permission_classes = [IsAuthenticated]
+    keyset_ordering = ('-joined_at', '-id')
 
 class MessageViewSet(viewsets.ModelViewSet):
     queryset = Message.objects.all()
     serializer_class = MessageSerializer
     permission_classes = [IsAuthenticated]
+    max_page_size = 200
 
     def get_queryset(self):
-        return self.queryset.filter(conversation__participants__user=self.request.user)
\ No newline at end of file
+        return self.queryset.filter(conversation__participants__user=self.request.user)
+
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """
+        Full-text search over the caller's conversations, best match first.
+        Pages are numbered (?page=), since ranked results have no stable
+        keyset; ?highlight=true adds an HTML snippet, escaped, with matches
+        in <mark>.
+        """
+        params = MessageSearchSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        query, page, page_size = (params.validated_data[key] for key in ('q', 'page', 'page_size'))
+        hits = search_messages(
+            request.user, query, limit=page_size + 1, offset=(page - 1) * page_size,
+            highlight=params.validated_data['highlight'],
+        )
+        url = request.build_absolute_uri()
+        results = []
+        for message, rank, snippet in hits[:page_size]:
+            results.append({**MessageSerializer(message).data, 'rank': rank, 'highlight': snippet})
+        return Response({
+            'next': replace_query_param(url, 'page', page + 1) if len(hits) > page_size else None,
+            'previous': replace_query_param(url, 'page', page - 1) if page > 1 else None,
+            'results': results,
+        })
+
+    def perform_create(self, serializer):
+        # Keeps the message and its inbox counters (updated on post_save) in one transaction.
+        with transaction.atomic():
+            serializer.save()
\ No newline at end of file
@@ -1,45 +1,168 @@
+from asgiref.sync import sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
-from .models import Message, Conversation
-import json
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from utils.wire import FrameError, WireProtocolMixin, encode_frames
+from . import presence
+from .membership import get_members
+from .models import Message
+from .write_behind import conversation_group, get_buffer
+import logging
+import redis
+import time
+
+logger = logging.getLogger(__name__)
 
 # Your original is fine; added @database_sync_to_async for safety if needed
-class ChatConsumer(AsyncWebsocketConsumer):
+class ChatConsumer(WireProtocolMixin, AsyncWebsocketConsumer):
+    """
+    Chat for one conversation.
+
+    Clients send {'content': ...} to post a message, {'type': 'typing'} while
+    the user types ({'type': 'typing', 'typing': false} when they stop) and
+    {'type': 'heartbeat'} to stay online when otherwise idle. Typing and
+    presence events only go through the channel layer and the Redis presence
+    registry, never the database. Presence changes reach every conversation
+    the user is in, including connections lapsing (see expire_presence). Typing is forwarded at most once per half
+    CHAT_TYPING_TTL per connection however often the client sends it, and
+    receivers should drop an indicator not refreshed within 'ttl' seconds.
+
+    Clients offering the agricore.msgpack or agricore.json subprotocol get
+    compact binary frames (see utils.wire), and every server frame then has
+    a 'type' ('message', 'ack', 'typing' or 'presence'). Group events carry
+    frames already encoded by the sender.
+    """
+
     async def connect(self):
         self.conversation_id = self.scope['url_route']['kwargs']['conversation_id']
-        self.group_name = f'conversation_{self.conversation_id}'
+        self.group_name = conversation_group(self.conversation_id)
+        self.registered = False
+        self.typing_sent_at = None
+        self.presence_refreshed_at = 0
 
         # Check if user is participant
         if await self.is_participant():
             await self.channel_layer.group_add(self.group_name, self.channel_name)
             await self.accept()
+            self.registered = True
+            if await self.update_presence(presence.connect):
+                await self.send_presence(True)
         else:
             await self.close()
 
     async def disconnect(self, close_code):
         await self.channel_layer.group_discard(self.group_name, self.channel_name)
+        if self.registered:
+            await self.stop_typing()
+            if await self.update_presence(presence.disconnect):
+                await self.send_presence(False)
+
+    async def receive(self, text_data=None, bytes_data=None):
+        try:
+            data = self.decode(text_data, bytes_data)
+        except FrameError as e:
+            logger.warning(f"Closing chat connection of user {self.scope['user'].id}: {e}")
+            await self.close(code=e.code)
+            return
+        kind = data.get('type', 'message')
+        if time.monotonic() - self.presence_refreshed_at > settings.CHAT_PRESENCE_TTL / 3:
+            # Back from a lapse (e.g. a long stall) that expire_presence already announced.
+            if await self.update_presence(presence.heartbeat):
+                await self.send_presence(True)
+        if kind == 'typing':
+            if data.get('typing', True):
+                await self.start_typing()
+            else:
+                await self.stop_typing()
+            return
+        if kind == 'heartbeat':
+            return
 
-    async def receive(self, text_data):
-        data = json.loads(text_data)
-        message = await self.save_message(data['content'])
+        if settings.CHAT_WRITE_BEHIND:
+            message = await self.queue_message(data['content'])
+        else:
+            message = await self.save_message(data['content'])
+        # Receivers clear the sender's typing indicator when the message arrives.
+        self.typing_sent_at = None
         await self.channel_layer.group_send(
             self.group_name,
-            {'type': 'chat.message', 'message': message}
+            {'type': 'chat.message', 'frames': encode_frames(message, {'type': 'message', **message})}
         )
 
     async def chat_message(self, event):
-        await self.send(text_data=json.dumps(event['message']))
+        await self.send_frames(event['frames'])
 
-    @database_sync_to_async
-    def is_participant(self):
-        conversation = Conversation.objects.get(id=self.conversation_id)
-        return conversation.participants.filter(user=self.scope['user']).exists()
+    async def chat_ack(self, event):
+        # Write-behind mode: these messages are now stored; swap provisional ids for real ones.
+        await self.send_frames(event['frames'])
+
+    async def chat_typing(self, event):
+        if event['user_id'] != self.scope['user'].id:
+            await self.send_frames(event['frames'])
+
+    async def chat_presence(self, event):
+        if event['user_id'] != self.scope['user'].id:
+            await self.send_frames(event['frames'])
+
+    async def start_typing(self):
+        now = time.monotonic()
+        if self.typing_sent_at is not None and now - self.typing_sent_at < settings.CHAT_TYPING_TTL / 2:
+            return
+        self.typing_sent_at = now
+        await self.send_typing(True)
+
+    async def stop_typing(self):
+        if self.typing_sent_at is not None:
+            self.typing_sent_at = None
+            await self.send_typing(False)
+
+    async def send_typing(self, typing):
+        user = self.scope['user']
+        payload = {
+            'type': 'typing', 'user_id': user.id, 'username': user.username,
+            'typing': typing, 'ttl': settings.CHAT_TYPING_TTL,
+        }
+        await self.channel_layer.group_send(
+            self.group_name,
+            {'type': 'chat.typing', 'user_id': user.id, 'frames': encode_frames(payload)}
+        )
+
+    async def send_presence(self, online):
+        # Presence is per user, so every conversation of theirs hears it, not just this one.
+        await presence.broadcast(self.scope['user'].id, online)
+
+    async def update_presence(self, change):
+        # Presence is best effort: a Redis outage must not cost the user their chat.
+        self.presence_refreshed_at = time.monotonic()
+        try:
+            return await sync_to_async(change, thread_sensitive=False)(self.scope['user'].id, self.channel_name)
+        except redis.RedisError as e:
+            logger.error(f"Failed to update presence of user {self.scope['user'].id}: {e}")
+            return False
+
+    async def is_participant(self):
+        # Served from the membership cache, so reconnects do not each cost a query.
+        user = self.scope['user']
+        return user.is_authenticated and user.id in await get_members(int(self.conversation_id))
+
+    async def queue_message(self, content):
+        user = self.scope['user']
+        provisional_id = get_buffer().add(self.conversation_id, user.id, content)
+        if provisional_id is None:
+            # The buffer is full (the database is behind or down): write this one directly.
+            return await self.save_message(content)
+        return {'id': None, 'provisional_id': provisional_id, 'content': content, 'sender': user.username, 'created_at': str(timezone.now())}
 
     @database_sync_to_async
     def save_message(self, content):
-        message = Message.objects.create(
-            conversation_id=self.conversation_id,
-            sender=self.scope['user'],
-            content=content
-        )
-        return {'id': message.id, 'content': message.content, 'sender': message.sender.username, 'created_at': str(message.created_at)}
\ No newline at end of file
+        user = self.scope['user']
+        # The inbox counters are updated by a post_save handler; keep them in the same transaction.
+        with transaction.atomic():
+            message = Message.objects.create(
+                conversation_id=self.conversation_id,
+                sender=user,
+                content=content
+            )
+        return {'id': message.id, 'content': message.content, 'sender': user.username, 'created_at': str(message.created_at)}
@@ -0,0 +1,63 @@
+from collections import Counter
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce
+from .models import Conversation, ConversationParticipant, Message
+
+
+def record_messages(messages):
+    """
+    Fold newly inserted messages into the inbox columns: each conversation's
+    last_message/last_message_at, and each participant's unread_count and
+    last_activity_at. Costs two UPDATEs per conversation, whatever the
+    number of messages or participants; runs in the caller's transaction
+    so the counters commit with the rows.
+    """
+    by_conversation = {}
+    for message in messages:
+        by_conversation.setdefault(message.conversation_id, []).append(message)
+
+    with transaction.atomic():
+        for conversation_id in sorted(by_conversation):
+            batch = by_conversation[conversation_id]
+            latest = max(batch, key=lambda message: message.id)
+            # A concurrent, newer insert may already have moved last_message further.
+            Conversation.objects.filter(
+                Q(last_message__isnull=True) | Q(last_message_id__lt=latest.id), pk=conversation_id,
+            ).update(last_message=latest, last_message_at=latest.created_at)
+
+            # Every participant gains the whole batch as unread, minus what they sent themselves.
+            sent = Counter(message.sender_id for message in batch)
+            own = Case(
+                *(When(user_id=sender_id, then=Value(count)) for sender_id, count in sent.items()),
+                default=Value(0),
+                output_field=IntegerField(),
+            )
+            ConversationParticipant.objects.filter(conversation_id=conversation_id).update(
+                unread_count=F('unread_count') + len(batch) - own,
+                last_activity_at=latest.created_at,
+            )
+
+
+def forget_message(message):
+    """
+    Take a deleted message back out of the inbox columns: participants who
+    had not read it lose it from unread_count, and if it was the last
+    message (the foreign key has already been set to NULL) the newest one
+    left takes its place, along with the participants' last_activity_at.
+    """
+    with transaction.atomic():
+        ConversationParticipant.objects.filter(
+            conversation_id=message.conversation_id, last_read_id__lt=message.id, unread_count__gt=0,
+        ).exclude(user_id=message.sender_id).update(unread_count=F('unread_count') - 1)
+
+        newest = Message.objects.filter(conversation=OuterRef('pk')).order_by('-id')
+        replaced = Conversation.objects.filter(pk=message.conversation_id, last_message__isnull=True).update(
+            last_message_id=Subquery(newest.values('id')[:1]),
+            last_message_at=Subquery(newest.values('created_at')[:1]),
+        )
+        if replaced:
+            activity = Conversation.objects.filter(pk=OuterRef('conversation_id')).values('last_message_at')
+            ConversationParticipant.objects.filter(conversation_id=message.conversation_id).update(
+                last_activity_at=Coalesce(Subquery(activity), 'joined_at'),
+            )
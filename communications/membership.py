@@ -0,0 +1,38 @@
+from channels.db import database_sync_to_async
+from django.conf import settings
+from utils.ttl_cache import TTLCache
+from .models import ConversationParticipant
+
+# Participant user ids per conversation, and conversation ids per user;
+# communications.signals drops the entries a participant change affects.
+conversation_members = TTLCache(settings.WS_AUTH_CACHE_SIZE, ttl=settings.WS_AUTH_CACHE_TTL)
+user_conversations = TTLCache(settings.WS_AUTH_CACHE_SIZE, ttl=settings.WS_AUTH_CACHE_TTL)
+
+
+@database_sync_to_async
+def load_members(conversation_id):
+    return frozenset(
+        ConversationParticipant.objects.filter(conversation_id=conversation_id).values_list('user_id', flat=True)
+    )
+
+
+async def get_members(conversation_id):
+    """User ids taking part in the conversation; an empty set if it does not exist."""
+    return await conversation_members.get_or_load(conversation_id, lambda: load_members(conversation_id))
+
+
+@database_sync_to_async
+def load_conversations(user_id):
+    return frozenset(
+        ConversationParticipant.objects.filter(user_id=user_id).values_list('conversation_id', flat=True)
+    )
+
+
+async def get_conversations(user_id):
+    """Ids of the conversations the user takes part in."""
+    return await user_conversations.get_or_load(user_id, lambda: load_conversations(user_id))
+
+
+def invalidate_members(conversation_id, user_id):
+    conversation_members.pop(conversation_id)
+    user_conversations.pop(user_id)
@@ -0,0 +1,82 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:59
+
+from django.db import migrations, models
+
+BATCH_SIZE = 2000
+
+
+def read_by_to_cursors(apps, schema_editor):
+    # A participant's cursor becomes the newest message listing them in
+    # read_by; older messages they never marked count as read from now on.
+    Message = apps.get_model("communications", "Message")
+    ConversationParticipant = apps.get_model(
+        "communications", "ConversationParticipant"
+    )
+
+    cursors = {}
+    last_pk = 0
+    while True:
+        batch = list(
+            Message.objects.filter(pk__gt=last_pk)
+            .exclude(read_by="")
+            .order_by("pk")
+            .values_list("pk", "conversation_id", "read_by", "created_at")[:BATCH_SIZE]
+        )
+        if not batch:
+            break
+        for pk, conversation_id, read_by, created_at in batch:
+            for user_id in read_by.split(","):
+                user_id = user_id.strip()
+                if user_id.isdigit():
+                    # Rows come in pk order, so the last one seen is the newest.
+                    cursors[(conversation_id, int(user_id))] = (pk, created_at)
+        last_pk = batch[-1][0]
+
+    if not cursors:
+        return
+    last_pk = 0
+    while True:
+        participants = list(
+            ConversationParticipant.objects.filter(pk__gt=last_pk).order_by("pk")[
+                :BATCH_SIZE
+            ]
+        )
+        if not participants:
+            break
+        changed = []
+        for participant in participants:
+            cursor = cursors.get((participant.conversation_id, participant.user_id))
+            if cursor is not None:
+                participant.last_read_id, participant.last_read_at = cursor
+                changed.append(participant)
+        ConversationParticipant.objects.bulk_update(
+            changed, ["last_read_id", "last_read_at"]
+        )
+        last_pk = participants[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("communications", "0003_access_path_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="conversationparticipant",
+            name="last_read_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="conversationparticipant",
+            name="last_read_id",
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name="message",
+            index=models.Index(
+                fields=["conversation", "id"], name="message_conv_id_idx"
+            ),
+        ),
+        migrations.RunPython(read_by_to_cursors, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:59
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("communications", "0004_read_cursors"),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name="message",
+            name="read_by",
+        ),
+    ]
@@ -0,0 +1,96 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:09
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+BATCH_SIZE = 1000
+
+
+def backfill_inbox(apps, schema_editor):
+    Conversation = apps.get_model("communications", "Conversation")
+    ConversationParticipant = apps.get_model(
+        "communications", "ConversationParticipant"
+    )
+    Message = apps.get_model("communications", "Message")
+
+    newest = Message.objects.filter(conversation=OuterRef("pk")).order_by("-id")
+    unread = (
+        Message.objects.filter(
+            conversation=OuterRef("conversation"), id__gt=OuterRef("last_read_id")
+        )
+        .exclude(sender=OuterRef("user"))
+        .order_by()
+        .values("conversation")
+        .annotate(count=Count("id"))
+        .values("count")
+    )
+    last_pk = 0
+    while True:
+        ids = list(
+            Conversation.objects.filter(pk__gt=last_pk)
+            .order_by("pk")
+            .values_list("pk", flat=True)[:BATCH_SIZE]
+        )
+        if not ids:
+            break
+        Conversation.objects.filter(pk__in=ids).update(
+            last_message_id=Subquery(newest.values("id")[:1]),
+            last_message_at=Subquery(newest.values("created_at")[:1]),
+        )
+        conversation_activity = Conversation.objects.filter(
+            pk=OuterRef("conversation")
+        ).values("last_message_at")
+        ConversationParticipant.objects.filter(conversation_id__in=ids).update(
+            unread_count=Coalesce(Subquery(unread), Value(0)),
+            last_activity_at=Coalesce(Subquery(conversation_activity), "joined_at"),
+        )
+        last_pk = ids[-1]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("communications", "0005_remove_message_read_by"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="conversation",
+            name="last_message",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="+",
+                to="communications.message",
+            ),
+        ),
+        migrations.AddField(
+            model_name="conversation",
+            name="last_message_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="conversationparticipant",
+            name="last_activity_at",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name="conversationparticipant",
+            name="unread_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name="conversationparticipant",
+            index=models.Index(
+                fields=["user", "-last_activity_at", "-id"],
+                name="participant_inbox_idx",
+            ),
+        ),
+        migrations.RunPython(backfill_inbox, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:20
+
+from django.db import migrations
+
+# The full-text index is kept outside the ORM (see communications.search):
+# a tsvector table with a GIN index on PostgreSQL, an FTS5 table on SQLite.
+# Other databases get no index and search falls back to a substring match.
+# Existing messages are indexed by the index_messages task.
+POSTGRES_SCHEMA = [
+    "CREATE TABLE communications_messagesearch ("
+    " message_id bigint PRIMARY KEY REFERENCES communications_message (id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED,"
+    " conversation_id bigint NOT NULL,"
+    " document tsvector NOT NULL)",
+    "CREATE INDEX messagesearch_document_idx ON communications_messagesearch USING GIN (document)",
+    "CREATE INDEX messagesearch_conversation_idx ON communications_messagesearch (conversation_id)",
+]
+SQLITE_SCHEMA = [
+    "CREATE VIRTUAL TABLE communications_message_fts USING fts5("
+    "content, conversation_id UNINDEXED, tokenize='unicode61')",
+]
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    statements = {"postgresql": POSTGRES_SCHEMA, "sqlite": SQLITE_SCHEMA}.get(
+        vendor, []
+    )
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    table = {
+        "postgresql": "communications_messagesearch",
+        "sqlite": "communications_message_fts",
+    }.get(schema_editor.connection.vendor)
+    if table:
+        schema_editor.execute(f"DROP TABLE IF EXISTS {table}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("communications", "0006_inbox_counters"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
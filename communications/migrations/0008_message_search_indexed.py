@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:13
+
+from django.db import migrations, models
+
+# Messages already in the full-text index are flagged so the index_messages
+# task does not go through them again.
+MARK_INDEXED = {
+    "postgresql": "UPDATE communications_message SET search_indexed = true"
+    " WHERE id IN (SELECT message_id FROM communications_messagesearch)",
+    "sqlite": "UPDATE communications_message SET search_indexed = 1"
+    " WHERE id IN (SELECT rowid FROM communications_message_fts)",
+}
+
+
+def mark_indexed(apps, schema_editor):
+    statement = MARK_INDEXED.get(schema_editor.connection.vendor)
+    if statement:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("communications", "0007_message_search_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="message",
+            name="search_indexed",
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.RunPython(mark_indexed, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="message",
+            index=models.Index(
+                condition=models.Q(("search_indexed", False)),
+                fields=["id"],
+                name="message_unindexed_idx",
+            ),
+        ),
+    ]
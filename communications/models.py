@@ -1,16 +1,72 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 from accounts.models import CustomUser, Attachment
 
 class Conversation(models.Model):
     title = models.CharField(max_length=255)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Maintained by communications.inbox.record_messages() whenever messages are inserted.
+    last_message = models.ForeignKey('Message', on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    last_message_at = models.DateTimeField(blank=True, null=True)
+
+    def delete(self, *args, **kwargs):
+        # The messages go in one statement: through the collector, the Message
+        # post_delete receivers would load and handle them row by row, only to
+        # update counters that are deleted with the conversation.
+        from .search import remove_conversation
+        with transaction.atomic():
+            Conversation.objects.filter(pk=self.pk).update(last_message=None)
+            messages = Message.objects.filter(conversation=self)
+            remove_conversation(self.pk)
+            count = messages._raw_delete(messages.db)
+            deleted, by_model = super().delete(*args, **kwargs)
+        if count:
+            by_model[Message._meta.label] = count
+        return deleted + count, by_model
 
 class ConversationParticipant(models.Model):
     conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name='participants')
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
     joined_at = models.DateTimeField(auto_now_add=True)
     left_at = models.DateTimeField(blank=True, null=True)
+    # Read cursor: every message of the conversation with id <= last_read_id has been read.
+    last_read_id = models.BigIntegerField(default=0)
+    last_read_at = models.DateTimeField(blank=True, null=True)
+    # Inbox counters, maintained with the conversation's last_message: messages from
+    # others after the read cursor, and the inbox sort key (last message, else joining).
+    unread_count = models.PositiveIntegerField(default=0)
+    last_activity_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'conversation'], name='participant_user_conv_idx'),
+            models.Index(fields=['user', '-last_activity_at', '-id'], name='participant_inbox_idx'),
+        ]
+
+    def mark_read(self, message_id):
+        """Move the cursor forward to `message_id` and recount unread messages; a cursor never moves back."""
+        if message_id <= self.last_read_id:
+            return False
+        unread = (
+            Message.objects.filter(conversation_id=OuterRef('conversation_id'), id__gt=message_id)
+            .exclude(sender_id=OuterRef('user_id'))
+            .order_by().values('conversation_id').annotate(count=Count('id')).values('count')
+        )
+        with transaction.atomic():
+            # Lock the row first: the recount then runs in a statement of its own, whose
+            # snapshot includes every insert that bumped unread_count before the lock
+            # was granted, and inserts after it wait for this one to commit.
+            # The filter keeps a concurrent, further-ahead mark from being overwritten.
+            behind = ConversationParticipant.objects.select_for_update().filter(pk=self.pk, last_read_id__lt=message_id)
+            updated = bool(list(behind.values_list('pk', flat=True))) and behind.update(
+                last_read_id=message_id, last_read_at=timezone.now(),
+                unread_count=Coalesce(Subquery(unread), Value(0)),
+            )
+        self.refresh_from_db(fields=['last_read_id', 'last_read_at', 'unread_count'])
+        return bool(updated)
 
 class Message(models.Model):
     conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE)
@@ -18,4 +74,12 @@ class Message(models.Model):
     content = models.TextField()
     attachment = models.ForeignKey(Attachment, on_delete=models.SET_NULL, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
-    read_by = models.TextField(blank=True)  # e.g., comma-separated user IDs
\ No newline at end of file
+    # Set by communications.search.index_messages once the message is in the full-text index.
+    search_indexed = models.BooleanField(default=False, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['conversation', '-created_at', '-id'], name='message_conv_created_idx'),
+            models.Index(fields=['conversation', 'id'], name='message_conv_id_idx'),
+            models.Index(fields=['id'], condition=models.Q(search_indexed=False), name='message_unindexed_idx'),
+        ]
@@ -0,0 +1,129 @@
+from channels.layers import get_channel_layer
+from datetime import datetime, timezone as dt_timezone
+from django.conf import settings
+from utils.wire import encode_frames
+from .membership import get_conversations
+from .write_behind import conversation_group
+import logging
+import redis
+import time
+
+logger = logging.getLogger(__name__)
+
+# Presence never touches the database. Each user has a sorted set of their
+# open chat connections (channel names) scored by when each one expires; a
+# connection that stops heartbeating drops out on its own once its score is
+# in the past, and the whole key expires when the last one does. The time a
+# user was last seen is kept in one hash for all users. Users believed online
+# are kept in ONLINE_KEY, scored by when their last connection expires, so
+# expire() can find the ones whose connections lapsed without a disconnect.
+LAST_SEEN_KEY = 'chat:presence:last_seen'
+ONLINE_KEY = 'chat:presence:online'
+
+_registry = None
+
+
+def presence_key(user_id):
+    return f'chat:presence:{user_id}'
+
+
+def get_registry():
+    """Redis connection holding the presence registry."""
+    global _registry
+    if _registry is None:
+        _registry = redis.Redis.from_url(settings.REDIS_URL, decode_responses=True)
+    return _registry
+
+
+def _refresh(pipe, user_id, channel_name, now):
+    key = presence_key(user_id)
+    pipe.zremrangebyscore(key, '-inf', now)
+    pipe.zadd(key, {channel_name: now + settings.CHAT_PRESENCE_TTL})
+    pipe.expire(key, settings.CHAT_PRESENCE_TTL)
+    pipe.zadd(ONLINE_KEY, {user_id: now + settings.CHAT_PRESENCE_TTL}, gt=True)
+    pipe.hset(LAST_SEEN_KEY, user_id, int(now))
+
+
+def connect(user_id, channel_name):
+    """Register a connection; returns True if the user was offline until now."""
+    now = time.time()
+    pipe = get_registry().pipeline(transaction=True)
+    _refresh(pipe, user_id, channel_name, now)
+    pipe.zcard(presence_key(user_id))
+    return pipe.execute()[-1] == 1
+
+
+def heartbeat(user_id, channel_name):
+    """
+    Push back the expiry of a connection, re-registering it if it had
+    already lapsed; returns True if the user was offline until now.
+    """
+    now = time.time()
+    pipe = get_registry().pipeline(transaction=True)
+    pipe.zcount(presence_key(user_id), f'({now}', '+inf')
+    _refresh(pipe, user_id, channel_name, now)
+    return pipe.execute()[0] == 0
+
+
+def disconnect(user_id, channel_name):
+    """Drop a connection; returns True if it was the user's last live one."""
+    now = time.time()
+    key = presence_key(user_id)
+    pipe = get_registry().pipeline(transaction=True)
+    pipe.zrem(key, channel_name)
+    pipe.zremrangebyscore(key, '-inf', now)
+    pipe.zcard(key)
+    pipe.hset(LAST_SEEN_KEY, user_id, int(now))
+    return pipe.execute()[2] == 0 and _forget(user_id, now)
+
+
+def _forget(user_id, now):
+    """Drop the user from ONLINE_KEY unless a connection is live; returns True if this call dropped them."""
+    key = presence_key(user_id)
+    with get_registry().pipeline(transaction=True) as pipe:
+        try:
+            # A connect between the check and the removal aborts the removal.
+            pipe.watch(key)
+            if pipe.zcount(key, f'({now}', '+inf'):
+                return False
+            pipe.multi()
+            pipe.zrem(ONLINE_KEY, user_id)
+            return pipe.execute()[0] == 1
+        except redis.WatchError:
+            return False
+
+
+def expire():
+    """Take users whose connections all lapsed off ONLINE_KEY; returns their ids."""
+    now = time.time()
+    lapsed = get_registry().zrangebyscore(ONLINE_KEY, '-inf', now)
+    return [int(user_id) for user_id in lapsed if _forget(user_id, now)]
+
+
+async def broadcast(user_id, online):
+    """Tell every conversation the user takes part in that they came online or went offline."""
+    payload = {'type': 'presence', 'user_id': user_id, 'online': online}
+    event = {'type': 'chat.presence', 'user_id': user_id, 'frames': encode_frames(payload)}
+    channel_layer = get_channel_layer()
+    for conversation_id in await get_conversations(user_id):
+        await channel_layer.group_send(conversation_group(conversation_id), event)
+
+
+def get_presence(user_ids):
+    """{user_id: {'online': bool, 'last_seen': datetime or None}} for `user_ids`, in one round trip."""
+    user_ids = list(user_ids)
+    if not user_ids:
+        return {}
+    now = time.time()
+    pipe = get_registry().pipeline(transaction=False)
+    for user_id in user_ids:
+        pipe.zcount(presence_key(user_id), f'({now}', '+inf')
+    pipe.hmget(LAST_SEEN_KEY, user_ids)
+    *live, last_seen = pipe.execute()
+    presence = {}
+    for user_id, count, seen in zip(user_ids, live, last_seen):
+        presence[user_id] = {
+            'online': count > 0,
+            'last_seen': datetime.fromtimestamp(int(seen), tz=dt_timezone.utc) if seen else None,
+        }
+    return presence
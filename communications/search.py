@@ -0,0 +1,178 @@
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils.html import escape
+from .models import ConversationParticipant, Message
+
+# Messages are indexed by the index_messages task after they commit. Each
+# message carries a search_indexed flag, so a run picks up every message not
+# indexed yet, however late it committed relative to its id.
+
+# The index lives outside the ORM: communications_messagesearch (tsvector with a
+# GIN index) on PostgreSQL, the FTS5 table communications_message_fts (rowid =
+# message id) on SQLite; see migration 0007.
+
+# Highlights are delimited with these private-use characters in SQL, and the
+# snippet is HTML-escaped before they become <mark> tags, so message content
+# can never inject markup.
+START_MATCH = '\ue000'
+STOP_MATCH = '\ue001'
+
+
+class PostgresIndex:
+    def add(self, cursor, message_ids):
+        # An edit may already have indexed the message through reindex().
+        cursor.execute(
+            "INSERT INTO communications_messagesearch (message_id, conversation_id, document)"
+            " SELECT m.id, m.conversation_id, to_tsvector(%s::regconfig, m.content)"
+            " FROM communications_message m WHERE m.id = ANY(%s)"
+            " ON CONFLICT (message_id) DO NOTHING",
+            [settings.CHAT_SEARCH_CONFIG, list(message_ids)],
+        )
+
+    def reindex(self, cursor, message):
+        cursor.execute(
+            "INSERT INTO communications_messagesearch (message_id, conversation_id, document)"
+            " VALUES (%s, %s, to_tsvector(%s::regconfig, %s))"
+            " ON CONFLICT (message_id) DO UPDATE SET document = EXCLUDED.document, conversation_id = EXCLUDED.conversation_id",
+            [message.id, message.conversation_id, settings.CHAT_SEARCH_CONFIG, message.content],
+        )
+
+    def remove(self, cursor, message_id):
+        # The foreign key cascades.
+        pass
+
+    def remove_conversation(self, cursor, conversation_id):
+        pass
+
+    def search(self, cursor, user_id, query, limit, offset, highlight):
+        headline = "ts_headline(%s::regconfig, m.content, q, %s)" if highlight else "NULL"
+        options = f'StartSel={START_MATCH}, StopSel={STOP_MATCH}, MaxFragments=2'
+        params = [settings.CHAT_SEARCH_CONFIG, options] if highlight else []
+        cursor.execute(
+            f"SELECT s.message_id, ts_rank(s.document, q) AS rank, {headline}"
+            " FROM communications_messagesearch s"
+            " JOIN communications_message m ON m.id = s.message_id,"
+            " websearch_to_tsquery(%s::regconfig, %s) q"
+            " WHERE s.document @@ q AND s.conversation_id IN ("
+            "  SELECT conversation_id FROM communications_conversationparticipant WHERE user_id = %s)"
+            " ORDER BY rank DESC, s.message_id DESC LIMIT %s OFFSET %s",
+            params + [settings.CHAT_SEARCH_CONFIG, query, user_id, limit, offset],
+        )
+        return cursor.fetchall()
+
+
+class SQLiteIndex:
+    def add(self, cursor, message_ids):
+        placeholders = ', '.join(['%s'] * len(message_ids))
+        cursor.execute(
+            "INSERT INTO communications_message_fts (rowid, content, conversation_id)"
+            " SELECT m.id, m.content, m.conversation_id FROM communications_message m"
+            f" WHERE m.id IN ({placeholders})"
+            " AND NOT EXISTS (SELECT 1 FROM communications_message_fts f WHERE f.rowid = m.id)",
+            list(message_ids),
+        )
+
+    def reindex(self, cursor, message):
+        self.remove(cursor, message.id)
+        cursor.execute(
+            "INSERT INTO communications_message_fts (rowid, content, conversation_id) VALUES (%s, %s, %s)",
+            [message.id, message.content, message.conversation_id],
+        )
+
+    def remove(self, cursor, message_id):
+        cursor.execute("DELETE FROM communications_message_fts WHERE rowid = %s", [message_id])
+
+    def remove_conversation(self, cursor, conversation_id):
+        cursor.execute("DELETE FROM communications_message_fts WHERE conversation_id = %s", [conversation_id])
+
+    def search(self, cursor, user_id, query, limit, offset, highlight):
+        headline = "snippet(communications_message_fts, 0, %s, %s, '…', 16)" if highlight else "NULL"
+        params = [START_MATCH, STOP_MATCH] if highlight else []
+        cursor.execute(
+            f"SELECT rowid, -bm25(communications_message_fts) AS rank, {headline}"
+            " FROM communications_message_fts"
+            " WHERE communications_message_fts MATCH %s AND conversation_id IN ("
+            "  SELECT conversation_id FROM communications_conversationparticipant WHERE user_id = %s)"
+            " ORDER BY rank DESC, rowid DESC LIMIT %s OFFSET %s",
+            params + [fts5_query(query), user_id, limit, offset],
+        )
+        return cursor.fetchall()
+
+
+def fts5_query(query):
+    """Quote every term so user input is matched literally instead of parsed as FTS5 syntax."""
+    terms = query.split()
+    return ' '.join('"' + term.replace('"', '""') + '"' for term in terms)
+
+
+BACKENDS = {'postgresql': PostgresIndex, 'sqlite': SQLiteIndex}
+
+
+def get_index():
+    backend = BACKENDS.get(connection.vendor)
+    return backend() if backend else None
+
+
+def index_messages(batch_size=5000):
+    """Add messages that are not in the search index yet; returns how many were indexed."""
+    index = get_index()
+    if index is None:
+        return 0
+    pending = Message.objects.filter(search_indexed=False).order_by('id')
+    indexed = 0
+    while True:
+        with transaction.atomic(), connection.cursor() as cursor:
+            # Concurrent runs take different messages rather than queueing behind each other.
+            ids = list(pending.select_for_update(skip_locked=True).values_list('id', flat=True)[:batch_size])
+            if ids:
+                index.add(cursor, ids)
+                Message.objects.filter(id__in=ids).update(search_indexed=True)
+        indexed += len(ids)
+        if len(ids) < batch_size:
+            return indexed
+
+
+def reindex_message(message):
+    index = get_index()
+    if index is not None:
+        with connection.cursor() as cursor:
+            index.reindex(cursor, message)
+
+
+def remove_message(message_id):
+    index = get_index()
+    if index is not None:
+        with connection.cursor() as cursor:
+            index.remove(cursor, message_id)
+
+
+def remove_conversation(conversation_id):
+    index = get_index()
+    if index is not None:
+        with connection.cursor() as cursor:
+            index.remove_conversation(cursor, conversation_id)
+
+
+def mark_matches(snippet):
+    """The index's highlighted snippet as HTML: escaped, with each match in <mark>."""
+    if snippet is None:
+        return None
+    return escape(snippet).replace(START_MATCH, '<mark>').replace(STOP_MATCH, '</mark>')
+
+
+def search_messages(user, query, limit, offset=0, highlight=False):
+    """
+    Messages matching `query` in conversations `user` takes part in, best
+    match first, as [(message, rank, highlight)]. Without a full-text index
+    (other databases) falls back to a substring match, newest first.
+    """
+    index = get_index()
+    if index is None:
+        conversation_ids = ConversationParticipant.objects.filter(user=user).values('conversation_id')
+        messages = Message.objects.filter(conversation_id__in=conversation_ids, content__icontains=query).order_by('-id')
+        return [(message, None, None) for message in messages[offset:offset + limit]]
+
+    with connection.cursor() as cursor:
+        rows = index.search(cursor, user.id, query, limit, offset, highlight)
+    messages = Message.objects.in_bulk([row[0] for row in rows])
+    return [(messages[pk], rank, mark_matches(snippet)) for pk, rank, snippet in rows if pk in messages]
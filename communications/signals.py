@@ -0,0 +1,30 @@
+from django.db.models import QuerySet
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .inbox import forget_message, record_messages
+from .membership import invalidate_members
+from .models import Conversation, ConversationParticipant, Message
+from .search import reindex_message, remove_message
+
+@receiver(post_save, sender=ConversationParticipant)
+@receiver(post_delete, sender=ConversationParticipant)
+def invalidate_conversation_members(sender, instance, **kwargs):
+    invalidate_members(instance.conversation_id, instance.user_id)
+
+
+@receiver(post_save, sender=Message)
+def record_new_message(sender, instance, created=False, raw=False, **kwargs):
+    # bulk_create() sends no signal; communications.write_behind records its batches itself.
+    if created and not raw:
+        record_messages([instance])
+    elif not raw:
+        # New messages are indexed in the background by index_messages; edits are rare, redo them now.
+        reindex_message(instance)
+
+@receiver(post_delete, sender=Message)
+def unindex_message(sender, instance, origin=None, **kwargs):
+    remove_message(instance.id)
+    # A conversation being deleted takes its counters with it.
+    deleting = origin.model if isinstance(origin, QuerySet) else type(origin)
+    if deleting is not Conversation:
+        forget_message(instance)
\ No newline at end of file
@@ -0,0 +1,18 @@
+from asgiref.sync import async_to_sync
+from celery import shared_task
+from . import presence
+from .search import index_messages as index_new_messages
+
+@shared_task
+def index_messages():
+    """Add messages stored since the last run to the full-text search index."""
+    return index_new_messages()
+
+
+@shared_task
+def expire_presence():
+    """Announce users whose chat connections all lapsed without a disconnect as offline."""
+    lapsed = presence.expire()
+    for user_id in lapsed:
+        async_to_sync(presence.broadcast)(user_id, False)
+    return len(lapsed)
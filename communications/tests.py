@@ -1,3 +1,453 @@
-from django.test import TestCase
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from asgiref.sync import sync_to_async
+from communications import presence, write_behind
+from communications.tasks import expire_presence
+from communications.search import index_messages, search_messages
+from communications.models import Conversation, ConversationParticipant, Message
+from communications.routing import websocket_urlpatterns
+from communications.write_behind import MessageBuffer
+from django.db import OperationalError
+from django.db.backends.utils import CursorWrapper
+from django.test import SimpleTestCase, override_settings, tag
+from farms.broadcast import changes_frames
+from unittest import mock
+from utils.wire import FLAG_DEFLATE, JSON, LEGACY, MESSAGE_TOO_BIG, MSGPACK, FrameError, decode, encode, encode_frames
+from utils.testing import QueryPlanMixin, ServiceTestCase, ServiceTransactionTestCase, make_user
+import json
+import msgpack
+import time
+import zlib
 
-# Create your tests here.
+
+class AccessPathIndexTests(QueryPlanMixin, ServiceTestCase):
+    def test_conversation_history_uses_conversation_index(self):
+        conversation = Conversation.objects.create(title='Co-op')
+        self.assertUsesIndex(
+            Message.objects.filter(conversation=conversation).order_by('-created_at', '-id'), 'message_conv_created_idx'
+        )
+
+
+class ConversationTestCase(ServiceTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = make_user('reader')
+        self.other = make_user('writer')
+        self.conversation = self.start_conversation()
+        self.client.force_authenticate(self.user)
+
+    def start_conversation(self, title='Co-op'):
+        conversation = Conversation.objects.create(title=title)
+        for user in (self.user, self.other):
+            ConversationParticipant.objects.create(conversation=conversation, user=user)
+        return conversation
+
+    def post(self, conversation=None, sender=None, content='Hello'):
+        return Message.objects.create(
+            conversation=conversation or self.conversation, sender=sender or self.other, content=content,
+        )
+
+    def participant(self, conversation=None):
+        return ConversationParticipant.objects.get(conversation=conversation or self.conversation, user=self.user)
+
+
+class ReadCursorTests(ConversationTestCase):
+    def read(self, **data):
+        return self.client.post(f'/api/conversations/{self.conversation.id}/read/', data, format='json')
+
+    def read_rejected(self, **data):
+        with self.assertLogs('agricore.requests', 'WARNING'):
+            response = self.read(**data)
+        self.assertEqual(response.status_code, 400)
+        return response
+
+    def test_read_moves_cursor_and_recounts(self):
+        first, second = self.post(), self.post()
+        response = self.read(message_id=first.id)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['last_read_id'], response.data['unread']), (first.id, 1))
+        self.assertEqual(self.read().data['last_read_id'], second.id)
+
+    def test_unknown_message_is_rejected(self):
+        self.post()
+        response = self.read_rejected(message_id=1000000000000)
+        self.assertIn('message_id', response.data)
+        self.assertEqual(self.participant().last_read_id, 0)
+
+    def test_message_of_another_conversation_is_rejected(self):
+        elsewhere = self.post(conversation=self.start_conversation('Market'))
+        self.read_rejected(message_id=elsewhere.id)
+        self.assertEqual(self.participant().last_read_id, 0)
+
+
+
+class InboxCounterTests(ConversationTestCase):
+    def stored(self):
+        return Conversation.objects.get(pk=self.conversation.pk)
+
+    def test_deleting_unread_message_lowers_unread_count(self):
+        first, second, third = self.post(), self.post(), self.post()
+        self.participant().mark_read(first.id)
+        first.delete()
+        self.assertEqual(self.participant().unread_count, 2)
+        second.delete()
+        self.assertEqual(self.participant().unread_count, 1)
+        # The sender never counted their own message.
+        self.assertEqual(
+            ConversationParticipant.objects.get(conversation=self.conversation, user=self.other).unread_count, 0,
+        )
+
+    def test_deleting_last_message_falls_back_to_previous(self):
+        first = self.post()
+        last = self.post()
+        last.delete()
+        conversation = self.stored()
+        self.assertEqual((conversation.last_message_id, conversation.last_message_at), (first.id, first.created_at))
+        self.assertEqual(self.participant().last_activity_at, first.created_at)
+
+        first.delete()
+        conversation = self.stored()
+        self.assertEqual((conversation.last_message_id, conversation.last_message_at), (None, None))
+        participant = self.participant()
+        self.assertEqual(participant.last_activity_at, participant.joined_at)
+
+    def test_bulk_delete_recounts(self):
+        keep = self.post()
+        self.post(), self.post()
+        Message.objects.exclude(pk=keep.pk).delete()
+        self.assertEqual(self.participant().unread_count, 1)
+        self.assertEqual(self.stored().last_message_id, keep.id)
+
+    def test_deleting_conversation_skips_the_recount(self):
+        self.post(), self.post()
+        self.conversation.delete()
+        self.assertFalse(Message.objects.exists())
+        self.assertFalse(ConversationParticipant.objects.exists())
+
+    def test_mark_read_counts_newer_messages(self):
+        first = self.post()
+        self.post(), self.post(sender=self.user), self.post()
+        participant = self.participant()
+        self.assertTrue(participant.mark_read(first.id))
+        self.assertEqual(participant.unread_count, 2)
+        self.assertFalse(participant.mark_read(first.id))
+
+
+
+class MessageSearchTests(ConversationTestCase):
+    def test_highlight_escapes_message_markup(self):
+        self.post(content='Spray <script>alert(1)</script> maize & beans')
+        index_messages()
+        [(_, _, snippet)] = search_messages(self.user, 'maize', limit=10, highlight=True)
+        self.assertNotIn('<script>', snippet)
+        self.assertIn('&lt;script&gt;', snippet)
+        self.assertIn('<mark>maize</mark>', snippet)
+        self.assertIn('&amp; beans', snippet)
+
+    def test_message_committed_late_is_still_indexed(self):
+        newest = Message.objects.create(id=50_000, conversation=self.conversation, sender=self.other, content='Beans')
+        self.assertEqual(index_messages(), 1)
+        # A write that took its id long ago and only commits now, far below the newest indexed id.
+        late = Message.objects.create(id=newest.id - 10_000, conversation=self.conversation, sender=self.other, content='Maize')
+        self.assertEqual(index_messages(), 1)
+        self.assertEqual([message for message, _, _ in search_messages(self.user, 'maize', limit=10)], [late])
+        self.assertEqual(index_messages(), 0)
+
+    def test_edit_before_indexing_is_not_indexed_twice(self):
+        message = self.post(content='Maize')
+        message.content = 'Maize prices'
+        message.save()
+        self.assertEqual(index_messages(), 1)
+        self.assertEqual(len(search_messages(self.user, 'maize', limit=10)), 1)
+
+    def test_deleted_conversation_leaves_nothing_to_find(self):
+        for _ in range(3):
+            self.post(content='Maize prices')
+        index_messages()
+        # The messages go in one DELETE, however many there are.
+        with self.assertNumQueries(9):
+            deleted, by_model = self.conversation.delete()
+        self.assertEqual(by_model['communications.Message'], 3)
+        self.assertFalse(Message.objects.exists())
+        self.assertEqual(search_messages(self.user, 'maize', limit=10), [])
+        self.assertEqual(index_messages(), 0)
+
+
+class WriteBehindTests(ServiceTransactionTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = make_user('sender')
+        self.conversation = Conversation.objects.create(title='Co-op')
+        ConversationParticipant.objects.create(conversation=self.conversation, user=self.user)
+
+    async def connect(self):
+        communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), f'/ws/chat/{self.conversation.id}/')
+        communicator.scope['user'] = self.user
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator
+
+    async def send_all(self, count, batched):
+        """Messages per second through one connection, from the first send until all are stored."""
+        communicator = await self.connect()
+        started = time.monotonic()
+        for n in range(count):
+            await communicator.send_json_to({'content': f'Message {n}'})
+        broadcast = acked = 0
+        while broadcast < count or (batched and acked < count):
+            frame = await communicator.receive_json_from(timeout=10)
+            if 'messages' in frame:
+                acked += len(frame['messages'])
+            else:
+                broadcast += 1
+        elapsed = time.monotonic() - started
+        await communicator.disconnect()
+        return count / elapsed
+
+    async def test_throughput_with_and_without_batching(self):
+        with override_settings(CHAT_WRITE_BEHIND=False):
+            direct = await self.send_all(500, batched=False)
+        with override_settings(CHAT_WRITE_BEHIND=True):
+            batched = await self.send_all(500, batched=True)
+        # About 300/s and 950/s here: the batches share one transaction each.
+        self.assertGreater(batched, direct * 1.5)
+        self.assertEqual(await Message.objects.filter(conversation=self.conversation).acount(), 1000)
+
+    async def drain(self, buffer):
+        while buffer._task and not buffer._task.done():
+            await buffer._task
+
+    def add(self, buffer, *contents):
+        return [buffer.add(self.conversation.id, self.user.id, content) for content in contents]
+
+    async def test_rejected_row_is_nacked_and_the_rest_stored(self):
+        write_messages = write_behind.write_messages
+
+        def reject_nul(batch):
+            if any('\x00' in item.content for item in batch):
+                raise ValueError('A string literal cannot contain NUL (0x00) characters.')
+            return write_messages(batch)
+
+        buffer = MessageBuffer(flush_interval=0)
+        with mock.patch.object(write_behind, 'write_messages', reject_nul), \
+                self.assertLogs('communications.write_behind', 'ERROR'):
+            self.add(buffer, 'Before', 'Bad \x00', 'After')
+            await self.drain(buffer)
+        self.assertEqual(buffer.pending, [])
+        contents = [message.content async for message in Message.objects.order_by('id')]
+        self.assertEqual(contents, ['Before', 'After'])
+
+    async def test_transient_failure_backs_off_and_retries(self):
+        write_messages = write_behind.write_messages
+        attempts = []
+
+        def flaky(batch):
+            attempts.append(time.monotonic())
+            if len(attempts) < 3:
+                raise OperationalError('database is locked')
+            return write_messages(batch)
+
+        buffer = MessageBuffer(flush_interval=0.01)
+        with mock.patch.object(write_behind, 'write_messages', flaky), \
+                self.assertLogs('communications.write_behind', 'ERROR'):
+            self.add(buffer, 'Hello')
+            await self.drain(buffer)
+        self.assertEqual(len(attempts), 3)
+        self.assertEqual(buffer.failures, 0)
+        # 0.02s then 0.04s between attempts.
+        self.assertGreater(attempts[2] - attempts[1], attempts[1] - attempts[0])
+        self.assertEqual(await Message.objects.acount(), 1)
+
+    @override_settings(CHAT_WRITE_BEHIND=True)
+    async def test_full_buffer_falls_back_to_direct_write(self):
+        buffer = MessageBuffer(max_pending=1)
+        self.assertIsNotNone(self.add(buffer, 'Queued')[0])
+        self.assertEqual(self.add(buffer, 'Refused'), [None])
+
+        with mock.patch.object(write_behind.MessageBuffer, 'add', return_value=None):
+            communicator = await self.connect()
+            await communicator.send_json_to({'content': 'Direct'})
+            frame = await communicator.receive_json_from()
+            await communicator.disconnect()
+        self.assertIsNotNone(frame['id'])
+        self.assertTrue(await Message.objects.filter(pk=frame['id'], content='Direct').aexists())
+        await self.drain(buffer)
+
+
+
+class PresenceTests(ServiceTransactionTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = make_user('farmer')
+        self.observer = make_user('agronomist')
+        self.first = Conversation.objects.create(title='Maize')
+        self.second = Conversation.objects.create(title='Dairy')
+        for conversation in (self.first, self.second):
+            for user in (self.user, self.observer):
+                ConversationParticipant.objects.create(conversation=conversation, user=user)
+
+    async def connect(self, conversation, user):
+        communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), f'/ws/chat/{conversation.id}/')
+        communicator.scope['user'] = user
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator
+
+    async def test_presence_reaches_all_of_the_users_conversations(self):
+        watch_first = await self.connect(self.first, self.observer)
+        watch_second = await self.connect(self.second, self.observer)
+
+        in_first = await self.connect(self.first, self.user)
+        for watcher in (watch_first, watch_second):
+            self.assertEqual(await watcher.receive_json_from(), {'type': 'presence', 'user_id': self.user.id, 'online': True})
+        in_second = await self.connect(self.second, self.user)
+        await in_first.disconnect()
+        self.assertTrue(await watch_first.receive_nothing())
+        self.assertTrue(await watch_second.receive_nothing())
+
+        await in_second.disconnect()
+        for watcher in (watch_first, watch_second):
+            self.assertEqual(await watcher.receive_json_from(), {'type': 'presence', 'user_id': self.user.id, 'online': False})
+        for watcher in (watch_first, watch_second):
+            await watcher.disconnect()
+
+    async def test_lapsed_connection_is_announced_offline(self):
+        watcher = await self.connect(self.second, self.observer)
+        communicator = await self.connect(self.first, self.user)
+        self.assertTrue((await watcher.receive_json_from())['online'])
+
+        # The connection stops heartbeating: its expiry passes without a disconnect.
+        [channel] = self.redis.zrange(presence.presence_key(self.user.id), 0, -1)
+        self.redis.zadd(presence.presence_key(self.user.id), {channel: 1})
+        self.redis.zadd(presence.ONLINE_KEY, {self.user.id: 1})
+        self.assertEqual(await sync_to_async(expire_presence)(), 1)
+        self.assertEqual(await watcher.receive_json_from(), {'type': 'presence', 'user_id': self.user.id, 'online': False})
+        self.assertEqual(await sync_to_async(expire_presence)(), 0)
+
+        # Its next heartbeat brings the user back, which the consumer announces.
+        self.assertTrue(presence.heartbeat(self.user.id, channel))
+        self.assertFalse(presence.heartbeat(self.user.id, channel))
+        await communicator.disconnect()
+        await watcher.disconnect()
+
+    async def test_typing_volume_costs_no_queries(self):
+        queries = []
+        execute = CursorWrapper._execute_with_wrappers
+
+        def counting(cursor, sql, *args, **kwargs):
+            queries.append(sql)
+            return execute(cursor, sql, *args, **kwargs)
+
+        watcher = await self.connect(self.first, self.observer)
+        communicator = await self.connect(self.first, self.user)
+        await watcher.receive_json_from()
+        with mock.patch.object(CursorWrapper, '_execute_with_wrappers', counting):
+            for volume in (10, 100, 1000):
+                for _ in range(volume):
+                    await communicator.send_json_to({'type': 'typing'})
+                await communicator.send_json_to({'type': 'typing', 'typing': False})
+                frames = [await watcher.receive_json_from(timeout=10)]
+                while frames[-1]['typing']:
+                    frames.append(await watcher.receive_json_from(timeout=10))
+                self.assertTrue(await watcher.receive_nothing())
+                # Coalesced to one start and one stop, and no query, whatever the volume.
+                self.assertEqual([frame['typing'] for frame in frames], [True, False], volume)
+                self.assertEqual(queries, [], volume)
+        await communicator.disconnect()
+        await watcher.disconnect()
+
+
+
+def deflated(body):
+    compressor = zlib.compressobj(wbits=-15)
+    return bytes([FLAG_DEFLATE]) + compressor.compress(body) + compressor.flush()
+
+
+@override_settings(WS_MAX_FRAME_BYTES=1024, WS_COMPRESS_MIN_BYTES=64)
+class WireDecodeTests(SimpleTestCase):
+    def test_compressed_frame_round_trips(self):
+        payload = {'content': 'maize ' * 100}
+        frame = encode(MSGPACK, payload)
+        self.assertEqual(frame[0], FLAG_DEFLATE)
+        self.assertEqual(decode(MSGPACK, bytes_data=frame), payload)
+
+    def test_inflating_stops_at_the_limit(self):
+        bomb = deflated(msgpack.packb({'content': 'a' * 10 * 1024 * 1024}))
+        self.assertLess(len(bomb), 16 * 1024)
+        with self.assertRaises(FrameError) as caught:
+            decode(MSGPACK, bytes_data=bomb)
+        self.assertEqual(caught.exception.code, MESSAGE_TOO_BIG)
+
+    def test_oversized_plain_frames_are_refused(self):
+        for frame in ({'bytes_data': b'\x00' + msgpack.packb('a' * 2048)}, {'text_data': '"' + 'a' * 2048 + '"'}):
+            with self.assertRaises(FrameError):
+                decode(MSGPACK if 'bytes_data' in frame else 'legacy', **frame)
+
+    def test_empty_and_corrupt_frames_are_refused(self):
+        for frame in (b'', bytes([FLAG_DEFLATE]) + b'not deflate'):
+            with self.assertRaises(FrameError):
+                decode(MSGPACK, bytes_data=frame)
+
+
+@tag('slow')
+class WireFanOutBenchmarkTests(SimpleTestCase):
+    """About a second; run with `manage.py test --tag slow`."""
+    RECIPIENTS = 50
+    REPEAT = 20
+
+    def cpu(self, fan_out):
+        started = time.process_time()
+        for _ in range(self.REPEAT):
+            fan_out()
+        return (time.process_time() - started) / self.REPEAT * 1e6
+
+    def events(self):
+        message = {
+            'id': 1812, 'conversation': 7, 'sender': 3, 'username': 'wanjiku', 'content': 'Vet comes at 9 tomorrow.',
+            'created_at': '2026-03-02T08:15:00+00:00',
+        }
+        yield 'chat message', message, lambda: encode_frames(message, {'type': 'message', **message})
+        for label, changes in [
+            ('20 stock updates', [
+                {'model': 'inventory.inventory', 'op': 'update', 'id': 400 + i, 'fields': {'quantity': 90 - i}}
+                for i in range(20)
+            ]),
+            ('500 animal creates', [
+                {'model': 'livestock.animal', 'op': 'create', 'id': 9000 + i, 'fields': {
+                    'tag_id': f'KE-{9000 + i}', 'sex': 'female', 'age_group': 'calf', 'breed': 'Boran',
+                    'status': 'active', 'livestock_unit': 12,
+                }}
+                for i in range(500)
+            ]),
+        ]:
+            payload = {'type': 'changes', 'token': '1772440500000-0', 'changes': changes}
+            yield label, payload, lambda changes=changes: changes_frames('1772440500000-0', changes)
+
+    def test_bytes_and_cpu_per_fan_out(self):
+        print(f'\n{"payload":<20}{"legacy":>10}{"msgpack":>10}{"json":>10}   cpu per fan-out to {self.RECIPIENTS}')
+        for label, payload, encode_once in self.events():
+            frames = encode_once()
+            sizes = {protocol: len(frame.encode() if protocol == LEGACY else frame) for protocol, frame in frames.items()}
+            # Before: the event dict went to every recipient and each one ran json.dumps on it.
+            old = self.cpu(lambda: [json.dumps(payload) for _ in range(self.RECIPIENTS)])
+            new = self.cpu(encode_once)
+            print(f'{label:<20}{sizes[LEGACY]:>9}B{sizes[MSGPACK]:>9}B{sizes[JSON]:>9}B   {old:.0f} -> {new:.0f} us')
+            self.assertEqual(decode(MSGPACK, bytes_data=frames[MSGPACK]).get('content'), payload.get('content'))
+            self.assertLess(new, old)
+            if label != 'chat message':
+                self.assertLess(sizes[MSGPACK], sizes[LEGACY] / 2)
+
+
+@override_settings(WS_MAX_FRAME_BYTES=1024)
+class ChatFrameLimitTests(ConversationTestCase):
+    async def test_deflate_bomb_closes_the_socket(self):
+        communicator = WebsocketCommunicator(
+            URLRouter(websocket_urlpatterns), f'/ws/chat/{self.conversation.id}/', subprotocols=[MSGPACK],
+        )
+        communicator.scope['user'] = self.user
+        connected, subprotocol = await communicator.connect()
+        self.assertEqual((connected, subprotocol), (True, MSGPACK))
+        with self.assertLogs('communications.consumers', 'WARNING'):
+            await communicator.send_to(bytes_data=deflated(msgpack.packb({'content': 'a' * 1024 * 1024})))
+            self.assertEqual(await communicator.receive_output(), {'type': 'websocket.close', 'code': MESSAGE_TOO_BIG})
+        await communicator.wait()
@@ -0,0 +1,166 @@
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from dataclasses import dataclass
+from django.conf import settings
+from django.db import InterfaceError, OperationalError, transaction
+from utils.wire import encode_frames
+from .inbox import record_messages
+from .models import Message
+import asyncio
+import logging
+import uuid
+
+logger = logging.getLogger(__name__)
+
+
+def conversation_group(conversation_id):
+    return f'conversation_{conversation_id}'
+
+
+@dataclass
+class PendingMessage:
+    provisional_id: str
+    conversation_id: int
+    sender_id: int
+    content: str
+
+
+def write_messages(batch):
+    """Insert `batch` in order with one bulk_create() and update the inbox counters; returns the saved Message rows."""
+    with transaction.atomic():
+        saved = Message.objects.bulk_create([
+            Message(conversation_id=item.conversation_id, sender_id=item.sender_id, content=item.content)
+            for item in batch
+        ])
+        record_messages(saved)
+    return saved
+
+
+# Failures of the connection rather than of the rows: the batch is retried as is.
+TRANSIENT_ERRORS = (OperationalError, InterfaceError)
+
+
+def write_each(batch):
+    """
+    Insert `batch` row by row, so rows the database rejects (a deleted
+    conversation, a NUL byte in the content, ...) come back as None.
+    Transient errors still raise.
+    """
+    saved = []
+    for item in batch:
+        try:
+            saved.extend(write_messages([item]))
+        except TRANSIENT_ERRORS:
+            raise
+        except Exception as e:
+            logger.error(f"Dropping chat message for conversation {item.conversation_id}: {e}")
+            saved.append(None)
+    return saved
+
+
+class MessageBuffer:
+    """
+    Per-process write-behind queue for chat messages.
+
+    add() hands back a provisional id at once, so the consumer can broadcast
+    before the row exists. Messages are written with bulk_create() once
+    `batch_size` are waiting or `flush_interval` seconds after the first
+    one. After each batch commits, every conversation in it gets a
+    'chat.ack' event mapping provisional ids to message ids: that event,
+    not the broadcast, marks a message as stored. A row the database
+    rejects outright is acked with id None and an error instead.
+
+    Messages are written in the order they were added. Only one flush runs
+    at a time, and a batch that fails for a transient reason (the database
+    is unreachable) is retried before anything queued after it, backing
+    off from `flush_interval` up to CHAT_WRITE_MAX_BACKOFF_MS. While
+    `max_pending` messages are waiting, add() refuses more and returns None;
+    the caller then writes its message itself. The queue lives in memory,
+    so messages not yet acked are lost if the process dies.
+    """
+
+    def __init__(self, batch_size=None, flush_interval=None, max_pending=None):
+        self.batch_size = batch_size or settings.CHAT_WRITE_BATCH_SIZE
+        self.flush_interval = settings.CHAT_WRITE_FLUSH_MS / 1000 if flush_interval is None else flush_interval
+        self.max_pending = max_pending or settings.CHAT_WRITE_MAX_PENDING
+        self.max_backoff = settings.CHAT_WRITE_MAX_BACKOFF_MS / 1000
+        self.failures = 0
+        self.pending = []
+        self.loop = asyncio.get_running_loop()
+        self._full = asyncio.Event()
+        self._flushing = asyncio.Lock()
+        self._task = None
+
+    def add(self, conversation_id, sender_id, content):
+        """Queue a message and return its provisional id, or None if the queue is full."""
+        if len(self.pending) >= self.max_pending:
+            return None
+        item = PendingMessage(uuid.uuid4().hex, int(conversation_id), sender_id, content)
+        self.pending.append(item)
+        if len(self.pending) >= self.batch_size:
+            self._full.set()
+        if self._task is None or self._task.done():
+            self._task = self.loop.create_task(self._run())
+        return item.provisional_id
+
+    async def _run(self):
+        while self.pending:
+            if self.failures:
+                await asyncio.sleep(min(self.flush_interval * 2 ** self.failures, self.max_backoff))
+            else:
+                try:
+                    await asyncio.wait_for(self._full.wait(), self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+            self._full.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.exception(f"Chat message flush failed: {e}")
+                self.failures += 1
+
+    async def flush(self):
+        async with self._flushing:
+            while self.pending:
+                batch = self.pending[:self.batch_size]
+                # Off the shared sync thread: channels runs close_old_connections() there before
+                # every consumer event, and those must not queue behind a batch insert.
+                try:
+                    try:
+                        saved = await database_sync_to_async(write_messages, thread_sensitive=False)(batch)
+                    except TRANSIENT_ERRORS:
+                        raise
+                    except Exception:
+                        saved = await database_sync_to_async(write_each, thread_sensitive=False)(batch)
+                except TRANSIENT_ERRORS as e:
+                    # Leave the batch at the head of the queue; _run() retries it after a backoff.
+                    self.failures += 1
+                    logger.error(f"Failed to write {len(batch)} chat messages (attempt {self.failures}): {e}")
+                    return
+                self.failures = 0
+                del self.pending[:len(batch)]
+                await self.acknowledge(batch, saved)
+
+    async def acknowledge(self, batch, saved):
+        acks = {}
+        for item, message in zip(batch, saved):
+            if message is None:
+                ack = {'provisional_id': item.provisional_id, 'id': None, 'error': 'not stored'}
+            else:
+                ack = {'provisional_id': item.provisional_id, 'id': message.id, 'created_at': str(message.created_at)}
+            acks.setdefault(item.conversation_id, []).append(ack)
+        channel_layer = get_channel_layer()
+        for conversation_id, messages in acks.items():
+            frames = encode_frames({'type': 'ack', 'messages': messages})
+            await channel_layer.group_send(conversation_group(conversation_id), {'type': 'chat.ack', 'frames': frames})
+
+
+_buffer = None
+
+
+def get_buffer():
+    """The running event loop's MessageBuffer."""
+    global _buffer
+    if _buffer is None or _buffer.loop is not asyncio.get_running_loop():
+        _buffer = MessageBuffer()
+    return _buffer
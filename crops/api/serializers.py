@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from crops.models import Crop, CropTask, CropEmployeeAssignment, CropExpense
+from utils.bulk import BulkListSerializer
 
 class CropSerializer(serializers.ModelSerializer):
     class Meta:
@@ -10,6 +11,7 @@ class CropTaskSerializer(serializers.ModelSerializer):
     class Meta:
         model = CropTask
         fields = '__all__'
+        list_serializer_class = BulkListSerializer
 
 class CropEmployeeAssignmentSerializer(serializers.ModelSerializer):
     class Meta:
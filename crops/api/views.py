@@ -2,6 +2,8 @@ from rest_framework import viewsets
 from rest_framework.permissions import IsAuthenticated
 from crops.models import Crop, CropTask, CropEmployeeAssignment, CropExpense
 from .serializers import CropSerializer, CropTaskSerializer, CropEmployeeAssignmentSerializer, CropExpenseSerializer
+from utils.bulk import BulkModelMixin
+from utils.export import ExportMixin
 
 class CropViewSet(viewsets.ModelViewSet):
     queryset = Crop.objects.all()
@@ -11,23 +13,24 @@ class CropViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         return self.queryset.filter(field__farm__owner=self.request.user)
 
-class CropTaskViewSet(viewsets.ModelViewSet):
+class CropTaskViewSet(BulkModelMixin, viewsets.ModelViewSet):
     queryset = CropTask.objects.all()
     serializer_class = CropTaskSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return self.queryset.filter(crop__field__farm__owner=self.request.user)
+        return self.queryset.filter(owner=self.request.user)
 
 class CropEmployeeAssignmentViewSet(viewsets.ModelViewSet):
     queryset = CropEmployeeAssignment.objects.all()
     serializer_class = CropEmployeeAssignmentSerializer
     permission_classes = [IsAuthenticated]
+    keyset_ordering = ('-assigned_at', '-id')
 
-class CropExpenseViewSet(viewsets.ModelViewSet):
+class CropExpenseViewSet(ExportMixin, viewsets.ModelViewSet):
     queryset = CropExpense.objects.all()
     serializer_class = CropExpenseSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return self.queryset.filter(crop__field__farm__owner=self.request.user)
\ No newline at end of file
+        return self.queryset.filter(owner=self.request.user)
\ No newline at end of file
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0001_initial"),
+        ("crops", "0001_initial"),
+        ("farms", "0002_access_path_indexes"),
+        ("workforce", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="crop",
+            index=models.Index(
+                fields=["field", "-created_at", "-id"], name="crop_field_created_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="cropexpense",
+            index=models.Index(
+                fields=["crop", "-created_at", "-id"], name="cropexp_crop_created_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="cropexpense",
+            index=models.Index(
+                fields=["crop", "-incurred_on"], name="cropexp_crop_incurred_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="croptask",
+            index=models.Index(
+                fields=["crop", "-created_at", "-id"], name="croptask_crop_created_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="croptask",
+            index=models.Index(
+                fields=["crop", "status", "due_date"],
+                name="croptask_crop_status_due_idx",
+            ),
+        ),
+    ]
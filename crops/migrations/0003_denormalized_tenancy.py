@@ -0,0 +1,80 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:41
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0001_initial"),
+        ("crops", "0002_access_path_indexes"),
+        ("farms", "0002_access_path_indexes"),
+        ("workforce", "0001_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="cropexpense",
+            name="farm",
+            field=models.ForeignKey(
+                blank=True,
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="+",
+                to="farms.farm",
+            ),
+        ),
+        migrations.AddField(
+            model_name="cropexpense",
+            name="owner",
+            field=models.ForeignKey(
+                blank=True,
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="+",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AddField(
+            model_name="croptask",
+            name="farm",
+            field=models.ForeignKey(
+                blank=True,
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="+",
+                to="farms.farm",
+            ),
+        ),
+        migrations.AddField(
+            model_name="croptask",
+            name="owner",
+            field=models.ForeignKey(
+                blank=True,
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="+",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="cropexpense",
+            index=models.Index(
+                fields=["owner", "-created_at", "-id"], name="cropexp_owner_created_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="croptask",
+            index=models.Index(
+                fields=["owner", "-created_at", "-id"],
+                name="croptask_owner_created_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+BATCH_SIZE = 5000
+
+
+def backfill_tenancy(apps, schema_editor):
+    Field = apps.get_model("farms", "Field")
+    model = apps.get_model("crops", "crop")
+    fields = Field.objects.filter(pk=OuterRef("field_id"))
+    farm_id = Subquery(fields.values("farm")[:1])
+    owner_id = Subquery(fields.values("farm__owner")[:1])
+    last_pk = 0
+    while True:
+        pks = list(
+            model.objects.filter(pk__gt=last_pk, farm__isnull=True)
+            .order_by("pk")
+            .values_list("pk", flat=True)[:BATCH_SIZE]
+        )
+        if not pks:
+            break
+        model.objects.filter(pk__in=pks).update(farm_id=farm_id, owner_id=owner_id)
+        last_pk = pks[-1]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("crops", "0004_backfill_tenancy"),
+        ("farms", "0004_import_job"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="crop",
+            name="farm",
+            field=models.ForeignKey(
+                blank=True,
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="+",
+                to="farms.farm",
+            ),
+        ),
+        migrations.AddField(
+            model_name="crop",
+            name="owner",
+            field=models.ForeignKey(
+                blank=True,
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="+",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.RunPython(backfill_tenancy, migrations.RunPython.noop),
+    ]
@@ -1,9 +1,11 @@
 from django.db import models
-from farms.models import Field
+from farms.models import Field, FarmScopedModel
 from workforce.models import Employee
 from accounts.models import Attachment
+from farms.cdc import track_changes
 
-class Crop(models.Model):
+@track_changes(farm_path='farm')
+class Crop(FarmScopedModel):
     field = models.ForeignKey(Field, on_delete=models.CASCADE)
     name = models.CharField(max_length=255)
     variety = models.CharField(max_length=255)
@@ -18,7 +20,15 @@ class Crop(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
-class CropTask(models.Model):
+    tenancy_path = 'field__farm'
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['field', '-created_at', '-id'], name='crop_field_created_idx'),
+        ]
+
+@track_changes(farm_path='farm')
+class CropTask(FarmScopedModel):
     crop = models.ForeignKey(Crop, on_delete=models.CASCADE)
     title = models.CharField(max_length=255)
     description = models.TextField(blank=True)
@@ -29,6 +39,15 @@ class CropTask(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     completed_at = models.DateTimeField(blank=True, null=True)
 
+    tenancy_path = 'crop__field__farm'
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['owner', '-created_at', '-id'], name='croptask_owner_created_idx'),
+            models.Index(fields=['crop', '-created_at', '-id'], name='croptask_crop_created_idx'),
+            models.Index(fields=['crop', 'status', 'due_date'], name='croptask_crop_status_due_idx'),
+        ]
+
 class CropEmployeeAssignment(models.Model):
     crop_task = models.ForeignKey(CropTask, on_delete=models.CASCADE)
     employee = models.ForeignKey(Employee, on_delete=models.CASCADE)
@@ -37,7 +56,8 @@ class CropEmployeeAssignment(models.Model):
     removed_at = models.DateTimeField(blank=True, null=True)
     ai_recommended_duration = models.IntegerField(blank=True, null=True)
 
-class CropExpense(models.Model):
+@track_changes(farm_path='farm')
+class CropExpense(FarmScopedModel):
     crop = models.ForeignKey(Crop, on_delete=models.CASCADE)
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     currency = models.CharField(max_length=3, default='USD')
@@ -46,4 +66,13 @@ class CropExpense(models.Model):
     purchased_by = models.ForeignKey(Employee, on_delete=models.SET_NULL, null=True, blank=True)
     receipt_attachment = models.ForeignKey(Attachment, on_delete=models.SET_NULL, null=True, blank=True)
     incurred_on = models.DateField()
-    created_at = models.DateTimeField(auto_now_add=True)
\ No newline at end of file
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    tenancy_path = 'crop__field__farm'
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['owner', '-created_at', '-id'], name='cropexp_owner_created_idx'),
+            models.Index(fields=['crop', '-created_at', '-id'], name='cropexp_crop_created_idx'),
+            models.Index(fields=['crop', '-incurred_on'], name='cropexp_crop_incurred_idx'),
+        ]
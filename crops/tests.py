@@ -1,3 +1,48 @@
-from django.test import TestCase
+import importlib
 
-# Create your tests here.
+from django.apps import apps
+
+from crops.models import Crop, CropExpense, CropTask
+from utils.testing import QueryPlanMixin, ServiceTestCase, make_crop, make_crop_expense, make_farm, make_field, make_user
+
+
+class AccessPathIndexTests(QueryPlanMixin, ServiceTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = make_user('owner')
+        cls.crop = make_crop(make_field(make_farm(cls.owner)))
+        make_crop_expense(cls.crop)
+
+    def test_task_list_uses_owner_index(self):
+        self.assertUsesIndex(CropTask.objects.filter(owner=self.owner).order_by('-created_at', '-id'), 'croptask_owner_created_idx')
+
+    def test_expense_list_uses_owner_index(self):
+        self.assertUsesIndex(
+            CropExpense.objects.filter(owner=self.owner).order_by('-created_at', '-id'), 'cropexp_owner_created_idx'
+        )
+
+    def test_expense_list_is_one_query_without_joins(self):
+        self.client.force_authenticate(self.owner)
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/crop-expenses/')
+        self.assertEqual(len(response.json()['results']), 1)
+
+
+class TenancyBackfillTests(ServiceTestCase):
+    def test_migration_backfills_rows_written_before_the_columns_existed(self):
+        owner = make_user('owner')
+        expense = make_crop_expense(make_crop(make_field(make_farm(owner))))
+        CropExpense.objects.update(farm=None, owner=None)
+        importlib.import_module('crops.migrations.0004_backfill_tenancy').backfill_tenancy(apps, None)
+
+        self.client.force_authenticate(owner)
+        response = self.client.get('/api/crop-expenses/')
+        self.assertEqual([row['id'] for row in response.json()['results']], [expense.pk])
+
+    def test_migration_backfills_crops(self):
+        owner = make_user('owner')
+        crop = make_crop(make_field(make_farm(owner)))
+        Crop.objects.update(farm=None, owner=None)
+        importlib.import_module('crops.migrations.0005_crop_tenancy').backfill_tenancy(apps, None)
+        crop.refresh_from_db()
+        self.assertEqual((crop.farm_id, crop.owner_id), (crop.field.farm_id, owner.pk))
@@ -1,7 +1,9 @@
+from django.conf import settings
 from rest_framework import serializers
-from ..models import Farm, Field, EnvironmentalData
+from ..models import Farm, Field, EnvironmentalData, SensorReading
 from accounts.models import CustomUser
 from datetime import datetime, date
+from utils.bulk import BulkListSerializer
 
 
 class FarmSerializer(serializers.ModelSerializer):
@@ -88,6 +90,7 @@ class EnvironmentalDataSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = EnvironmentalData
+        list_serializer_class = BulkListSerializer
         fields = [
             'id',
             'farm',
@@ -140,4 +143,29 @@ class EnvironmentalDataSerializer(serializers.ModelSerializer):
     def validate_additional_info(self, value):
         if value is not None and not isinstance(value, dict):
             raise serializers.ValidationError("Additional info must be a valid JSON object.")
-        return value
\ No newline at end of file
+        return value
+
+
+class SensorReadingSerializer(serializers.ModelSerializer):
+    farm = serializers.PrimaryKeyRelatedField(queryset=Farm.objects.all())
+
+    class Meta:
+        model = SensorReading
+        list_serializer_class = BulkListSerializer
+        fields = ['farm', 'metric', 'recorded_at', 'value']
+
+
+class SeriesQuerySerializer(serializers.Serializer):
+    farm = serializers.IntegerField()
+    metric = serializers.ChoiceField(choices=SensorReading.METRIC_CHOICES)
+    start = serializers.DateTimeField()
+    end = serializers.DateTimeField()
+    step = serializers.IntegerField(required=False, min_value=1, help_text="Point spacing in seconds.")
+
+    def validate(self, attrs):
+        if attrs['end'] <= attrs['start']:
+            raise serializers.ValidationError("End must be after start.")
+        step = attrs.get('step')
+        if step and (attrs['end'] - attrs['start']).total_seconds() / step > settings.FARMS_TS_MAX_POINTS:
+            raise serializers.ValidationError({'step': [f"Step is too small for this range; at most {settings.FARMS_TS_MAX_POINTS} points are returned."]})
+        return attrs
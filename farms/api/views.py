@@ -1,62 +1,81 @@
-from rest_framework import viewsets
+from django.conf import settings
+from rest_framework import status, viewsets
+from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
-from rest_framework.exceptions import ValidationError
+from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
 from farms.models import Farm, Field, EnvironmentalData
-from farms.api.serializers import FarmSerializer, FieldSerializer, EnvironmentalDataSerializer
-import logging
+from farms.api.serializers import (
+    FarmSerializer, FieldSerializer, EnvironmentalDataSerializer, SensorReadingSerializer, SeriesQuerySerializer
+)
+from farms.cache import CachedPayloadMixin
+from farms.timeseries import ingest, query_series
+from utils.bulk import BulkModelMixin
 
-logger = logging.getLogger(__name__)
-
-class FarmViewSet(viewsets.ModelViewSet):
+class FarmViewSet(CachedPayloadMixin, viewsets.ModelViewSet):
     queryset = Farm.objects.all()
     serializer_class = FarmSerializer
     permission_classes = [IsAuthenticated]
+    cache_model_name = 'farm'
 
-    def create(self, request, *args, **kwargs):
-        logger.info(f"FarmViewSet: Received POST request with data: {request.data}")
-        try:
-            response = super().create(request, *args, **kwargs)
-            logger.info(f"FarmViewSet: Response: {response.data}")
-            return response
-        except ValidationError as e:
-            logger.error(f"FarmViewSet: Validation error: {e}")
-            raise
-        except Exception as e:
-            logger.error(f"FarmViewSet: Unexpected error: {e}")
-            raise
-
-class FieldViewSet(viewsets.ModelViewSet):
+class FieldViewSet(CachedPayloadMixin, viewsets.ModelViewSet):
     queryset = Field.objects.all()
     serializer_class = FieldSerializer
     permission_classes = [IsAuthenticated]
+    cache_model_name = 'field'
 
-    def create(self, request, *args, **kwargs):
-        logger.info(f"FieldViewSet: Received POST request with data: {request.data}")
-        try:
-            response = super().create(request, *args, **kwargs)
-            logger.info(f"FieldViewSet: Response: {response.data}")
-            return response
-        except ValidationError as e:
-            logger.error(f"FieldViewSet: Validation error: {e}")
-            raise
-        except Exception as e:
-            logger.error(f"FieldViewSet: Unexpected error: {e}")
-            raise
-
-class EnvironmentalDataViewSet(viewsets.ModelViewSet):
+class EnvironmentalDataViewSet(BulkModelMixin, viewsets.ModelViewSet):
     queryset = EnvironmentalData.objects.all()
     serializer_class = EnvironmentalDataSerializer
     permission_classes = [IsAuthenticated]
+    max_page_size = 500
+
+    def get_queryset(self):
+        return self.queryset.filter(farm__owner=self.request.user)
+
+    @action(detail=False, methods=['post'], url_path='readings')
+    def readings(self, request):
+        """
+        Accept a list of sub-daily sensor readings for the user's farms.
+
+        Readings are buffered and written in batches, so they show up in
+        `series` after the next flush. Invalid rows reject the request unless
+        ?on_error=skip is given.
+        """
+        serializer = SensorReadingSerializer(data=request.data, many=True, max_length=settings.FARMS_TS_FLUSH_BATCH)
+        serializer.child.fields['farm'].queryset = Farm.objects.filter(owner=request.user)
+        serializer.is_valid(raise_exception=True)
+        if serializer.row_errors and request.query_params.get('on_error') != 'skip':
+            return Response({'errors': serializer.row_errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        ingest([{**row, 'farm': row['farm'].id} for row in serializer.validated_data])
+        return Response(
+            {'count': len(serializer.validated_data), 'errors': serializer.row_errors},
+            status=status.HTTP_202_ACCEPTED,
+        )
+
+    @action(detail=False, methods=['get'], url_path='series')
+    def series(self, request):
+        """
+        Range query over sensor readings: ?farm=&metric=&start=&end=&step=.
+
+        `step` is the point spacing in seconds and defaults to the spacing
+        that fits FARMS_TS_MAX_POINTS points. Answers come from daily or
+        hourly rollups whenever `step` allows it.
+        """
+        query = SeriesQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        params = query.validated_data
+        if not Farm.objects.filter(pk=params['farm'], owner=request.user).exists():
+            raise NotFound("Farm not found.")
 
-    def create(self, request, *args, **kwargs):
-        logger.info(f"EnvironmentalDataViewSet: Received POST request with data: {request.data}")
-        try:
-            response = super().create(request, *args, **kwargs)
-            logger.info(f"EnvironmentalDataViewSet: Response: {response.data}")
-            return response
-        except ValidationError as e:
-            logger.error(f"EnvironmentalDataViewSet: Validation error: {e}")
-            raise
-        except Exception as e:
-            logger.error(f"EnvironmentalDataViewSet: Unexpected error: {e}")
-            raise
+        span = (params['end'] - params['start']).total_seconds()
+        step = params.get('step') or max(1, int(-(-span // settings.FARMS_TS_MAX_POINTS)))
+        resolution, points = query_series(params['farm'], params['metric'], params['start'], params['end'], step)
+        return Response({
+            'farm': params['farm'],
+            'metric': params['metric'],
+            'step': step,
+            'resolution': resolution,
+            'points': points,
+        })
@@ -0,0 +1,205 @@
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from utils.wire import PROTOCOLS, encode_frames
+import json
+import logging
+import redis
+import weakref
+
+logger = logging.getLogger(__name__)
+
+# One worker keeps group sends in commit order while keeping them off the request thread.
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='farm-broadcast')
+# The open buffer of each database connection (connections are per thread).
+_buffers = weakref.WeakKeyDictionary()
+_journal = None
+
+
+def farm_group(farm_id):
+    return f'farm_{farm_id}'
+
+
+def journal_key(farm_id):
+    return f'farms:cdc:{farm_id}'
+
+
+def get_journal():
+    """Redis connection holding the per-farm change streams used for resume."""
+    global _journal
+    if _journal is None:
+        _journal = redis.Redis.from_url(settings.REDIS_URL, decode_responses=True)
+    return _journal
+
+
+class ChangeBuffer:
+    """Changes made inside one transaction, coalesced per farm and per row."""
+
+    def __init__(self, hooks=None, savepoints=()):
+        self.farms = {}
+        self.hooks = hooks
+        self.savepoints = savepoints
+
+    def is_open(self, connection):
+        """
+        Whether this buffer's flush is still queued on `connection`.
+
+        Django swaps in a new run_on_commit list whenever it runs or drops
+        queued hooks (commit, rollback, savepoint rollback), so the buffer is
+        live while the list it was queued on is current. It is also only
+        extended at the savepoint depth it was opened at, so that a savepoint
+        rollback drops exactly the changes made inside it.
+        """
+        return self.hooks is connection.run_on_commit and self.savepoints == tuple(connection.savepoint_ids)
+
+    def add(self, farm_id, change):
+        changes = self.farms.setdefault(farm_id, {})
+        key = (change['model'], change['id'])
+        previous = changes.get(key)
+        if previous is None:
+            changes[key] = change
+        elif change['op'] == 'delete':
+            if previous['op'] == 'create':
+                del changes[key]
+            else:
+                changes[key] = change
+        else:
+            # create+update stays a create; update+update merges the changed fields.
+            previous['fields'].update(change['fields'])
+
+    def flush(self):
+        batches = {farm_id: list(changes.values()) for farm_id, changes in self.farms.items() if changes}
+        if not batches:
+            return
+        if settings.FARMS_BROADCAST_ASYNC:
+            _executor.submit(_send, batches)
+        else:
+            _send(batches)
+
+
+def queue_change(farm_id, change, using=DEFAULT_DB_ALIAS):
+    """
+    Record a row change for `farm_id` and publish it once the transaction commits.
+
+    `change` is {'model': label, 'op': 'create'|'update'|'delete', 'id': pk,
+    'fields': {...}}. Changes are coalesced into one 'model.update' event per
+    farm for each stretch of the transaction between savepoint boundaries,
+    which is the whole transaction when it uses none. Changes from a
+    rolled-back transaction or savepoint are never sent.
+    """
+    connection = connections[using]
+    if not connection.in_atomic_block:
+        buffer = ChangeBuffer()
+        buffer.add(farm_id, change)
+        buffer.flush()
+        return
+    buffer = _buffers.get(connection)
+    if buffer is None or not buffer.is_open(connection):
+        buffer = ChangeBuffer(savepoints=tuple(connection.savepoint_ids))
+        transaction.on_commit(buffer.flush, using=using)
+        buffer.hooks = connection.run_on_commit
+        _buffers[connection] = buffer
+    buffer.add(farm_id, change)
+
+
+def _append_to_journal(farm_id, changes):
+    """
+    Append a batch to the farm's change stream and return (previous, token):
+    the id of the entry it follows (None if the stream was empty) and its own
+    id, the client's resume token. Both are None if the journal is down.
+    """
+    key = journal_key(farm_id)
+    try:
+        # MULTI/EXEC, so no other batch can be appended between the two.
+        pipe = get_journal().pipeline(transaction=True)
+        pipe.xrevrange(key, count=1)
+        pipe.xadd(key, {'changes': json.dumps(changes)}, maxlen=settings.FARMS_CDC_JOURNAL_MAXLEN, approximate=True)
+        last, token = pipe.execute()
+    except redis.RedisError as e:
+        logger.error(f"Failed to journal changes for farm {farm_id}: {e}")
+        return None, None
+    return (last[0][0] if last else None), token
+
+
+def parse_token(token):
+    """Turn a stream id ('1700000000000-3') into a comparable tuple, or None if malformed."""
+    try:
+        millis, sequence = token.split('-')
+        return int(millis), int(sequence)
+    except (AttributeError, ValueError):
+        return None
+
+
+def read_journal(farm_id, since, before=None):
+    """
+    Return (batches, complete) for everything journaled after token `since`,
+    and before token `before` when given.
+
+    `complete` is False when the token is malformed or older than the oldest
+    retained entry, meaning changes may have been trimmed and the client has
+    to refetch.
+    """
+    position = parse_token(since)
+    if position is None:
+        return [], False
+    journal = get_journal()
+    key = journal_key(farm_id)
+    oldest = journal.xrange(key, count=1)
+    if oldest and parse_token(oldest[0][0]) > position:
+        return [], False
+    entries = journal.xrange(key, min=f'({since}', max=f'({before}' if before else '+', count=settings.FARMS_CDC_REPLAY_LIMIT + 1)
+    if len(entries) > settings.FARMS_CDC_REPLAY_LIMIT:
+        return [], False
+    return [(token, json.loads(fields['changes'])) for token, fields in entries], True
+
+
+def pack_changes(changes):
+    """
+    Delta-encoded form of a change batch for the compact WebSocket protocols.
+
+    Changes are grouped by model, op and field names into
+    [model, op, [field, ...], [[id, value, ...], ...]], so field names go out
+    once per group rather than once per row. Rows in a group are sorted by
+    id, and every id after the first is sent as the difference from the
+    previous one. Order across groups is not kept; the batch is applied as
+    a whole.
+    """
+    groups = {}
+    for change in changes:
+        key = (change['model'], change['op'], tuple(change['fields']))
+        groups.setdefault(key, []).append(change)
+    packed = []
+    for (model, op, names), rows in groups.items():
+        rows.sort(key=lambda change: change['id'])
+        previous = 0
+        encoded = []
+        for change in rows:
+            encoded.append([change['id'] - previous, *(change['fields'][name] for name in names)])
+            previous = change['id']
+        packed.append([model, op, list(names), encoded])
+    return packed
+
+
+def changes_frames(token, changes, protocols=PROTOCOLS):
+    return encode_frames(
+        {'type': 'changes', 'token': token, 'changes': changes},
+        {'type': 'changes', 'token': token, 'groups': pack_changes(changes)},
+        protocols=protocols,
+    )
+
+
+def _send(batches):
+    channel_layer = get_channel_layer()
+    for farm_id, changes in batches.items():
+        previous, token = _append_to_journal(farm_id, changes)
+        if channel_layer is None:
+            continue
+        try:
+            async_to_sync(channel_layer.group_send)(
+                farm_group(farm_id),
+                {'type': 'model.update', 'token': token, 'previous': previous, 'frames': changes_frames(token, changes)}
+            )
+        except Exception as e:
+            logger.error(f"Failed to broadcast update to farm {farm_id}: {e}")
@@ -0,0 +1,81 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.http import parse_etags, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+import hashlib
+import json
+
+
+def payload_key(model_name, pk):
+    return f'farms:payload:{model_name}:{pk}'
+
+
+def make_entry(data):
+    body = json.dumps(data, cls=JSONEncoder, sort_keys=True)
+    return {'etag': quote_etag(hashlib.sha1(body.encode('utf-8')).hexdigest()), 'data': dict(data)}
+
+
+def invalidate_payload(model_name, pk):
+    cache.delete(payload_key(model_name, pk))
+
+
+def etag_matches(request, etag):
+    candidates = parse_etags(request.headers.get('If-None-Match', ''))
+    return '*' in candidates or etag in candidates
+
+
+class CachedPayloadMixin:
+    """
+    Read-through Redis cache of serialized payloads for retrieve and list.
+
+    Each object's serialized data is cached under farms:payload:<model>:<pk>
+    together with an ETag. farms.signals drops the entry once a change to the
+    row commits. A retrieve still goes through get_object(), so the queryset
+    and object permissions decide access, and serializes only on a miss; a
+    matching If-None-Match gets a 304. List pages
+    run their keyset query, serialize only cache misses and also honour
+    If-None-Match.
+    """
+    cache_model_name = None
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        key = payload_key(self.cache_model_name, instance.pk)
+        entry = cache.get(key)
+        if entry is None:
+            entry = make_entry(self.get_serializer(instance).data)
+            cache.set(key, entry, timeout=settings.FARMS_PAYLOAD_CACHE_TTL)
+        return self._conditional_response(request, entry['data'], entry['etag'])
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        instances = page if page is not None else list(queryset)
+
+        keys = [payload_key(self.cache_model_name, instance.pk) for instance in instances]
+        cached = cache.get_many(keys)
+        missing = {}
+        for key, instance in zip(keys, instances):
+            if key not in cached:
+                missing[key] = make_entry(self.get_serializer(instance).data)
+        if missing:
+            cache.set_many(missing, timeout=settings.FARMS_PAYLOAD_CACHE_TTL)
+            cached.update(missing)
+
+        entries = [cached[key] for key in keys]
+        data = [entry['data'] for entry in entries]
+        response = self.get_paginated_response(data) if page is not None else Response(data)
+        links = [response.data.get('next'), response.data.get('previous')] if page is not None else []
+        digest = hashlib.sha1(json.dumps([entry['etag'] for entry in entries] + links).encode('utf-8'))
+        etag = quote_etag(digest.hexdigest())
+        if etag_matches(request, etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+        response['ETag'] = etag
+        return response
+
+    def _conditional_response(self, request, data, etag):
+        if etag_matches(request, etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+        return Response(data, headers={'ETag': etag})
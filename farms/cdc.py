@@ -0,0 +1,141 @@
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DEFAULT_DB_ALIAS, router
+from django.db.models.signals import post_init, post_save
+from functools import wraps
+from .broadcast import queue_change
+import json
+
+# Models that publish change events, mapped to their lookup path to Farm.
+tracked_models = {}
+
+
+def track_changes(farm_path, exclude=('created_at', 'updated_at')):
+    """
+    Class decorator opting a model into the farm change stream.
+
+    `farm_path` is the field holding the model's farm id, normally the
+    denormalized 'farm' column; use 'id' on Farm itself. Saves publish only
+    the fields that changed since the row was loaded. Model.delete()
+    publishes the id of that row alone: rows removed by its cascade are
+    implied, so deleting a Farm is one farm-level delete. No delete signal is
+    connected, which keeps Django's fast-delete for child tables;
+    QuerySet.delete() therefore sends nothing, and callers publish with
+    publish_deletes() first. Events are grouped per farm and sent after
+    commit by farms.broadcast. Clients subscribe through
+    farms.consumers.FarmConsumer.
+    """
+    def decorator(model):
+        tracked_models[model] = farm_path
+        model._cdc_exclude = frozenset(exclude)
+        model.delete = _publishing_delete(model.delete)
+        post_init.connect(_snapshot, sender=model, weak=False, dispatch_uid=f'cdc_init_{model._meta.label}')
+        post_save.connect(_publish_save, sender=model, weak=False, dispatch_uid=f'cdc_save_{model._meta.label}')
+        return model
+    return decorator
+
+
+def _field_values(instance):
+    # Read loaded values straight from __dict__ so deferred fields never trigger a query.
+    values = {}
+    for field in instance._meta.concrete_fields:
+        if field.attname in instance.__dict__ and field.name not in instance._cdc_exclude:
+            values[field.attname] = instance.__dict__[field.attname]
+    return values
+
+
+def _to_json(values):
+    return json.loads(json.dumps(values, cls=DjangoJSONEncoder))
+
+
+def _farm_id(instance):
+    path = tracked_models[type(instance)].split('__')
+    target = instance
+    for name in path[:-1]:
+        target = getattr(target, name)
+        if target is None:
+            return None
+    field = target._meta.get_field(path[-1])
+    return getattr(target, field.attname)
+
+
+def _snapshot(sender, instance, **kwargs):
+    instance._cdc_snapshot = _field_values(instance)
+
+
+def _publish_save(sender, instance, created, raw=False, using=None, **kwargs):
+    if raw:
+        return
+    current = _field_values(instance)
+    if created:
+        op, changed = 'create', current
+    else:
+        previous = getattr(instance, '_cdc_snapshot', {})
+        op = 'update'
+        changed = {name: value for name, value in current.items() if name not in previous or previous[name] != value}
+        if not changed:
+            instance._cdc_snapshot = current
+            return
+    instance._cdc_snapshot = current
+
+    farm_id = _farm_id(instance)
+    if farm_id is None:
+        return
+    queue_change(farm_id, {
+        'model': sender._meta.label_lower,
+        'op': op,
+        'id': instance.pk,
+        'fields': _to_json(changed),
+    }, using=using)
+
+
+def publish_bulk(model, instances, op, fields=None, using=None):
+    """
+    Publish 'create' or 'update' events for rows written with bulk_create() or
+    bulk_update(), which do not send post_save. `fields` limits an update
+    event to the columns that were written.
+    """
+    if model not in tracked_models:
+        return
+    attnames = None if fields is None else {model._meta.get_field(name).attname for name in fields}
+    for instance in instances:
+        current = _field_values(instance)
+        instance._cdc_snapshot = current
+        farm_id = _farm_id(instance)
+        if farm_id is None:
+            continue
+        changed = current if attnames is None else {name: value for name, value in current.items() if name in attnames}
+        queue_change(farm_id, {
+            'model': model._meta.label_lower,
+            'op': op,
+            'id': instance.pk,
+            'fields': _to_json(changed),
+        }, using=using or instance._state.db or DEFAULT_DB_ALIAS)
+
+
+def publish_deletes(queryset):
+    """
+    Publish 'delete' events for every row of `queryset`, with one query.
+    Call it inside the transaction, before queryset.delete().
+    """
+    model = queryset.model
+    if model not in tracked_models:
+        return
+    for pk, farm_id in queryset.values_list('pk', tracked_models[model]):
+        if farm_id is not None:
+            queue_change(farm_id, _delete_change(model, pk), using=queryset.db)
+
+
+def _delete_change(model, pk):
+    return {'model': model._meta.label_lower, 'op': 'delete', 'id': pk, 'fields': {}}
+
+
+def _publishing_delete(delete):
+    @wraps(delete)
+    def wrapper(self, using=None, keep_parents=False):
+        using = using or router.db_for_write(type(self), instance=self)
+        farm_id, change = _farm_id(self), _delete_change(type(self), self.pk)
+        result = delete(self, using=using, keep_parents=keep_parents)
+        if farm_id is not None:
+            queue_change(farm_id, change, using=using)
+        return result
+    return wrapper
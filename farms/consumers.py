@@ -0,0 +1,90 @@
+from asgiref.sync import sync_to_async
+from channels.generic.websocket import AsyncWebsocketConsumer
+from channels.db import database_sync_to_async
+from urllib.parse import parse_qs
+from utils.wire import WireProtocolMixin
+from .broadcast import changes_frames, farm_group, parse_token, read_journal
+from .models import Farm
+import logging
+import redis
+
+logger = logging.getLogger(__name__)
+
+class FarmConsumer(WireProtocolMixin, AsyncWebsocketConsumer):
+    """
+    Push stream of row changes for one farm.
+
+    Each frame is {'type': 'changes', 'token': ..., 'changes': [...]}. A client
+    that reconnects with ?since=<last token> is first sent every batch it
+    missed. If the gap can no longer be replayed it gets {'type': 'resync'}
+    and should refetch.
+
+    Batches are delivered in journal order. Group sends from different
+    processes can arrive out of that order. Each event names the journal
+    entry it follows, so when that is not the last batch delivered, the
+    journaled batches in between are sent first; a batch that was already
+    delivered that way is skipped when it arrives. Events that follow on
+    directly never touch the journal.
+
+    With the agricore.msgpack or agricore.json subprotocol (utils.wire) the
+    frames are compact and binary, and 'changes' is replaced by 'groups',
+    the delta-encoded form from farms.broadcast.pack_changes.
+    """
+
+    async def connect(self):
+        self.farm_id = int(self.scope['url_route']['kwargs']['farm_id'])
+        self.group_name = farm_group(self.farm_id)
+        self.last_token = None
+
+        if not await self.is_owner():
+            await self.close()
+            return
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+
+        since = parse_qs(self.scope['query_string'].decode()).get('since')
+        if since:
+            await self.replay(since[0])
+
+    async def disconnect(self, close_code):
+        await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def replay(self, since):
+        self.last_token = since
+        await self.catch_up()
+
+    async def catch_up(self, before=None):
+        """Send the journaled batches after the last delivered token (and before token `before`)."""
+        try:
+            batches, complete = await sync_to_async(read_journal, thread_sensitive=False)(
+                self.farm_id, self.last_token, before
+            )
+        except redis.RedisError as e:
+            logger.error(f"Failed to read the change journal of farm {self.farm_id}: {e}")
+            return
+        if not complete:
+            self.last_token = None
+            await self.send_payload({'type': 'resync'})
+            return
+        for token, changes in batches:
+            await self.send_changes(token, changes_frames(token, changes, protocols=(self.protocol,)))
+
+    async def model_update(self, event):
+        token = event.get('token')
+        if token and self.last_token:
+            if parse_token(token) <= parse_token(self.last_token):
+                return
+            if event.get('previous') != self.last_token:
+                # Batches journaled in between whose group send has not arrived yet go first.
+                await self.catch_up(before=token)
+        await self.send_changes(token, event['frames'])
+
+    async def send_changes(self, token, frames):
+        if token:
+            self.last_token = token
+        await self.send_frames(frames)
+
+    @database_sync_to_async
+    def is_owner(self):
+        user = self.scope['user']
+        return user.is_authenticated and Farm.objects.filter(id=self.farm_id, owner=user).exists()
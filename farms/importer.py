@@ -0,0 +1,395 @@
+from datetime import datetime
+from itertools import islice
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError as APIValidationError
+from rest_framework.parsers import MultiPartParser
+from rest_framework.response import Response
+from analytics.models import FarmFinance
+from inventory.models import Inventory
+from livestock.models import Animal, LivestockUnit
+from .cdc import publish_bulk
+from .models import Farm, ImportJob
+import csv
+import hashlib
+import io
+import time
+
+
+class ImportSpec:
+    """
+    Describes how one CSV kind maps onto a model.
+
+    `columns` are the model fields read from the file, `relations` maps each
+    foreign key column to the owner lookup that scopes it, and `choices`
+    lists the accepted values of enum-like columns.
+    """
+    model = None
+    columns = ()
+    relations = {}
+    choices = {}
+    # (column, model field) pairs linking a row to other rows of the same kind by tag.
+    links = ()
+
+    @classmethod
+    def related_queryset(cls, column, owner):
+        related_model, owner_lookup = cls.relations[column]
+        return related_model.objects.filter(**{owner_lookup: owner})
+
+
+class InventoryImport(ImportSpec):
+    model = Inventory
+    columns = ('farm', 'item_name', 'category', 'quantity', 'unit', 'reorder_threshold', 'supplier', 'last_received_date')
+    relations = {'farm': (Farm, 'owner')}
+
+
+class FinanceImport(ImportSpec):
+    model = FarmFinance
+    columns = ('farm', 'type', 'category', 'amount', 'currency', 'description', 'date')
+    relations = {'farm': (Farm, 'owner')}
+    choices = {'type': ('income', 'expense')}
+
+
+class AnimalImport(ImportSpec):
+    model = Animal
+    columns = (
+        'livestock_unit', 'tag_id', 'name', 'sex', 'age_group', 'dob', 'breed', 'status',
+        'health_score', 'value_estimate', 'additional_notes',
+    )
+    relations = {'livestock_unit': (LivestockUnit, 'field__farm__owner')}
+    choices = {'sex': ('male', 'female')}
+    links = (('father_tag', 'father'), ('mother_tag', 'mother'))
+
+
+IMPORT_SPECS = {
+    'inventory': InventoryImport,
+    'finance': FinanceImport,
+    'animals': AnimalImport,
+}
+
+
+def file_hash(chunks):
+    digest = hashlib.sha1()
+    for chunk in chunks:
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def start_job(owner, kind, digest, file_name='', restart=False):
+    """
+    The job to run for this file: the unfinished job of an earlier attempt on
+    the same content, so it resumes after its last committed batch, or a new
+    one. A completed job is returned as is unless `restart` is set.
+    """
+    if not restart:
+        job = ImportJob.objects.filter(owner=owner, kind=kind, file_hash=digest).order_by('-id').first()
+        if job is not None:
+            return job
+    return ImportJob.objects.create(owner=owner, kind=kind, file_hash=digest, file_name=file_name[:255])
+
+
+class Importer:
+    """
+    Loads a CSV into the spec's model in batches of `batch_size` rows.
+
+    Each batch is validated column by column: cells are coerced with the
+    model field's to_python() and validators, enum columns are checked
+    against `choices`, and every foreign key column is resolved with one
+    owner-scoped query for the whole batch. Valid rows are written with one
+    bulk_create(); invalid rows are skipped and reported by file line. The
+    batch and the job's progress commit together, so a rerun of the same
+    file continues after the last committed batch.
+
+    Kinds with `links` (animal father/mother tags) take a second pass once
+    every row exists, so a row may name a parent that appears later in the
+    file.
+    """
+
+    def __init__(self, job, batch_size=None, progress=None):
+        self.job = job
+        self.spec = IMPORT_SPECS[job.kind]
+        self.batch_size = batch_size or settings.IMPORT_BATCH_SIZE
+        self.progress = progress
+        self.fields = {column: self.spec.model._meta.get_field(column) for column in self.spec.columns}
+
+    def run(self, open_file):
+        """Import from the text file returned by `open_file()`, which is called once per pass."""
+        if self.job.status == 'completed':
+            return self.job
+        self.started = time.monotonic()
+        self.processed = 0
+        self.job.status = 'running'
+        self.job.save(update_fields=['status', 'updated_at'])
+        try:
+            with open_file() as handle:
+                self.load_rows(handle)
+            if self.spec.links:
+                with open_file() as handle:
+                    self.link_rows(handle)
+        except Exception as e:
+            self.job.status = 'failed'
+            self.add_errors([{'line': None, 'errors': {'file': [str(e)]}}])
+            self.job.save(update_fields=['status', 'errors', 'updated_at'])
+            raise
+        self.job.status = 'completed'
+        self.job.rows_per_second = self.rate()
+        self.job.save(update_fields=['status', 'rows_per_second', 'updated_at'])
+        return self.job
+
+    def reader(self, handle):
+        reader = csv.DictReader(handle)
+        header = [name.strip() for name in reader.fieldnames or ()]
+        required = [
+            column for column, field in self.fields.items()
+            if not (field.blank or field.null or field.has_default())
+        ]
+        missing = [column for column in required if column not in header]
+        if missing:
+            raise ValidationError(f"Missing required columns: {missing}")
+        reader.fieldnames = header
+        return reader
+
+    def batches(self, reader, skip):
+        rows = islice(reader, skip, None)
+        while True:
+            batch = []
+            for row in islice(rows, self.batch_size):
+                batch.append((reader.line_num, row))
+            if not batch:
+                return
+            yield batch
+
+    def add_errors(self, errors):
+        room = settings.IMPORT_MAX_ERRORS - len(self.job.errors)
+        if room > 0:
+            self.job.errors = self.job.errors + errors[:room]
+
+    def rate(self):
+        elapsed = time.monotonic() - self.started
+        return round(self.processed / elapsed, 1) if elapsed else None
+
+    def report(self, phase, done, count):
+        self.processed += count
+        if self.progress:
+            self.progress(self.job, phase, done, self.rate())
+
+    # Pass 1: rows
+
+    def load_rows(self, handle):
+        reader = self.reader(handle)
+        for batch in self.batches(reader, self.job.rows_committed):
+            objs, errors = self.validate(batch)
+            with transaction.atomic():
+                if hasattr(self.spec.model, 'assign_tenancy'):
+                    self.spec.model.assign_tenancy(objs)
+                created = self.spec.model.objects.bulk_create(objs)
+                publish_bulk(self.spec.model, created, 'create')
+                self.job.rows_committed += len(batch)
+                self.job.imported += len(created)
+                self.job.rejected += len(errors)
+                self.add_errors(errors)
+                self.job.save(update_fields=['rows_committed', 'imported', 'rejected', 'errors', 'updated_at'])
+            self.report('rows', self.job.rows_committed, len(batch))
+
+    def validate(self, batch):
+        """Coerce and check `batch` one column at a time; returns (unsaved instances, row errors)."""
+        values = [{} for _ in batch]
+        row_errors = [{} for _ in batch]
+        for column, field in self.fields.items():
+            allowed = self.spec.choices.get(column)
+            for index, (_, row) in enumerate(batch):
+                try:
+                    value = self.coerce(field, row.get(column))
+                    if allowed is not None and value not in allowed and value not in (None, ''):
+                        raise ValidationError(f"Must be one of: {list(allowed)}")
+                except ValidationError as e:
+                    row_errors[index][column] = e.messages
+                else:
+                    values[index][field.attname] = value
+
+        for column in self.spec.relations:
+            attname = self.fields[column].attname
+            ids = {row[attname] for row in values if row.get(attname) is not None}
+            known = set(self.spec.related_queryset(column, self.job.owner).filter(pk__in=ids).values_list('pk', flat=True))
+            for index, row in enumerate(values):
+                if row.get(attname) is not None and row[attname] not in known:
+                    row_errors[index][column] = [f"Object with id {row[attname]} does not exist."]
+
+        objs, errors = [], []
+        for (line, _), row, row_error in zip(batch, values, row_errors):
+            if row_error:
+                errors.append({'line': line, 'errors': row_error})
+            else:
+                objs.append(self.spec.model(**row))
+        return objs, errors
+
+    def coerce(self, field, raw):
+        raw = (raw or '').strip()
+        if raw == '':
+            if field.null:
+                return None
+            if field.has_default():
+                return field.get_default()
+            if field.blank:
+                return ''
+            raise ValidationError("This field is required.")
+        if isinstance(field, models.ForeignKey):
+            return field.target_field.to_python(raw)
+        value = field.to_python(raw)
+        if isinstance(value, datetime) and timezone.is_naive(value):
+            value = timezone.make_aware(value)
+        field.run_validators(value)
+        return value
+
+    # Pass 2: links between rows of the same file
+
+    def link_rows(self, handle):
+        reader = self.reader(handle)
+        for batch in self.batches(reader, self.job.links_committed):
+            updates, errors = self.resolve_links(batch)
+            fields = [field for _, field in self.spec.links]
+            with transaction.atomic():
+                if updates:
+                    self.spec.model.objects.bulk_update(updates, fields)
+                    publish_bulk(self.spec.model, updates, 'update', fields=fields)
+                self.job.links_committed += len(batch)
+                # The row itself was imported; only the unresolved link is reported.
+                self.add_errors(errors)
+                self.job.save(update_fields=['links_committed', 'errors', 'updated_at'])
+            self.report('links', self.job.links_committed, len(batch))
+
+    def resolve_links(self, batch):
+        """
+        Match each row's own tag and its parent tags to animal ids with one
+        query per batch. Rows are matched to the animals this job created
+        (the newest with that tag on the farm); parents may be any animal of
+        the owner on the same farm.
+        """
+        wanted = [
+            (line, row) for line, row in batch
+            if any((row.get(column) or '').strip() for column, _ in self.spec.links)
+        ]
+        if not wanted:
+            return [], []
+
+        unit_ids = set()
+        for _, row in wanted:
+            try:
+                unit_ids.add(int(row.get('livestock_unit') or ''))
+            except ValueError:
+                pass
+        unit_farms = dict(
+            self.spec.related_queryset('livestock_unit', self.job.owner)
+            .filter(pk__in=unit_ids).values_list('pk', 'field__farm_id')
+        )
+        tags = set()
+        for _, row in wanted:
+            tags.add((row.get('tag_id') or '').strip())
+            tags.update((row.get(column) or '').strip() for column, _ in self.spec.links)
+        tags.discard('')
+
+        animals, created_here = {}, {}
+        rows = (
+            self.spec.model.objects.filter(owner=self.job.owner, tag_id__in=tags)
+            .order_by('pk').values_list('pk', 'farm_id', 'tag_id', 'created_at')
+        )
+        for pk, farm_id, tag_id, created_at in rows:
+            animals[(farm_id, tag_id)] = pk
+            if created_at >= self.job.created_at:
+                created_here[(farm_id, tag_id)] = pk
+
+        updates, errors = [], []
+        for line, row in wanted:
+            try:
+                farm_id = unit_farms.get(int(row.get('livestock_unit') or ''))
+            except ValueError:
+                farm_id = None
+            child = created_here.get((farm_id, (row.get('tag_id') or '').strip()))
+            if child is None:
+                # The row itself was rejected in the first pass.
+                continue
+            instance = self.spec.model(pk=child, farm_id=farm_id)
+            row_errors = {}
+            for column, field in self.spec.links:
+                tag = (row.get(column) or '').strip()
+                if not tag:
+                    setattr(instance, f'{field}_id', None)
+                elif (farm_id, tag) in animals:
+                    setattr(instance, f'{field}_id', animals[(farm_id, tag)])
+                else:
+                    setattr(instance, f'{field}_id', None)
+                    row_errors[column] = [f"No animal tagged '{tag}' on this farm."]
+            updates.append(instance)
+            if row_errors:
+                errors.append({'line': line, 'errors': row_errors})
+        return updates, errors
+
+
+def job_summary(job):
+    return {
+        'id': job.id,
+        'kind': job.kind,
+        'file_name': job.file_name,
+        'status': job.status,
+        'rows_committed': job.rows_committed,
+        'imported': job.imported,
+        'rejected': job.rejected,
+        'rows_per_second': job.rows_per_second,
+        'errors': job.errors,
+    }
+
+
+class CSVImportMixin:
+    """
+    Adds an `import/` route taking a multipart CSV upload in field `file`.
+
+    Rows are streamed from the upload through Importer in batches of
+    ?batch_size= (IMPORT_BATCH_SIZE by default). Uploading the same file
+    again resumes an interrupted import, or returns the finished job;
+    ?restart=true imports it from the start.
+    """
+    import_kind = None
+
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser])
+    def import_csv(self, request, *args, **kwargs):
+        upload = request.FILES.get('file')
+        if upload is None:
+            raise APIValidationError({'file': ["No file was submitted."]})
+        try:
+            batch_size = int(request.query_params.get('batch_size') or settings.IMPORT_BATCH_SIZE)
+        except ValueError:
+            batch_size = 0
+        if not 0 < batch_size <= settings.IMPORT_MAX_BATCH_SIZE:
+            raise APIValidationError({'batch_size': [f"Must be between 1 and {settings.IMPORT_MAX_BATCH_SIZE}."]})
+
+        digest = file_hash(upload.chunks())
+        restart = request.query_params.get('restart') in ('1', 'true')
+        job = start_job(request.user, self.import_kind, digest, upload.name, restart=restart)
+
+        def open_upload():
+            upload.seek(0)
+            # Closing the wrapper would close the upload before the second pass.
+            return _Unclosed(io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline=''))
+
+        try:
+            Importer(job, batch_size=batch_size).run(open_upload)
+        except (ValidationError, UnicodeDecodeError, csv.Error) as e:
+            raise APIValidationError({'file': [str(e.messages[0] if isinstance(e, ValidationError) else e)]})
+        return Response(job_summary(job), status=status.HTTP_201_CREATED)
+
+
+class _Unclosed:
+    """Context manager yielding a text wrapper and detaching it from the upload on exit."""
+
+    def __init__(self, wrapper):
+        self.wrapper = wrapper
+
+    def __enter__(self):
+        return self.wrapper
+
+    def __exit__(self, *exc):
+        self.wrapper.detach()
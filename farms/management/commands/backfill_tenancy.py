@@ -0,0 +1,53 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+
+from farms.models import FarmScopedModel
+
+
+class Command(BaseCommand):
+    help = "Backfill or repair the denormalized farm/owner columns on farm-scoped tables."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', action='append', dest='models', help="Limit to app_label.Model (repeatable).")
+        parser.add_argument('--batch-size', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if batch_size <= 0:
+            raise CommandError("--batch-size must be positive.")
+
+        scoped = [model for model in apps.get_models() if issubclass(model, FarmScopedModel)]
+        if options['models']:
+            wanted = {label.lower() for label in options['models']}
+            scoped = [model for model in scoped if model._meta.label_lower in wanted]
+            if not scoped:
+                raise CommandError(f"No farm-scoped models match {sorted(wanted)}.")
+
+        for model in scoped:
+            updated = self.backfill_model(model, batch_size)
+            self.stdout.write(f"{model._meta.label}: {updated} rows updated")
+
+    def backfill_model(self, model, batch_size):
+        parent_field = model.tenancy_parent_field()
+        farm_lookup = model.tenancy_path.split('__', 1)[1]
+        parents = parent_field.related_model.objects.filter(pk=OuterRef(parent_field.attname))
+        farm_id = Subquery(parents.values(farm_lookup)[:1])
+        owner_id = Subquery(parents.values(f'{farm_lookup}__owner')[:1])
+
+        updated = 0
+        last_pk = 0
+        while True:
+            pks = list(
+                model.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:batch_size]
+            )
+            if not pks:
+                return updated
+            last_pk = pks[-1]
+            # Only touch rows that disagree with their parent chain, so reruns are cheap.
+            with transaction.atomic():
+                stale = model.objects.filter(pk__gte=pks[0], pk__lte=last_pk).exclude(
+                    farm_id=farm_id, owner_id=owner_id
+                )
+                updated += stale.update(farm_id=farm_id, owner_id=owner_id)
@@ -0,0 +1,57 @@
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.models import CustomUser
+from farms.importer import IMPORT_SPECS, Importer, file_hash, start_job
+
+
+class Command(BaseCommand):
+    help = "Import inventory, animals or finance rows from a CSV file, resuming an interrupted import of the same file."
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(IMPORT_SPECS))
+        parser.add_argument('path')
+        parser.add_argument('--user', required=True, help="Id or email of the owning user.")
+        parser.add_argument('--batch-size', type=int, default=None)
+        parser.add_argument('--restart', action='store_true', help="Start over instead of resuming a previous import of this file.")
+
+    def handle(self, *args, **options):
+        if options['batch_size'] is not None and options['batch_size'] <= 0:
+            raise CommandError("--batch-size must be positive.")
+        user = options['user']
+        lookup = {'pk': user} if user.isdigit() else {'email': user}
+        try:
+            owner = CustomUser.objects.get(**lookup)
+        except CustomUser.DoesNotExist:
+            raise CommandError(f"No user matches '{user}'.")
+
+        path = options['path']
+        try:
+            with open(path, 'rb') as handle:
+                digest = file_hash(iter(lambda: handle.read(1024 * 1024), b''))
+        except OSError as e:
+            raise CommandError(str(e))
+
+        job = start_job(owner, options['kind'], digest, path, restart=options['restart'])
+        if job.status == 'completed':
+            self.stdout.write(f"Import {job.id} of this file already completed; use --restart to import it again.")
+            return
+        if job.rows_committed:
+            self.stdout.write(f"Resuming import {job.id} after row {job.rows_committed}")
+
+        importer = Importer(job, batch_size=options['batch_size'], progress=self.progress)
+        try:
+            importer.run(lambda: open(path, encoding='utf-8-sig', newline=''))
+        except ValidationError as e:
+            raise CommandError(e.messages[0])
+
+        for error in job.errors[:20]:
+            self.stderr.write(f"Line {error['line']}: {error['errors']}")
+        if len(job.errors) > 20:
+            self.stderr.write(f"... {job.rejected - 20} more rejected rows")
+        self.stdout.write(
+            f"Import {job.id}: {job.imported} rows imported, {job.rejected} rejected, {job.rows_per_second} rows/s"
+        )
+
+    def progress(self, job, phase, done, rate):
+        self.stdout.write(f"{phase}: {done} rows committed ({rate} rows/s)")
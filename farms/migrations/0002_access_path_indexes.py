@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:27
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("farms", "0001_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="environmentaldata",
+            index=models.Index(fields=["farm", "-date"], name="envdata_farm_date_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="environmentaldata",
+            index=models.Index(
+                fields=["farm", "-created_at", "-id"], name="envdata_farm_created_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="farm",
+            index=models.Index(
+                fields=["owner", "-created_at", "-id"], name="farm_owner_created_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="field",
+            index=models.Index(
+                fields=["farm", "-created_at", "-id"], name="field_farm_created_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,136 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Django cannot create a partitioned table, so on PostgreSQL the plain table it
+# just created (still empty) is swapped for one range-partitioned by month on
+# recorded_at. The primary key has to include the partition key. Monthly
+# partitions are added by farms.timeseries.ensure_partitions(); the default
+# partition only catches rows that arrive before their month exists.
+PARTITION_SQL = [
+    "ALTER TABLE farms_sensorreading RENAME TO farms_sensorreading_flat",
+    "CREATE TABLE farms_sensorreading (LIKE farms_sensorreading_flat INCLUDING DEFAULTS INCLUDING IDENTITY) "
+    "PARTITION BY RANGE (recorded_at)",
+    "DROP TABLE farms_sensorreading_flat",
+    "ALTER TABLE farms_sensorreading ADD PRIMARY KEY (id, recorded_at)",
+    "ALTER TABLE farms_sensorreading ADD CONSTRAINT farms_sensorreading_farm_id_fk_farms_farm_id "
+    "FOREIGN KEY (farm_id) REFERENCES farms_farm (id) DEFERRABLE INITIALLY DEFERRED",
+    "CREATE INDEX reading_farm_metric_time_idx ON farms_sensorreading (farm_id, metric, recorded_at)",
+    "CREATE TABLE farms_sensorreading_default PARTITION OF farms_sensorreading DEFAULT",
+]
+
+
+def partition_readings(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for statement in PARTITION_SQL:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("farms", "0002_access_path_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SensorReading",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "metric",
+                    models.CharField(
+                        choices=[
+                            ("temperature", "Temperature"),
+                            ("rainfall", "Rainfall"),
+                            ("humidity", "Humidity"),
+                            ("soil_moisture", "Soil moisture"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("recorded_at", models.DateTimeField()),
+                ("value", models.FloatField()),
+                (
+                    "farm",
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="farms.farm",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["farm", "metric", "recorded_at"],
+                        name="reading_farm_metric_time_idx",
+                    )
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="SensorRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "metric",
+                    models.CharField(
+                        choices=[
+                            ("temperature", "Temperature"),
+                            ("rainfall", "Rainfall"),
+                            ("humidity", "Humidity"),
+                            ("soil_moisture", "Soil moisture"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                (
+                    "resolution",
+                    models.CharField(
+                        choices=[("hour", "Hour"), ("day", "Day")], max_length=10
+                    ),
+                ),
+                ("bucket", models.DateTimeField()),
+                ("count", models.PositiveIntegerField()),
+                ("total", models.FloatField()),
+                ("minimum", models.FloatField()),
+                ("maximum", models.FloatField()),
+                (
+                    "farm",
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="farms.farm",
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("farm", "metric", "resolution", "bucket"),
+                        name="rollup_bucket_uniq",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(partition_readings, migrations.RunPython.noop),
+    ]
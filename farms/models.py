@@ -1,6 +1,8 @@
 from django.db import models
 from accounts.models import CustomUser
+from .cdc import track_changes
 
+@track_changes(farm_path='id')
 class Farm(models.Model):
     owner = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
     name = models.CharField(max_length=255)
@@ -16,6 +18,12 @@ class Farm(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['owner', '-created_at', '-id'], name='farm_owner_created_idx'),
+        ]
+
+@track_changes(farm_path='farm')
 class Field(models.Model):
     farm = models.ForeignKey(Farm, on_delete=models.CASCADE)
     name = models.CharField(max_length=255)
@@ -27,6 +35,12 @@ class Field(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['farm', '-created_at', '-id'], name='field_farm_created_idx'),
+        ]
+
+@track_changes(farm_path='farm')
 class EnvironmentalData(models.Model):
     farm = models.ForeignKey(Farm, on_delete=models.CASCADE)
     date = models.DateField()
@@ -36,4 +50,142 @@ class EnvironmentalData(models.Model):
     soil_moisture = models.DecimalField(max_digits=5, decimal_places=2, blank=True, null=True)
     pest_alerts = models.TextField(blank=True)
     additional_info = models.JSONField(default=dict, blank=True)
-    created_at = models.DateTimeField(auto_now_add=True)
\ No newline at end of file
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['farm', '-date'], name='envdata_farm_date_idx'),
+            models.Index(fields=['farm', '-created_at', '-id'], name='envdata_farm_created_idx'),
+        ]
+
+class FarmScopedModel(models.Model):
+    """
+    Abstract base for deep child tables that keep a denormalized copy of the
+    farm and owner they belong to, so tenancy filters are single-column lookups
+    instead of Field -> Farm -> CustomUser joins.
+
+    Subclasses set `tenancy_path` to the lookup from the model to its Farm,
+    e.g. 'livestock_unit__field__farm'. The copies are filled in on save(),
+    by `assign_tenancy()` for bulk writes, re-pointed by farms.signals when
+    a parent moves, and repaired by the `backfill_tenancy` command.
+    """
+    farm = models.ForeignKey(Farm, on_delete=models.CASCADE, null=True, blank=True, editable=False, related_name='+')
+    owner = models.ForeignKey(CustomUser, on_delete=models.CASCADE, null=True, blank=True, editable=False, related_name='+')
+
+    tenancy_path = None
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._tenancy_parent_id = getattr(instance, cls.tenancy_parent_field().attname, None)
+        return instance
+
+    @classmethod
+    def tenancy_parent_field(cls):
+        return cls._meta.get_field(cls.tenancy_path.split('__', 1)[0])
+
+    @classmethod
+    def assign_tenancy(cls, objs):
+        """Fill farm/owner on unsaved instances with one query, e.g. before bulk_create()."""
+        parent_field = cls.tenancy_parent_field()
+        farm_lookup = cls.tenancy_path.split('__', 1)[1]
+        parent_ids = {getattr(obj, parent_field.attname) for obj in objs} - {None}
+        rows = parent_field.related_model.objects.filter(pk__in=parent_ids).values_list(
+            'pk', farm_lookup, f'{farm_lookup}__owner'
+        )
+        tenancy = {pk: (farm_id, owner_id) for pk, farm_id, owner_id in rows}
+        for obj in objs:
+            parent_id = getattr(obj, parent_field.attname)
+            obj.farm_id, obj.owner_id = tenancy.get(parent_id, (None, None))
+            obj._tenancy_parent_id = parent_id
+        return objs
+
+    def save(self, *args, **kwargs):
+        parent_id = getattr(self, self.tenancy_parent_field().attname)
+        if self.farm_id is None or parent_id != getattr(self, '_tenancy_parent_id', None):
+            type(self).assign_tenancy([self])
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | {'farm', 'owner'}
+        super().save(*args, **kwargs)
+
+class SensorReading(models.Model):
+    """
+    Sub-daily sensor sample in long format, one row per metric per timestamp.
+
+    On PostgreSQL the table is range-partitioned by month on `recorded_at`
+    (see migration 0003 and farms.timeseries.ensure_partitions); elsewhere
+    it is a plain table. Rows are written by farms.timeseries, never one by
+    one, and are not part of the farm change stream.
+    """
+    METRIC_CHOICES = [
+        ('temperature', 'Temperature'),
+        ('rainfall', 'Rainfall'),
+        ('humidity', 'Humidity'),
+        ('soil_moisture', 'Soil moisture'),
+    ]
+
+    farm = models.ForeignKey(Farm, on_delete=models.CASCADE, db_index=False)
+    metric = models.CharField(max_length=20, choices=METRIC_CHOICES)
+    recorded_at = models.DateTimeField()
+    value = models.FloatField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['farm', 'metric', 'recorded_at'], name='reading_farm_metric_time_idx'),
+        ]
+
+class SensorRollup(models.Model):
+    """Hourly or daily aggregate of SensorReading, maintained incrementally by farms.timeseries."""
+    RESOLUTION_CHOICES = [
+        ('hour', 'Hour'),
+        ('day', 'Day'),
+    ]
+
+    farm = models.ForeignKey(Farm, on_delete=models.CASCADE, db_index=False)
+    metric = models.CharField(max_length=20, choices=SensorReading.METRIC_CHOICES)
+    resolution = models.CharField(max_length=10, choices=RESOLUTION_CHOICES)
+    bucket = models.DateTimeField()
+    count = models.PositiveIntegerField()
+    total = models.FloatField()
+    minimum = models.FloatField()
+    maximum = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['farm', 'metric', 'resolution', 'bucket'], name='rollup_bucket_uniq'),
+        ]
+
+class ImportJob(models.Model):
+    """
+    Progress of one CSV import run by farms.importer, so an interrupted import
+    of the same file resumes after its last committed batch.
+    """
+    STATUS_CHOICES = [
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+
+    owner = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
+    kind = models.CharField(max_length=20)
+    file_name = models.CharField(max_length=255, blank=True)
+    file_hash = models.CharField(max_length=64)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='running')
+    # Data rows of the file already consumed by the insert pass and the parent-link pass.
+    rows_committed = models.PositiveIntegerField(default=0)
+    links_committed = models.PositiveIntegerField(default=0)
+    imported = models.PositiveIntegerField(default=0)
+    rejected = models.PositiveIntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True)
+    rows_per_second = models.FloatField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['owner', 'kind', 'file_hash'], name='importjob_owner_file_idx'),
+        ]
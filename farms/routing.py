@@ -0,0 +1,7 @@
+from django.urls import re_path
+
+from .consumers import FarmConsumer
+
+websocket_urlpatterns = [
+    re_path(r'ws/farms/(?P<farm_id>\d+)/$', FarmConsumer.as_asgi()),
+]
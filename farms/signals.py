@@ -1,32 +1,98 @@
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import post_init, post_save, post_delete
 from django.dispatch import receiver
-from asgiref.sync import async_to_sync
-from channels.layers import get_channel_layer
-from .models import Farm, Field
-from .api.serializers import FarmSerializer, FieldSerializer
+from django.apps import apps
+from django.db import transaction
+from functools import lru_cache, partial
+from .models import Farm, Field, FarmScopedModel
+from .cache import invalidate_payload
 
 @receiver(post_save, sender=Farm)
 @receiver(post_delete, sender=Farm)
-def broadcast_farm_update(sender, instance, **kwargs):
-    channel_layer = get_channel_layer()
-    if kwargs.get('created', False):
-        data = FarmSerializer(instance).data
-    else:
-        data = {'id': instance.id, 'deleted': post_delete == sender}  # Fixed
-    async_to_sync(channel_layer.group_send)(
-        f'farm_{instance.id}',
-        {'type': 'model.update', 'model': 'farm', 'data': data}
-    )
+def invalidate_farm_payload(sender, instance, **kwargs):
+    # Only once the change is visible, or a concurrent read could re-cache the old row.
+    transaction.on_commit(partial(invalidate_payload, 'farm', instance.id))
 
 @receiver(post_save, sender=Field)
 @receiver(post_delete, sender=Field)
-def broadcast_field_update(sender, instance, **kwargs):
-    channel_layer = get_channel_layer()
-    if kwargs.get('created', False):
-        data = FieldSerializer(instance).data
-    else:
-        data = {'id': instance.id, 'deleted': post_delete == sender}
-    async_to_sync(channel_layer.group_send)(
-        f'farm_{instance.farm.id}',
-        {'type': 'model.update', 'model': 'field', 'data': data}
-    )
\ No newline at end of file
+def invalidate_field_payload(sender, instance, **kwargs):
+    transaction.on_commit(partial(invalidate_payload, 'field', instance.id))
+
+@lru_cache(maxsize=None)
+def _tenancy_descendants(sender):
+    """Return (model, lookup) pairs for scoped models whose tenancy_path runs through `sender`."""
+    descendants = []
+    for model in apps.get_models():
+        if not issubclass(model, FarmScopedModel):
+            continue
+        current, lookup = model, []
+        for name in model.tenancy_path.split('__'):
+            current = current._meta.get_field(name).related_model
+            lookup.append(name)
+            if current is sender:
+                descendants.append((model, '__'.join(lookup)))
+                break
+    return tuple(descendants)
+
+
+def _tenancy_links():
+    """
+    Map every model on some scoped model's tenancy_path to its own foreign key
+    that decides which farm its descendants belong to (for Farm, the owner).
+    """
+    links = {}
+    for model in apps.get_models():
+        if not issubclass(model, FarmScopedModel):
+            continue
+        names = model.tenancy_path.split('__')
+        current = model
+        for index, name in enumerate(names):
+            current = current._meta.get_field(name).related_model
+            links[current] = current._meta.get_field(names[index + 1] if index + 1 < len(names) else 'owner')
+    return links
+
+
+_UNKNOWN = object()
+
+
+def remember_tenancy_link(sender, instance, **kwargs):
+    # Read from __dict__ so a deferred column is never loaded just to be remembered.
+    instance._tenancy_link = instance.__dict__.get(tenancy_links[sender].attname, _UNKNOWN)
+
+
+def propagate_tenancy(sender, instance, created=False, raw=False, update_fields=None, **kwargs):
+    # New parents have no children yet, and fixture loads are repaired by backfill_tenancy.
+    if created or raw:
+        return
+    link = tenancy_links[sender]
+    if update_fields is not None and link.name not in update_fields:
+        return
+    current = instance.__dict__.get(link.attname, _UNKNOWN)
+    previous = getattr(instance, '_tenancy_link', _UNKNOWN)
+    instance._tenancy_link = current
+    if current is not _UNKNOWN and current == previous:
+        return
+
+    descendants = _tenancy_descendants(sender)
+    if sender is Farm:
+        for model, lookup in descendants:
+            model.objects.filter(farm=instance).exclude(owner_id=instance.owner_id).update(
+                owner_id=instance.owner_id
+            )
+        return
+    model, lookup = descendants[0]
+    farm_lookup = model.tenancy_path[len(lookup) + 2:]
+    farm_id, owner_id = sender.objects.filter(pk=instance.pk).values_list(
+        farm_lookup, f'{farm_lookup}__owner'
+    ).get()
+    for model, lookup in descendants:
+        model.objects.filter(**{lookup: instance}).exclude(
+            farm_id=farm_id, owner_id=owner_id
+        ).update(farm_id=farm_id, owner_id=owner_id)
+
+
+# Only models that scoped rows hang off are watched, and their children are
+# re-pointed only when the column linking them to a farm (or owner) changed.
+tenancy_links = _tenancy_links()
+for parent in tenancy_links:
+    post_init.connect(remember_tenancy_link, sender=parent, dispatch_uid=f'tenancy_init_{parent._meta.label}')
+    post_save.connect(propagate_tenancy, sender=parent, dispatch_uid=f'tenancy_save_{parent._meta.label}')
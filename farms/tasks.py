@@ -0,0 +1,30 @@
+from celery import shared_task
+from django.conf import settings
+from django.db import DatabaseError
+import logging
+from .timeseries import ack_claim, drain_buffer, ensure_partitions, release_claim, upcoming_months, write_readings
+
+logger = logging.getLogger(__name__)
+
+@shared_task
+def flush_sensor_readings():
+    """Write buffered sensor readings in FARMS_TS_FLUSH_BATCH chunks until the buffer is empty."""
+    written = 0
+    while True:
+        claim, readings = drain_buffer()
+        if not readings:
+            break
+        try:
+            written += write_readings(readings)
+        except DatabaseError as e:
+            logger.error(f"Failed to write {len(readings)} sensor readings, requeueing: {e}")
+            release_claim(claim)
+            raise
+        ack_claim(claim)
+        if len(readings) < settings.FARMS_TS_FLUSH_BATCH:
+            break
+    return written
+
+@shared_task
+def ensure_sensor_partitions():
+    ensure_partitions(upcoming_months(settings.FARMS_TS_PARTITION_MONTHS_AHEAD))
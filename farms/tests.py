@@ -1,3 +1,900 @@
-from django.test import TestCase
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest import mock
+from urllib.parse import parse_qs, urlsplit
+import asyncio
+import base64
+import io
+import json
+import logging
+import os
+import statistics
+import sys
+import threading
+import time
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import DatabaseError, connection, transaction
+from django.db.models.deletion import Collector
+from django.test import override_settings, tag
+from rest_framework import mixins
+from rest_framework.exceptions import NotFound
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+import fakeredis
+
+from analytics.models import FarmFinance
+from crops.models import Crop
+from farms import broadcast
+from farms.api.views import FarmViewSet, FieldViewSet
+from farms.broadcast import _append_to_journal, changes_frames, farm_group
+from farms.cache import payload_key
+from farms.importer import Importer, file_hash, start_job
+from farms.models import EnvironmentalData, Farm, Field, ImportJob, SensorReading, SensorRollup
+from farms.routing import websocket_urlpatterns
+from farms.tasks import flush_sensor_readings
+from farms.timeseries import (
+    BUFFER_KEY, CLAIMS_KEY, DAY, HOUR, _bucket_ranges, drain_buffer, ingest, query_series, write_readings,
+)
+from livestock.models import Animal
+from utils.pagination import KeysetPagination
+from utils.request_logging import AsyncStreamHandler, JSONFormatter
+from utils.testing import (
+    QueryPlanMixin, ServiceTestCase, ServiceTransactionTestCase, make_crop, make_farm, make_field, make_unit, make_user,
+)
+
+
+class AccessPathIndexTests(QueryPlanMixin, ServiceTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = make_user('owner')
+        cls.farm = make_farm(cls.owner)
+        make_field(cls.farm)
+        EnvironmentalData.objects.bulk_create(
+            EnvironmentalData(farm=cls.farm, date=date(2026, 1, 1) + timedelta(days=day)) for day in range(30)
+        )
+
+    def test_farm_list_uses_owner_index(self):
+        self.assertUsesIndex(Farm.objects.filter(owner=self.owner).order_by('-created_at', '-id'), 'farm_owner_created_idx')
+
+    def test_field_list_uses_farm_index(self):
+        self.assertUsesIndex(Field.objects.filter(farm=self.farm).order_by('-created_at', '-id'), 'field_farm_created_idx')
+
+    def test_environmental_data_by_date_uses_farm_date_index(self):
+        self.assertUsesIndex(EnvironmentalData.objects.filter(farm=self.farm).order_by('-date'), 'envdata_farm_date_idx')
+
+
+class PayloadCacheTests(ServiceTestCase):
+    def setUp(self):
+        super().setUp()
+        self.owner = make_user('owner')
+        self.farm = make_farm(self.owner)
+        self.client.force_authenticate(self.owner)
+        self.url = f'/api/farms/{self.farm.id}/'
+
+    def test_invalidation_waits_for_commit(self):
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with transaction.atomic():
+                self.farm.name = 'Renamed'
+                self.farm.save()
+                # Not committed yet: the cached payload must survive until it is.
+                self.assertIsNotNone(cache.get(payload_key('farm', self.farm.pk)))
+        self.assertTrue(callbacks)
+        self.assertIsNone(cache.get(payload_key('farm', self.farm.pk)))
+        self.assertEqual(self.client.get(self.url).data['name'], 'Renamed')
+
+    def test_cached_retrieve_still_checks_access(self):
+        etag = self.client.get(self.url)['ETag']
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        hidden = mock.patch.object(FarmViewSet, 'get_queryset', return_value=Farm.objects.none())
+        with hidden, self.assertLogs('agricore.requests', 'WARNING'):
+            self.assertEqual(self.client.get(self.url).status_code, 404)
+            self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 404)
+        self.client.force_authenticate(None)
+        with self.assertLogs('agricore.requests', 'WARNING'):
+            self.assertEqual(self.client.get(self.url).status_code, 401)
+
+
+
+@tag('slow')
+@override_settings(CACHES={'default': {
+    'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://benchmark',
+    'OPTIONS': {'connection_class': fakeredis.FakeConnection},
+}})
+class PayloadCacheLatencyTests(ServiceTestCase):
+    """
+    A few seconds; run with `manage.py test --tag slow`.
+
+    The cache is Django's Redis backend over an in-process fake, so timings
+    include pickling but no network round trip.
+    """
+    REQUESTS = 500
+    FIELDS = 50
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = make_user('owner')
+        cls.farm = make_farm(cls.owner)
+        for i in range(cls.FIELDS):
+            make_field(cls.farm, name=f'Field {i}')
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.client.force_authenticate(self.owner)
+
+    def percentiles(self, fetch, status_code):
+        samples = []
+        for _ in range(self.REQUESTS):
+            started = time.perf_counter()
+            response = fetch()
+            samples.append(time.perf_counter() - started)
+            self.assertEqual(response.status_code, status_code)
+        cuts = statistics.quantiles(samples, n=100)
+        return cuts[49] * 1000, cuts[98] * 1000
+
+    def measure(self, viewset, url, params):
+        fetch = lambda **headers: self.client.get(url, params, **headers)
+        with mock.patch.object(viewset, 'retrieve', mixins.RetrieveModelMixin.retrieve), \
+                mock.patch.object(viewset, 'list', mixins.ListModelMixin.list):
+            uncached = self.percentiles(fetch, 200)
+        etag = fetch()['ETag']
+        cached = self.percentiles(fetch, 200)
+        not_modified = self.percentiles(lambda: fetch(HTTP_IF_NONE_MATCH=etag), 304)
+        print(f'\n{url} p50/p99 ms: uncached {uncached[0]:.2f}/{uncached[1]:.2f}, '
+              f'cached {cached[0]:.2f}/{cached[1]:.2f}, 304 {not_modified[0]:.2f}/{not_modified[1]:.2f}')
+        return uncached, cached, not_modified
+
+    def test_farm_retrieve(self):
+        uncached, cached, not_modified = self.measure(FarmViewSet, f'/api/farms/{self.farm.id}/', {})
+        self.assertLess(not_modified[0], uncached[0])
+
+    def test_field_list(self):
+        uncached, cached, not_modified = self.measure(FieldViewSet, '/api/fields/', {'page_size': self.FIELDS})
+        self.assertLess(cached[0], uncached[0])
+        self.assertLess(not_modified[0], uncached[0])
+
+
+class ChangeBroadcastTests(ServiceTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.farm = make_farm(make_user('owner'))
+
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch('farms.broadcast._send')
+        self.send = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def sent(self):
+        return [change for (batches,), _ in self.send.call_args_list for change in batches[self.farm.id]]
+
+    def test_transaction_is_coalesced_into_one_event(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            field = make_field(self.farm, name='North')
+            field.name = 'South'
+            field.save()
+            make_field(self.farm, name='East')
+        self.send.assert_called_once()
+        self.assertEqual([(change['op'], change['fields']['name']) for change in self.sent()], [('create', 'South'), ('create', 'East')])
+
+    def test_rolled_back_savepoint_is_not_broadcast(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            make_field(self.farm, name='Kept')
+            try:
+                with transaction.atomic():
+                    make_field(self.farm, name='Dropped')
+                    self.farm.name = 'Dropped'
+                    self.farm.save()
+                    raise ValueError
+            except ValueError:
+                pass
+            with transaction.atomic():
+                make_field(self.farm, name='Released')
+            make_field(self.farm, name='After')
+        names = [change['fields'].get('name') for change in self.sent()]
+        self.assertEqual(names, ['Kept', 'Released', 'After'])
+
+
+class ChangeBroadcastRollbackTests(ServiceTransactionTestCase):
+    def test_buffer_of_rolled_back_transaction_is_not_reused(self):
+        farm = make_farm(make_user('owner'))
+        with mock.patch('farms.broadcast._send') as send:
+            try:
+                with transaction.atomic():
+                    make_field(farm, name='Dropped')
+                    raise ValueError
+            except ValueError:
+                pass
+            with transaction.atomic():
+                make_field(farm, name='Kept')
+        send.assert_called_once()
+        self.assertEqual([change['fields']['name'] for change in send.call_args.args[0][farm.id]], ['Kept'])
+
+
+@tag('slow')
+class FieldBroadcastThroughputTests(ServiceTransactionTestCase):
+    """A few seconds; run with `manage.py test --tag slow`."""
+    ROWS = 2000
+
+    def setUp(self):
+        super().setUp()
+        self.farm = make_farm(make_user('owner'))
+
+    def create_fields(self, per_row):
+        started = time.perf_counter()
+        if per_row:
+            for i in range(self.ROWS):
+                make_field(self.farm, name=f'Field {i}')
+        else:
+            with transaction.atomic():
+                for i in range(self.ROWS):
+                    make_field(self.farm, name=f'Field {i}')
+        elapsed = time.perf_counter() - started
+        # Wait for sends still queued on the broadcast thread.
+        broadcast._executor.submit(lambda: None).result()
+        return self.ROWS / elapsed
+
+    async def received(self, layer):
+        count = 0
+        while True:
+            try:
+                await asyncio.wait_for(layer.receive('listener'), timeout=0.1)
+            except asyncio.TimeoutError:
+                return count
+            count += 1
+
+    def test_bulk_field_creation(self):
+        results = {}
+        in_memory = settings.CHANNEL_LAYERS
+        for label, layers, async_send, per_row in [
+            ('commit per row, no channel layer', {}, False, True),
+            ('commit per row, inline send', in_memory, False, True),
+            ('one transaction, no channel layer', {}, False, False),
+            ('one transaction, coalesced inline send', in_memory, False, False),
+            ('one transaction, coalesced off-thread send', in_memory, True, False),
+        ]:
+            with self.subTest(label), override_settings(CHANNEL_LAYERS=layers, FARMS_BROADCAST_ASYNC=async_send):
+                layer = get_channel_layer()
+                if layer is not None:
+                    async_to_sync(layer.group_add)(farm_group(self.farm.id), 'listener')
+                results[label] = self.create_fields(per_row)
+                if layer is not None:
+                    self.assertEqual(async_to_sync(self.received)(layer), self.ROWS if per_row else 1)
+                print(f'\n{label}: {results[label]:.0f} fields/s', end='')
+        print()
+        self.assertLess(results['commit per row, inline send'], results['one transaction, coalesced inline send'])
+        self.assertGreater(
+            results['one transaction, coalesced off-thread send'], results['one transaction, no channel layer'] / 2
+        )
+
+
+class ChangeStreamDeleteTests(ServiceTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = make_user('owner')
+        cls.farm = make_farm(cls.owner)
+        cls.crop = make_crop(make_field(cls.farm))
+        EnvironmentalData.objects.bulk_create(
+            EnvironmentalData(farm=cls.farm, date=date(2026, 1, 1) + timedelta(days=day)) for day in range(10)
+        )
+
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch('farms.broadcast._send')
+        self.send = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_farm_delete_is_one_farm_level_event(self):
+        self.assertTrue(Collector('default').can_fast_delete(EnvironmentalData.objects.all()))
+        with self.captureOnCommitCallbacks(execute=True):
+            Farm.objects.get(pk=self.farm.pk).delete()
+        self.send.assert_called_once_with({self.farm.id: [{'model': 'farms.farm', 'op': 'delete', 'id': self.farm.id, 'fields': {}}]})
+        self.assertFalse(EnvironmentalData.objects.exists())
+
+    def test_crop_save_reads_farm_from_its_own_column(self):
+        crop = Crop.objects.get(pk=self.crop.pk)
+        crop.name = 'Beans'
+        with self.assertNumQueries(1), self.captureOnCommitCallbacks(execute=True):
+            crop.save()
+        self.assertEqual(list(self.send.call_args.args[0]), [self.farm.id])
+
+    def test_bulk_destroy_publishes_deletes(self):
+        self.client.force_authenticate(self.owner)
+        ids = list(EnvironmentalData.objects.values_list('pk', flat=True)[:3])
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete('/api/environmental-data/bulk/', {'ids': ids}, format='json')
+        self.assertEqual(response.data['count'], 3)
+        changes = self.send.call_args.args[0][self.farm.id]
+        self.assertEqual(sorted(change['id'] for change in changes), sorted(ids))
+        self.assertEqual({change['op'] for change in changes}, {'delete'})
+
+
+class FarmConsumerTests(ServiceTransactionTestCase):
+    def setUp(self):
+        super().setUp()
+        self.owner = make_user('owner')
+        self.farm = make_farm(self.owner)
+
+    async def connect(self, query=''):
+        communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), f'/ws/farms/{self.farm.id}/{query}')
+        communicator.scope['user'] = self.owner
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator
+
+    async def publish(self, token, changes, previous):
+        await get_channel_layer().group_send(farm_group(self.farm.id), {
+            'type': 'model.update', 'token': token, 'previous': previous, 'frames': changes_frames(token, changes),
+        })
+
+    def journal(self, name):
+        """(token, changes, previous token) of a newly journaled batch."""
+        changes = [{'model': 'farms.farm', 'op': 'update', 'id': self.farm.id, 'fields': {'name': name}}]
+        previous, token = _append_to_journal(self.farm.id, changes)
+        return token, changes, previous
+
+    async def test_out_of_order_events_are_delivered_in_journal_order(self):
+        communicator = await self.connect()
+        first = self.journal('One')
+        await self.publish(*first)
+        self.assertEqual((await communicator.receive_json_from())['token'], first[0])
+
+        second, third = self.journal('Two'), self.journal('Three')
+        await self.publish(*third)
+        received = [await communicator.receive_json_from() for _ in range(2)]
+        self.assertEqual([frame['token'] for frame in received], [second[0], third[0]])
+        self.assertEqual(received[0]['changes'], second[1])
+
+        # The late event was already delivered from the journal.
+        await self.publish(*second)
+        self.assertTrue(await communicator.receive_nothing())
+        await communicator.disconnect()
+
+    async def test_consecutive_events_do_not_read_the_journal(self):
+        communicator = await self.connect()
+        batches = [self.journal(name) for name in ('One', 'Two', 'Three')]
+        self.assertEqual([previous for _, _, previous in batches[1:]], [token for token, _, _ in batches[:-1]])
+        with mock.patch('farms.consumers.read_journal') as read:
+            for batch in batches:
+                await self.publish(*batch)
+            received = [(await communicator.receive_json_from())['token'] for _ in batches]
+        self.assertEqual(received, [token for token, _, _ in batches])
+        read.assert_not_called()
+        await communicator.disconnect()
+
+    async def test_resume_replays_missed_batches(self):
+        since, _, _ = self.journal('One')
+        missed, _, _ = self.journal('Two')
+        communicator = await self.connect(f'?since={since}')
+        self.assertEqual((await communicator.receive_json_from())['token'], missed)
+        await communicator.disconnect()
+
+        communicator = await self.connect('?since=0-1')
+        self.assertEqual(await communicator.receive_json_from(), {'type': 'resync'})
+        await communicator.disconnect()
+
+
+class SensorSeriesTests(ServiceTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = make_user('owner')
+        cls.farm = make_farm(cls.owner)
+
+    def reading(self, at, value=1.0):
+        return {'farm': self.farm.id, 'metric': 'temperature', 'recorded_at': at, 'value': value}
+
+    @override_settings(FARMS_TS_MAX_POINTS=10)
+    def test_dense_raw_range_is_aggregated_not_truncated(self):
+        start = datetime(2026, 3, 1, tzinfo=dt_timezone.utc)
+        write_readings([self.reading(start + timedelta(seconds=6 * i), value=i) for i in range(50)])
+        resolution, points = query_series(self.farm.id, 'temperature', start, start + timedelta(minutes=5), 60)
+        self.assertEqual(resolution, 'raw')
+        self.assertEqual([point['count'] for point in points], [10] * 5)
+        self.assertEqual(points[-1]['max'], 49)
+
+    @override_settings(FARMS_TS_MAX_POINTS=10)
+    def test_step_that_exceeds_point_cap_is_rejected(self):
+        self.client.force_authenticate(self.owner)
+        query = {'farm': self.farm.id, 'metric': 'temperature', 'start': '2026-03-01T00:00:00Z', 'end': '2026-03-01T01:00:00Z'}
+        with self.assertLogs('agricore.requests', 'WARNING'):
+            response = self.client.get('/api/environmental-data/series/', {**query, 'step': 60})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get('/api/environmental-data/series/', query).data['step'], 360)
+
+    def test_late_reading_rebuilds_only_its_buckets(self):
+        early = datetime(2026, 1, 1, 5, tzinfo=dt_timezone.utc)
+        now = datetime(2026, 3, 1, 12, tzinfo=dt_timezone.utc)
+        touched = {(self.farm.id, 'temperature', now), (self.farm.id, 'temperature', now + timedelta(hours=1)),
+                   (self.farm.id, 'temperature', early)}
+        self.assertEqual(_bucket_ranges(touched, 3600), [[
+            (self.farm.id, 'temperature', early, early + timedelta(hours=1)),
+            (self.farm.id, 'temperature', now, now + timedelta(hours=2)),
+        ]])
+
+        write_readings([self.reading(now, 2.0), self.reading(now + timedelta(hours=1), 4.0)])
+        write_readings([self.reading(early, 3.0), self.reading(early + timedelta(minutes=5), 5.0)])
+        day = SensorRollup.objects.get(resolution='day', bucket=datetime(2026, 1, 1, tzinfo=dt_timezone.utc))
+        self.assertEqual((day.count, day.total), (2, 8.0))
+        self.assertEqual(SensorRollup.objects.get(resolution='day', bucket=datetime(2026, 3, 1, tzinfo=dt_timezone.utc)).count, 2)
+
+
+class SensorBufferTests(ServiceTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.farm = make_farm(make_user('owner'))
+
+    def setUp(self):
+        super().setUp()
+        at = datetime(2026, 3, 1, tzinfo=dt_timezone.utc)
+        ingest([{'farm': self.farm.id, 'metric': 'rainfall', 'recorded_at': at + timedelta(minutes=i), 'value': i} for i in range(3)])
+
+    def test_unacked_claim_is_handed_out_again(self):
+        claim, readings = drain_buffer()
+        self.assertEqual(len(readings), 3)
+        self.assertEqual(drain_buffer()[1], [])
+        with override_settings(FARMS_TS_CLAIM_TIMEOUT=0), self.assertLogs('farms.timeseries', 'WARNING'):
+            _, again = drain_buffer()
+        self.assertEqual(again, readings)
+        self.assertFalse(self.redis.exists(claim))
+
+    def test_failed_flush_keeps_readings(self):
+        with mock.patch('farms.tasks.write_readings', side_effect=DatabaseError('down')), self.assertLogs('farms.tasks'):
+            with self.assertRaises(DatabaseError):
+                flush_sensor_readings()
+        with self.assertLogs('farms.timeseries', 'WARNING'):
+            self.assertEqual(flush_sensor_readings(), 3)
+        self.assertEqual(SensorReading.objects.count(), 3)
+        self.assertEqual(self.redis.zcard(CLAIMS_KEY), 0)
+        self.assertEqual(flush_sensor_readings(), 0)
+
+
+@tag('slow')
+class SensorIngestBenchmarkTests(ServiceTestCase):
+    """About half a minute; run with `manage.py test --tag slow`."""
+    FARMS = 10
+    METRICS = ('temperature', 'soil_moisture')
+    DAYS = 30
+    INTERVAL = timedelta(minutes=5)
+    POST_SIZE = 20
+
+    @classmethod
+    def setUpTestData(cls):
+        owner = make_user('owner')
+        cls.farms = [make_farm(owner) for _ in range(cls.FARMS)]
+        cls.start = datetime(2026, 3, 1, tzinfo=dt_timezone.utc)
+
+    def posts(self, start, days):
+        """One POST's worth of readings at a time, each covering every farm's sensors at one instant."""
+        for step in range(int(timedelta(days=days) / self.INTERVAL)):
+            at = start + step * self.INTERVAL
+            yield [
+                {'farm': farm.id, 'metric': metric, 'recorded_at': at, 'value': float(step % 288)}
+                for farm in self.farms for metric in self.METRICS
+            ]
+
+    def test_buffered_ingest_and_rollup_reads(self):
+        # Unbuffered: every POST writes its readings and refreshes its rollup buckets itself.
+        with override_settings(FARMS_TS_BUFFERED=False):
+            started = time.perf_counter()
+            direct = sum(ingest(batch) or len(batch) for batch in self.posts(self.start - timedelta(days=1), 1))
+            direct_rate = direct / (time.perf_counter() - started)
+
+        started = time.perf_counter()
+        buffered = sum(ingest(batch) or len(batch) for batch in self.posts(self.start, self.DAYS))
+        written = 0
+        while self.redis.llen(BUFFER_KEY):
+            written += flush_sensor_readings()
+        buffered_rate = buffered / (time.perf_counter() - started)
+        self.assertEqual(written, buffered)
+
+        farm, end = self.farms[0].id, self.start + timedelta(days=self.DAYS)
+        timings = {}
+        for step in (60, HOUR, DAY):
+            started = time.perf_counter()
+            for _ in range(5):
+                resolution, points = query_series(farm, 'temperature', self.start, end, step)
+            timings[resolution] = (time.perf_counter() - started) / 5 * 1000
+            self.assertEqual(sum(point['count'] for point in points), self.DAYS * 288)
+
+        print(f'\n{buffered} readings: {direct_rate:.0f} readings/s written per POST, '
+              f'{buffered_rate:.0f} readings/s buffered and flushed')
+        print('30-day series: ' + ', '.join(f'{resolution} {ms:.1f} ms' for resolution, ms in timings.items()))
+        self.assertGreater(buffered_rate, direct_rate)
+        self.assertLess(timings['day'], timings['raw'])
+        self.assertLess(timings['hour'], timings['raw'])
+
+
+class CSVImportTests(ServiceTestCase):
+    def setUp(self):
+        super().setUp()
+        self.owner = make_user('owner')
+        self.farm = make_farm(self.owner)
+        self.foreign_farm = make_farm(make_user('neighbour'))
+        self.client.force_authenticate(self.owner)
+
+    def finance_csv(self, rows):
+        lines = ['farm,type,category,amount,currency,description,date']
+        lines += [f'{farm},{type_},feed,{amount},KES,,2026-03-02' for farm, type_, amount in rows]
+        return '\n'.join(lines) + '\n'
+
+    def upload(self, url, text, **params):
+        query = '&'.join(f'{key}={value}' for key, value in params.items())
+        return self.client.post(
+            f'{url}?{query}', {'file': SimpleUploadedFile('rows.csv', text.encode(), content_type='text/csv')},
+            format='multipart',
+        )
+
+    def test_bad_rows_are_reported_by_line(self):
+        text = self.finance_csv([
+            (self.farm.id, 'expense', '10.00'),
+            (self.farm.id, 'gift', '10.00'),
+            (self.foreign_farm.id, 'expense', '10.00'),
+            (self.farm.id, 'income', 'ten'),
+            (self.farm.id, 'income', '25.50'),
+        ])
+        response = self.upload('/api/farm-finances/import/', text, batch_size=2)
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual((response.data['imported'], response.data['rejected']), (2, 3))
+        self.assertEqual([error['line'] for error in response.data['errors']], [3, 4, 5])
+        self.assertEqual(set(response.data['errors'][0]['errors']), {'type'})
+        self.assertEqual(FarmFinance.objects.filter(farm=self.foreign_farm).count(), 0)
+
+        # The same file again returns the finished job rather than importing twice.
+        self.assertEqual(self.upload('/api/farm-finances/import/', text).data['id'], response.data['id'])
+        self.assertEqual(FarmFinance.objects.count(), 2)
+
+    def test_interrupted_import_resumes_after_last_batch(self):
+        text = self.finance_csv([(self.farm.id, 'expense', f'{n}.00') for n in range(1, 8)])
+        job = start_job(self.owner, 'finance', file_hash([text.encode()]))
+        bulk_create = FarmFinance.objects.bulk_create
+        calls = []
+
+        def fail_third_batch(objs, *args, **kwargs):
+            calls.append(len(objs))
+            if len(calls) == 3:
+                raise ConnectionError('worker lost')
+            return bulk_create(objs, *args, **kwargs)
+
+        with mock.patch.object(FarmFinance.objects, 'bulk_create', fail_third_batch), self.assertRaises(ConnectionError):
+            Importer(job, batch_size=3).run(lambda: io.StringIO(text))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.rows_committed, job.imported), ('failed', 6, 6))
+
+        Importer(start_job(self.owner, 'finance', file_hash([text.encode()])), batch_size=3).run(lambda: io.StringIO(text))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.rows_committed, job.imported), ('completed', 7, 7))
+        self.assertEqual(
+            sorted(FarmFinance.objects.values_list('amount', flat=True)), [Decimal(n) for n in range(1, 8)],
+        )
+
+    def test_animals_link_to_parents_later_in_the_file(self):
+        unit = make_unit(make_field(self.farm))
+        text = (
+            'livestock_unit,tag_id,sex,age_group,breed,status,father_tag,mother_tag\n'
+            f'{unit.id},C1,female,calf,Boran,active,B1,MISSING\n'
+            f'{unit.id},B1,male,adult,Boran,active,,\n'
+        )
+        response = self.upload('/api/animals/import/', text, batch_size=1)
+        self.assertEqual(response.status_code, 201, response.data)
+        calf = Animal.objects.get(tag_id='C1')
+        self.assertEqual((calf.father.tag_id, calf.mother), ('B1', None))
+        self.assertEqual(calf.farm_id, self.farm.id)
+        self.assertEqual(response.data['errors'], [{'line': 2, 'errors': {'mother_tag': ["No animal tagged 'MISSING' on this farm."]}}])
+        self.assertEqual(ImportJob.objects.get().links_committed, 2)
+
+    def test_missing_required_column_is_rejected(self):
+        with self.assertLogs('agricore.requests', 'WARNING'):
+            response = self.upload('/api/farm-finances/import/', 'farm,type\n1,expense\n')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Missing required columns', response.data['file'][0])
+
+
+@tag('slow')
+class CSVImportThroughputTests(ServiceTestCase):
+    """About ten seconds; run with `manage.py test --tag slow`."""
+    ROWS = 20_000
+    POSTS = 200
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = make_user('owner')
+        cls.farm = make_farm(cls.owner)
+        cls.unit = make_unit(make_field(cls.farm))
+
+    def run_import(self, kind, text):
+        job = start_job(self.owner, kind, file_hash([text.encode()]))
+        Importer(job).run(lambda: io.StringIO(text))
+        self.assertEqual((job.imported, job.rejected), (self.ROWS, 0), job.errors[:3])
+        return job.rows_per_second
+
+    def test_import_rows_per_second(self):
+        self.client.force_authenticate(self.owner)
+        started = time.perf_counter()
+        for n in range(self.POSTS):
+            response = self.client.post('/api/farm-finances/', {
+                'farm': self.farm.id, 'type': 'expense', 'category': 'feed', 'amount': '10.00', 'currency': 'KES',
+                'date': '2026-03-02T00:00:00Z',
+            }, format='json')
+            self.assertEqual(response.status_code, 201, response.data)
+        posts = self.POSTS / (time.perf_counter() - started)
+
+        finance = self.run_import('finance', 'farm,type,category,amount,currency,description,date\n' + ''.join(
+            f'{self.farm.id},expense,feed,{n % 500}.00,KES,Row {n},2026-03-02\n' for n in range(self.ROWS)
+        ))
+        # Every animal names parents that only appear further down the file.
+        animals = self.run_import('animals', 'livestock_unit,tag_id,sex,age_group,breed,status,father_tag,mother_tag\n' + ''.join(
+            f'{self.unit.id},A{n},{"male" if n % 2 else "female"},adult,Boran,active,'
+            f'{f"A{n + 1}" if n + 2 < self.ROWS else ""},{f"A{n + 2}" if n + 2 < self.ROWS else ""}\n'
+            for n in range(self.ROWS)
+        ))
+        print(f'\nPOST per row: {posts:.0f} rows/s, finance import: {finance:.0f} rows/s, '
+              f'animal import (two passes): {animals:.0f} rows/s')
+        self.assertGreater(finance, 5 * posts)
+        self.assertGreater(animals, posts)
+        self.assertEqual(Animal.objects.filter(father__isnull=False, mother__isnull=False).count(), self.ROWS - 2)
+
+
+class KeysetPaginationTests(ServiceTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        owner = make_user('owner')
+        visited = datetime(2026, 3, 1, tzinfo=dt_timezone.utc)
+        cls.farms = [
+            make_farm(owner, name=f'Farm {i}', last_visited=None if i % 3 == 0 else visited + timedelta(days=i % 4))
+            for i in range(10)
+        ]
+
+    def page(self, ordering=('-created_at', '-id'), max_page_size=1000, **params):
+        paginator = KeysetPagination()
+        request = Request(APIRequestFactory().get('/api/farms/', params))
+        view = SimpleNamespace(keyset_ordering=ordering, max_page_size=max_page_size)
+        ids = [farm.id for farm in paginator.paginate_queryset(Farm.objects.all(), request, view)]
+        return paginator, ids, paginator.get_next_link(), paginator.get_previous_link()
+
+    def cursor(self, link):
+        return parse_qs(urlsplit(link).query)['cursor'][0]
+
+    def walk(self, ordering):
+        """Follow `next` to the end and `previous` back to the start, three rows a page."""
+        forward, pages = [], []
+        _, ids, next_link, previous_link = self.page(ordering, page_size=3)
+        self.assertIsNone(previous_link)
+        while True:
+            forward += ids
+            pages.append(ids)
+            if next_link is None:
+                break
+            _, ids, next_link, previous_link = self.page(ordering, page_size=3, cursor=self.cursor(next_link))
+        backward = [pages[-1]]
+        while previous_link is not None:
+            params = {'page_size': 3}
+            if 'cursor' in previous_link:
+                params['cursor'] = self.cursor(previous_link)
+            _, ids, _, previous_link = self.page(ordering, **params)
+            backward.insert(0, ids)
+        self.assertEqual(backward, pages)
+        return forward
+
+    def test_cursor_round_trip(self):
+        expected = [farm.id for farm in sorted(self.farms, key=lambda farm: (farm.created_at, farm.id), reverse=True)]
+        self.assertEqual(self.walk(('-created_at', '-id')), expected)
+
+    def test_mixed_direction_nullable_ordering(self):
+        # NULL sorts above every date: last going up, first going down.
+        expected = [farm.id for farm in sorted(
+            self.farms, key=lambda farm: (farm.last_visited is None, farm.last_visited or 0, -farm.id),
+        )]
+        self.assertEqual(self.walk(('last_visited', '-id')), expected)
+        self.assertEqual(self.walk(('-last_visited', 'id')), expected[::-1])
+
+    def test_page_size_is_clamped(self):
+        self.assertEqual(self.page(max_page_size=4, page_size=5000)[0].page_size, 4)
+        self.assertEqual(self.page(page_size=2)[0].page_size, 2)
+        for garbage in ('0', '-3', 'ten'):
+            self.assertEqual(self.page(page_size=garbage)[0].page_size, KeysetPagination.page_size)
+
+    def test_tampered_cursors_are_not_found(self):
+        def encode(payload):
+            return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+        for cursor in (
+            'not a cursor', '\u00e9', base64.urlsafe_b64encode(b'\xff\xfe').decode(), encode([1, 2]),
+            encode({'x': 1}), encode({'p': 'abc'}), encode({'p': [1]}), encode({'p': ['yesterday', 1]}),
+            encode({'p': ['2026-03-01T00:00:00+00:00', None]}), encode({'p': [{'a': 1}, 1]}),
+        ):
+            with self.subTest(cursor=cursor), self.assertRaises(NotFound):
+                self.page(cursor=cursor)
+
+    def test_tampered_cursor_is_a_404(self):
+        self.client.force_authenticate(self.farms[0].owner)
+        with self.assertLogs('agricore.requests', 'WARNING'):
+            response = self.client.get('/api/farm-finances/', {'cursor': 'garbage'})
+        self.assertEqual(response.status_code, 404)
+
+
+@tag('slow')
+class KeysetPaginationDepthTests(ServiceTestCase):
+    """About half a minute; run with `manage.py test --tag slow`."""
+    ROWS = 200_000
+    PAGE = 50
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = make_user('owner')
+        farm = make_farm(cls.owner)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {FarmFinance._meta.db_table}
+                    (farm_id, type, category, related_id, amount, currency, description, date, created_at)
+                WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < %s)
+                SELECT %s, 'expense', 'feed', NULL, 12.50, 'KES', 'Dairy meal', '2026-03-02 12:00:00',
+                    datetime('2026-03-02 12:00:00', '+' || (i / 7) || ' seconds') FROM n
+                """,
+                [cls.ROWS, farm.id],
+            )
+
+    def timed(self, fetch, repeat=10):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            fetch()
+        return (time.perf_counter() - started) / repeat
+
+    def test_deep_page_costs_the_same_as_the_first(self):
+        self.client.force_authenticate(self.owner)
+        url = '/api/farm-finances/'
+        deep = self.ROWS - 2 * self.PAGE
+        rows = FarmFinance.objects.filter(farm__owner=self.owner).order_by('-created_at', '-id')
+        created_at, pk = rows.values_list('created_at', 'id')[deep - 1]
+        paginator = KeysetPagination()
+        paginator.base_url = url
+        cursor = parse_qs(urlsplit(paginator.encode_cursor([created_at.isoformat(), pk])).query)['cursor'][0]
+
+        first = self.timed(lambda: self.client.get(url, {'page_size': self.PAGE}))
+        keyset = self.timed(lambda: self.client.get(url, {'page_size': self.PAGE, 'cursor': cursor}))
+        offset = self.timed(lambda: list(rows[deep:deep + self.PAGE]))
+        self.assertEqual(
+            [row['id'] for row in self.client.get(url, {'page_size': self.PAGE, 'cursor': cursor}).data['results']],
+            list(rows.values_list('id', flat=True)[deep:deep + self.PAGE]),
+        )
+        print(f'\npage 1: {first * 1000:.1f} ms, keyset page {deep // self.PAGE}: {keyset * 1000:.1f} ms, '
+              f'OFFSET {deep}: {offset * 1000:.1f} ms')
+        self.assertLess(keyset, 3 * first)
+        self.assertLess(keyset, offset)
+
+
+def request_record(message='GET /api/farms/ 400', **info):
+    return logging.makeLogRecord({
+        'name': 'agricore.requests', 'levelno': logging.WARNING, 'levelname': 'WARNING', 'msg': message,
+        'request_info': info,
+    })
+
+
+class RequestLoggingTests(ServiceTestCase):
+    def setUp(self):
+        super().setUp()
+        self.owner = make_user('owner')
+        self.client.force_authenticate(self.owner)
+
+    @override_settings(REQUEST_LOG_SAMPLE_RATE=1)
+    def test_sampled_success_is_logged_at_info(self):
+        with self.assertLogs('agricore.requests', 'INFO') as logs:
+            self.client.get('/api/farms/')
+        info = logs.records[0].request_info
+        self.assertEqual(logs.records[0].levelname, 'INFO')
+        self.assertEqual(
+            {key: info[key] for key in ('method', 'path', 'status', 'user', 'view')},
+            {'method': 'GET', 'path': '/api/farms/', 'status': 200, 'user': self.owner.pk, 'view': 'FarmViewSet'},
+        )
+        self.assertNotIn('request_data', info)
+
+    def test_unsampled_success_is_not_logged(self):
+        with self.assertNoLogs('agricore.requests'):
+            self.client.get('/api/farms/')
+
+    @override_settings(REQUEST_LOG_PAYLOADS=True)
+    def test_errors_are_always_logged_with_payloads(self):
+        with self.assertLogs('agricore.requests', 'WARNING') as logs:
+            self.client.post('/api/farms/', {'name': 'North'}, format='json')
+        info = logs.records[0].request_info
+        self.assertEqual((logs.records[0].levelname, info['status']), ('WARNING', 400))
+        self.assertEqual(info['request_data'], {'name': 'North'})
+        self.assertIn('owner', info['response_data'])
+
+        self.client.raise_request_exception = False
+        with mock.patch.object(FarmViewSet, 'list', side_effect=RuntimeError('boom')), \
+                self.assertLogs('django.request', 'ERROR'), self.assertLogs('agricore.requests', 'ERROR') as logs:
+            self.client.get('/api/farms/')
+        self.assertEqual(logs.records[0].request_info['status'], 500)
+
+    @override_settings(REQUEST_LOG_MAX_PAYLOAD=40)
+    def test_formatter_summarizes_and_truncates_payloads(self):
+        try:
+            raise ValueError('bad row')
+        except ValueError:
+            record = request_record(status=400, request_data=list(range(1000)), response_data={'farm': ['Required.']})
+            record.exc_info = sys.exc_info()
+        entry = json.loads(JSONFormatter().format(record))
+        self.assertEqual((entry['message'], entry['status']), ('GET /api/farms/ 400', 400))
+        self.assertTrue(entry['request_data'].startswith('{"items": 1000, "head": [0, 1, 2]}'))
+        self.assertEqual(entry['response_data'], '{"farm": ["Required."]}')
+        self.assertIn('ValueError: bad row', entry['exc_info'])
+        long = json.loads(JSONFormatter().format(request_record(request_data='x' * 100)))['request_data']
+        self.assertEqual(long, '"' + 'x' * 39 + '...(62 more)')
+
+    def test_handler_writes_on_its_own_thread(self):
+        stream = io.StringIO()
+        handler = AsyncStreamHandler(queue_size=10, stream=stream)
+        handler.setFormatter(JSONFormatter())
+        self.assertIsNone(handler.listener)
+        handler.handle(request_record(status=400))
+        handler.stop()
+        self.assertEqual(json.loads(stream.getvalue())['status'], 400)
+        handler.handle(request_record())
+        self.assertEqual(handler.dropped, 1)
+
+    def test_full_queue_drops_instead_of_blocking(self):
+        handler = AsyncStreamHandler(queue_size=2, stream=io.StringIO())
+        release = threading.Event()
+        handler.target.emit = lambda record: release.wait()
+        started = time.perf_counter()
+        for _ in range(10):
+            handler.handle(request_record())
+        self.assertLess(time.perf_counter() - started, 1)
+        self.assertGreaterEqual(handler.dropped, 7)
+        release.set()
+        handler.stop()
+
+    def test_forked_child_starts_its_own_listener(self):
+        read_end, write_end = os.pipe()
+        stream = os.fdopen(write_end, 'w')
+        handler = AsyncStreamHandler(stream=stream)
+        handler.setFormatter(JSONFormatter())
+        handler.handle(request_record('parent'))
+        pid = os.fork()
+        if pid == 0:
+            try:
+                handler.handle(request_record('child'))
+                handler.stop()
+                stream.flush()
+            finally:
+                os._exit(0)
+        os.waitpid(pid, 0)
+        handler.stop()
+        stream.close()
+        with os.fdopen(read_end) as lines:
+            self.assertEqual(sorted(json.loads(line)['message'] for line in lines), ['child', 'parent'])
+
+
+@tag('slow')
+class RequestLoggingBenchmarkTests(ServiceTestCase):
+    """A few seconds; run with `manage.py test --tag slow`."""
+    RECORDS = 20_000
+
+    def per_record(self, handler):
+        record = request_record(status=400, request_data=[{'farm': 1, 'value': '12.50'}] * 50)
+        handler.setFormatter(JSONFormatter())
+        started = time.perf_counter()
+        for _ in range(self.RECORDS):
+            handler.handle(record)
+        elapsed = time.perf_counter() - started
+        handler.close()
+        return elapsed / self.RECORDS
+
+    def test_request_thread_cost_per_record(self):
+        with open(os.devnull, 'w') as devnull:
+            inline = self.per_record(logging.StreamHandler(devnull))
+            queued = self.per_record(AsyncStreamHandler(queue_size=self.RECORDS, stream=devnull))
+        print(f'\nrequest log record on the caller: {inline * 1e6:.1f} us formatted inline, '
+              f'{queued * 1e6:.1f} us queued')
+        self.assertLess(queued, inline / 2)
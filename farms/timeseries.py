@@ -0,0 +1,315 @@
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+from django.db.models import Count, Max, Min, Q, Sum
+from django.db.models.functions import TruncDay, TruncHour, TruncMinute, TruncSecond
+from django.utils.dateparse import parse_datetime
+from functools import reduce
+from operator import or_
+import json
+import logging
+import redis
+import time
+import uuid
+from .models import Farm, SensorReading, SensorRollup
+
+logger = logging.getLogger(__name__)
+
+BUFFER_KEY = 'farms:ts:buffer'
+# Claimed batches, scored by when they were claimed.
+CLAIMS_KEY = 'farms:ts:claims'
+# Bucket ranges per rollup query; keeps the OR of ranges a reasonable size.
+RANGES_PER_QUERY = 100
+HOUR = 3600
+DAY = 86400
+
+_buffer = None
+_partitions = set()
+
+
+def get_buffer():
+    """Redis connection holding readings accepted by the API but not yet written."""
+    global _buffer
+    if _buffer is None:
+        _buffer = redis.Redis.from_url(settings.REDIS_URL, decode_responses=True)
+    return _buffer
+
+
+def ingest(readings):
+    """
+    Accept readings given as {'farm': id, 'metric', 'recorded_at', 'value'}.
+
+    With FARMS_TS_BUFFERED the readings are appended to a Redis list and the
+    flush_sensor_readings task writes them in large batches. Otherwise they
+    are written straight away.
+    """
+    if not readings:
+        return
+    if not settings.FARMS_TS_BUFFERED:
+        write_readings(readings)
+        return
+    get_buffer().rpush(BUFFER_KEY, *(json.dumps(reading, default=str) for reading in readings))
+
+
+def drain_buffer(limit=None):
+    """
+    Claim up to `limit` buffered readings; returns (claim, readings).
+
+    Claimed readings move to a list of their own and stay there until
+    ack_claim() once they are written, so a flush that dies midway loses
+    nothing. A claim released with release_claim(), or older than
+    FARMS_TS_CLAIM_TIMEOUT, is handed out again before new readings are.
+    A flush that dies after writing but before acking therefore writes its
+    batch twice.
+    """
+    limit = limit or settings.FARMS_TS_FLUSH_BATCH
+    buffer = get_buffer()
+    claim = f'farms:ts:claim:{uuid.uuid4().hex}'
+    items = _reclaim(buffer, claim)
+    if not items:
+        available = min(limit, buffer.llen(BUFFER_KEY))
+        if not available:
+            return claim, []
+        pipe = buffer.pipeline(transaction=True)
+        for _ in range(available):
+            pipe.lmove(BUFFER_KEY, claim, 'LEFT', 'RIGHT')
+        pipe.zadd(CLAIMS_KEY, {claim: time.time()})
+        items = [item for item in pipe.execute()[:-1] if item is not None]
+    readings = []
+    for item in items:
+        reading = json.loads(item)
+        reading['recorded_at'] = parse_datetime(reading['recorded_at'])
+        readings.append(reading)
+    return claim, readings
+
+
+def _reclaim(buffer, claim):
+    expired = buffer.zrangebyscore(CLAIMS_KEY, '-inf', time.time() - settings.FARMS_TS_CLAIM_TIMEOUT, start=0, num=1)
+    for stale in expired:
+        # RENAME is atomic, so only one flush can take over a stale claim.
+        pipe = buffer.pipeline(transaction=True)
+        pipe.rename(stale, claim)
+        pipe.zrem(CLAIMS_KEY, stale)
+        pipe.zadd(CLAIMS_KEY, {claim: time.time()})
+        try:
+            pipe.execute()
+        except redis.ResponseError:
+            # Acked, or taken over by another flush, since we looked.
+            return []
+        logger.warning(f"Reclaimed sensor readings from {stale}")
+        return buffer.lrange(claim, 0, -1)
+    return []
+
+
+def ack_claim(claim):
+    """Drop a claimed batch once its readings are written."""
+    pipe = get_buffer().pipeline(transaction=True)
+    pipe.delete(claim)
+    pipe.zrem(CLAIMS_KEY, claim)
+    pipe.execute()
+
+
+def release_claim(claim):
+    """Give a claimed batch back to be retried by the next drain."""
+    get_buffer().zadd(CLAIMS_KEY, {claim: 0})
+
+
+def write_readings(readings):
+    """
+    Insert readings with one bulk_create and refresh the rollup buckets they touch.
+
+    The farms involved are locked first, so concurrent writers recompute a
+    shared bucket one after the other and the later one sees the other's rows.
+    """
+    objs = [
+        SensorReading(
+            farm_id=reading['farm'],
+            metric=reading['metric'],
+            recorded_at=reading['recorded_at'],
+            value=reading['value'],
+        )
+        for reading in readings
+    ]
+    ensure_partitions({_month_start(obj.recorded_at) for obj in objs})
+    touched = {(obj.farm_id, obj.metric, _truncate(obj.recorded_at, HOUR)) for obj in objs}
+    with transaction.atomic():
+        farm_ids = sorted({obj.farm_id for obj in objs})
+        list(Farm.objects.select_for_update(no_key=True).filter(pk__in=farm_ids).order_by('pk').values_list('pk'))
+        SensorReading.objects.bulk_create(objs, batch_size=1000)
+        refresh_rollups(touched)
+    return len(objs)
+
+
+def refresh_rollups(touched):
+    """
+    Recompute the hourly rollups for `touched` (farm_id, metric, hour) keys
+    and the daily rollups containing them.
+
+    Only buckets that received new readings are read and rewritten, as runs
+    of adjacent buckets per farm and metric. Each bucket is rebuilt from its
+    source rows, so late or replayed data stays correct.
+    """
+    if not touched:
+        return
+    for ranges in _bucket_ranges(touched, HOUR):
+        hourly = (
+            SensorReading.objects
+            .filter(reduce(or_, (
+                Q(farm_id=farm_id, metric=metric, recorded_at__gte=start, recorded_at__lt=end)
+                for farm_id, metric, start, end in ranges
+            )))
+            .annotate(bucket=TruncHour('recorded_at'))
+            .values('farm_id', 'metric', 'bucket')
+            .annotate(count=Count('id'), total=Sum('value'), minimum=Min('value'), maximum=Max('value'))
+        )
+        _upsert('hour', hourly)
+
+    days = {(farm_id, metric, _truncate(hour, DAY)) for farm_id, metric, hour in touched}
+    for ranges in _bucket_ranges(days, DAY):
+        daily = (
+            SensorRollup.objects
+            .filter(reduce(or_, (
+                Q(farm_id=farm_id, metric=metric, resolution='hour', bucket__gte=start, bucket__lt=end)
+                for farm_id, metric, start, end in ranges
+            )))
+            .annotate(day=TruncDay('bucket'))
+            .values('farm_id', 'metric', 'day')
+            .annotate(day_count=Sum('count'), day_total=Sum('total'), day_min=Min('minimum'), day_max=Max('maximum'))
+        )
+        _upsert('day', (
+            {'farm_id': row['farm_id'], 'metric': row['metric'], 'bucket': row['day'], 'count': row['day_count'],
+             'total': row['day_total'], 'minimum': row['day_min'], 'maximum': row['day_max']}
+            for row in daily
+        ))
+
+
+def _bucket_ranges(keys, width):
+    """
+    Turn (farm_id, metric, bucket) keys into (farm_id, metric, start, end)
+    ranges covering runs of adjacent buckets, in chunks of RANGES_PER_QUERY.
+    """
+    buckets = defaultdict(set)
+    for farm_id, metric, bucket in keys:
+        buckets[(farm_id, metric)].add(bucket)
+    step = timedelta(seconds=width)
+    ranges = []
+    for (farm_id, metric), starts in buckets.items():
+        starts = sorted(starts)
+        run_start = previous = starts[0]
+        for bucket in starts[1:]:
+            if bucket - previous > step:
+                ranges.append((farm_id, metric, run_start, previous + step))
+                run_start = bucket
+            previous = bucket
+        ranges.append((farm_id, metric, run_start, previous + step))
+    return [ranges[i:i + RANGES_PER_QUERY] for i in range(0, len(ranges), RANGES_PER_QUERY)]
+
+
+def _upsert(resolution, rows):
+    objs = [SensorRollup(resolution=resolution, **row) for row in rows]
+    SensorRollup.objects.bulk_create(
+        objs,
+        batch_size=1000,
+        update_conflicts=True,
+        unique_fields=['farm', 'metric', 'resolution', 'bucket'],
+        update_fields=['count', 'total', 'minimum', 'maximum'],
+    )
+
+
+def ensure_partitions(months):
+    """Create the monthly SensorReading partitions covering `months` on PostgreSQL; a no-op elsewhere."""
+    if connection.vendor != 'postgresql':
+        return
+    missing = sorted(set(months) - _partitions)
+    if not missing:
+        return
+    with connection.cursor() as cursor:
+        for month in missing:
+            following = _month_start(month + timedelta(days=32))
+            try:
+                cursor.execute(
+                    f"CREATE TABLE IF NOT EXISTS farms_sensorreading_p{month:%Y%m} "
+                    f"PARTITION OF farms_sensorreading "
+                    f"FOR VALUES FROM ('{month.isoformat()}') TO ('{following.isoformat()}')"
+                )
+            except DatabaseError as e:
+                # Usually rows for this month already sit in the default partition.
+                logger.error(f"Failed to create sensor partition for {month:%Y-%m}: {e}")
+                continue
+            _partitions.add(month)
+
+
+def upcoming_months(count):
+    month = _month_start(datetime.now(dt_timezone.utc))
+    months = []
+    for _ in range(count + 1):
+        months.append(month)
+        month = _month_start(month + timedelta(days=32))
+    return months
+
+
+def query_series(farm_id, metric, start, end, step):
+    """
+    Return (resolution, points) for one metric between `start` and `end`.
+
+    `step` is the requested spacing in seconds. The coarsest source that is
+    no coarser than `step` is read: daily rollups, then hourly rollups, then
+    raw readings, which are first aggregated in SQL to whole minutes (or
+    seconds, when `step` is not a whole number of minutes). Points are
+    regrouped into epoch-aligned `step` buckets when `step` is coarser than
+    the source. Each point is {'time', 'count', 'avg', 'min', 'max'}.
+    """
+    if step >= DAY:
+        resolution = 'day'
+    elif step >= HOUR:
+        resolution = 'hour'
+    else:
+        resolution = 'raw'
+
+    if resolution == 'raw':
+        grain = TruncMinute if step % 60 == 0 else TruncSecond
+        buckets = (
+            SensorReading.objects
+            .filter(farm_id=farm_id, metric=metric, recorded_at__gte=start, recorded_at__lt=end)
+            .annotate(grain=grain('recorded_at', tzinfo=dt_timezone.utc))
+            .values('grain')
+            .annotate(count=Count('id'), total=Sum('value'), minimum=Min('value'), maximum=Max('value'))
+            .order_by('grain')
+            .values_list('grain', 'count', 'total', 'minimum', 'maximum')
+            .iterator()
+        )
+    else:
+        buckets = (
+            SensorRollup.objects
+            .filter(farm_id=farm_id, metric=metric, resolution=resolution,
+                    bucket__gte=_truncate(start, DAY if resolution == 'day' else HOUR), bucket__lt=end)
+            .order_by('bucket')
+            .values_list('bucket', 'count', 'total', 'minimum', 'maximum')
+            .iterator()
+        )
+
+    points = {}
+    for time, count, total, minimum, maximum in buckets:
+        key = _truncate(time, step) if step > 1 else time
+        point = points.get(key)
+        if point is None:
+            points[key] = [count, total, minimum, maximum]
+        else:
+            point[0] += count
+            point[1] += total
+            point[2] = min(point[2], minimum)
+            point[3] = max(point[3], maximum)
+    return resolution, [
+        {'time': time, 'count': count, 'avg': total / count, 'min': minimum, 'max': maximum}
+        for time, (count, total, minimum, maximum) in points.items()
+    ]
+
+
+def _truncate(value, seconds):
+    epoch = int(value.timestamp())
+    return datetime.fromtimestamp(epoch - epoch % seconds, tz=dt_timezone.utc)
+
+
+def _month_start(value):
+    return value.astimezone(dt_timezone.utc).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from inventory.models import Inventory, ProductionRecord
+from utils.bulk import BulkListSerializer
 
 class InventorySerializer(serializers.ModelSerializer):
     class Meta:
@@ -9,4 +10,5 @@ class InventorySerializer(serializers.ModelSerializer):
 class ProductionRecordSerializer(serializers.ModelSerializer):
     class Meta:
         model = ProductionRecord
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+        list_serializer_class = BulkListSerializer
\ No newline at end of file
@@ -2,19 +2,24 @@ from rest_framework import viewsets
 from rest_framework.permissions import IsAuthenticated
 from inventory.models import Inventory, ProductionRecord
 from .serializers import InventorySerializer, ProductionRecordSerializer
+from farms.importer import CSVImportMixin
+from utils.bulk import BulkModelMixin
+from utils.export import ExportMixin
 
-class InventoryViewSet(viewsets.ModelViewSet):
+class InventoryViewSet(CSVImportMixin, viewsets.ModelViewSet):
     queryset = Inventory.objects.all()
     serializer_class = InventorySerializer
     permission_classes = [IsAuthenticated]
+    import_kind = 'inventory'
 
     def get_queryset(self):
         return self.queryset.filter(farm__owner=self.request.user)
 
-class ProductionRecordViewSet(viewsets.ModelViewSet):
+class ProductionRecordViewSet(ExportMixin, BulkModelMixin, viewsets.ModelViewSet):
     queryset = ProductionRecord.objects.all()
     serializer_class = ProductionRecordSerializer
     permission_classes = [IsAuthenticated]
+    max_page_size = 500
 
     def get_queryset(self):
         return self.queryset.filter(farm__owner=self.request.user)
\ No newline at end of file
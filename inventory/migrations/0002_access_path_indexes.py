@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("crops", "0002_access_path_indexes"),
+        ("farms", "0002_access_path_indexes"),
+        ("inventory", "0001_initial"),
+        ("livestock", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="productionrecord",
+            index=models.Index(fields=["farm", "-date"], name="prodrec_farm_date_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="productionrecord",
+            index=models.Index(
+                fields=["farm", "-created_at", "-id"], name="prodrec_farm_created_idx"
+            ),
+        ),
+    ]
@@ -1,8 +1,10 @@
 from django.db import models
 from farms.models import Farm
+from farms.cdc import track_changes
 from crops.models import Crop
 from livestock.models import Animal, LivestockUnit
 
+@track_changes(farm_path='farm')
 class Inventory(models.Model):
     farm = models.ForeignKey(Farm, on_delete=models.CASCADE)
     item_name = models.CharField(max_length=255)
@@ -15,6 +17,7 @@ class Inventory(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+@track_changes(farm_path='farm')
 class ProductionRecord(models.Model):
     farm = models.ForeignKey(Farm, on_delete=models.CASCADE)
     crop = models.ForeignKey(Crop, on_delete=models.SET_NULL, null=True, blank=True)
@@ -26,4 +29,10 @@ class ProductionRecord(models.Model):
     unit = models.CharField(max_length=20)
     value_estimate = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
     notes = models.TextField(blank=True)
-    created_at = models.DateTimeField(auto_now_add=True)
\ No newline at end of file
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['farm', '-date'], name='prodrec_farm_date_idx'),
+            models.Index(fields=['farm', '-created_at', '-id'], name='prodrec_farm_created_idx'),
+        ]
@@ -1,3 +1,113 @@
-from django.test import TestCase
+from datetime import date
+from decimal import Decimal
+import time
 
-# Create your tests here.
+from analytics.engine import process_farm
+from analytics.models import AnalyticsAggregate
+from django.test import tag
+from inventory.models import ProductionRecord
+from utils.testing import QueryPlanMixin, ServiceTestCase, make_crop, make_farm, make_field, make_user
+
+
+class AccessPathIndexTests(QueryPlanMixin, ServiceTestCase):
+    def test_production_by_date_uses_farm_date_index(self):
+        farm = make_farm(make_user('owner'))
+        self.assertUsesIndex(ProductionRecord.objects.filter(farm=farm).order_by('-date'), 'prodrec_farm_date_idx')
+
+
+class ProductionBulkTests(ServiceTestCase):
+    url = '/api/production-records/bulk/'
+
+    def setUp(self):
+        super().setUp()
+        self.owner = make_user('owner')
+        self.farm = make_farm(self.owner)
+        self.records = [
+            ProductionRecord.objects.create(
+                farm=self.farm, date=date(2026, 3, day), item_type='milk', quantity=Decimal('10.00'), unit='l'
+            )
+            for day in (1, 2, 3)
+        ]
+        process_farm(self.farm.id)
+        self.client.force_authenticate(self.owner)
+
+    def monthly_milk(self):
+        return AnalyticsAggregate.objects.get(farm=self.farm, period='month:2026-03', metric_type='production:milk').metric_value
+
+    def test_bulk_update_is_folded_into_aggregates(self):
+        self.assertEqual(self.monthly_milk(), Decimal('30.00'))
+        response = self.client.patch(self.url, [{'id': self.records[0].id, 'quantity': '25.00'}], format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(self.monthly_milk(), Decimal('45.00'))
+        moved = self.client.patch(self.url, [{'id': self.records[1].id, 'date': '2026-04-01'}], format='json')
+        self.assertEqual(moved.status_code, 200, moved.data)
+        self.assertEqual(self.monthly_milk(), Decimal('35.00'))
+
+    def test_bulk_destroy_is_folded_into_aggregates(self):
+        response = self.client.delete(self.url, {'ids': [self.records[0].id, self.records[1].id]}, format='json')
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual(self.monthly_milk(), Decimal('10.00'))
+
+    def test_bulk_destroy_rejects_malformed_ids(self):
+        for payload in ({'ids': ['abc']}, {'ids': 5}, ['x'], {'ids': list(range(6000))}):
+            with self.assertLogs('agricore.requests', 'WARNING'):
+                response = self.client.delete(self.url, payload, format='json')
+            self.assertEqual(response.status_code, 400, payload)
+        self.assertEqual(ProductionRecord.objects.count(), 3)
+
+    def test_rows_for_another_users_farm_are_rejected(self):
+        other_farm = make_farm(make_user('other'))
+        other_crop = make_crop(make_field(other_farm))
+        rows = [
+            {'farm': self.farm.id, 'date': '2026-03-04', 'item_type': 'milk', 'quantity': '1.00', 'unit': 'l'},
+            {'farm': other_farm.id, 'date': '2026-03-04', 'item_type': 'milk', 'quantity': '1.00', 'unit': 'l'},
+            {'farm': self.farm.id, 'crop': other_crop.id, 'date': '2026-03-04', 'item_type': 'maize',
+             'quantity': '1.00', 'unit': 'kg'},
+        ]
+        with self.assertLogs('agricore.requests', 'WARNING'):
+            response = self.client.post(self.url, rows, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([error['index'] for error in response.data['errors']], [1, 2])
+        self.assertIn('farm', response.data['errors'][0]['errors'])
+        self.assertIn('crop', response.data['errors'][1]['errors'])
+
+        skipped = self.client.post(f'{self.url}?on_error=skip', rows, format='json')
+        self.assertEqual(skipped.data['count'], 1)
+        self.assertFalse(ProductionRecord.objects.filter(farm=other_farm).exists())
+
+        with self.assertLogs('agricore.requests', 'WARNING'):
+            moved = self.client.patch(self.url, [{'id': self.records[0].id, 'farm': other_farm.id}], format='json')
+        self.assertEqual(moved.status_code, 400)
+        self.assertEqual(ProductionRecord.objects.get(pk=self.records[0].id).farm_id, self.farm.id)
+
+
+@tag('slow')
+class ProductionBulkThroughputTests(ServiceTestCase):
+    """About half a minute; run with `manage.py test --tag slow`."""
+    ROWS = 5000
+    SINGLE_ROWS = 200
+
+    def setUp(self):
+        super().setUp()
+        self.owner = make_user('owner')
+        self.farm = make_farm(self.owner)
+        self.client.force_authenticate(self.owner)
+
+    def row(self, day):
+        return {'farm': self.farm.id, 'date': f'2026-03-{day % 28 + 1:02d}', 'item_type': 'milk',
+                'quantity': '10.00', 'unit': 'l'}
+
+    def test_bulk_create_rows_per_second(self):
+        started = time.perf_counter()
+        for day in range(self.SINGLE_ROWS):
+            self.client.post('/api/production-records/', self.row(day), format='json')
+        single = self.SINGLE_ROWS / (time.perf_counter() - started)
+
+        rows = [self.row(day) for day in range(self.ROWS)]
+        started = time.perf_counter()
+        response = self.client.post('/api/production-records/bulk/', rows, format='json')
+        bulk = self.ROWS / (time.perf_counter() - started)
+
+        self.assertEqual(response.data['count'], self.ROWS)
+        print(f'\nproduction records: {single:,.0f} rows/s one by one, {bulk:,.0f} rows/s in bulk')
+        self.assertGreater(bulk, 10 * single)
@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from livestock.models import LivestockUnit, Animal, AnimalReproductiveRecord, LivestockTask, LivestockEmployeeAssignment, LivestockExpense, AnimalMedicalRecord
+from utils.bulk import BulkListSerializer
 
 class LivestockUnitSerializer(serializers.ModelSerializer):
     class Meta:
@@ -34,4 +35,5 @@ class LivestockExpenseSerializer(serializers.ModelSerializer):
 class AnimalMedicalRecordSerializer(serializers.ModelSerializer):
     class Meta:
         model = AnimalMedicalRecord
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+        list_serializer_class = BulkListSerializer
\ No newline at end of file
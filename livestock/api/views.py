@@ -2,6 +2,9 @@ from rest_framework import viewsets
 from rest_framework.permissions import IsAuthenticated
 from livestock.models import LivestockUnit, Animal, AnimalReproductiveRecord, LivestockTask, LivestockEmployeeAssignment, LivestockExpense, AnimalMedicalRecord
 from .serializers import LivestockUnitSerializer, AnimalSerializer, AnimalReproductiveRecordSerializer, LivestockTaskSerializer, LivestockEmployeeAssignmentSerializer, LivestockExpenseSerializer, AnimalMedicalRecordSerializer
+from farms.importer import CSVImportMixin
+from utils.bulk import BulkModelMixin
+from utils.export import ExportMixin
 
 class LivestockUnitViewSet(viewsets.ModelViewSet):
     queryset = LivestockUnit.objects.all()
@@ -11,13 +14,14 @@ class LivestockUnitViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         return self.queryset.filter(field__farm__owner=self.request.user)
 
-class AnimalViewSet(viewsets.ModelViewSet):
+class AnimalViewSet(CSVImportMixin, viewsets.ModelViewSet):
     queryset = Animal.objects.all()
     serializer_class = AnimalSerializer
     permission_classes = [IsAuthenticated]
+    import_kind = 'animals'
 
     def get_queryset(self):
-        return self.queryset.filter(livestock_unit__field__farm__owner=self.request.user)
+        return self.queryset.filter(owner=self.request.user)
 
 class AnimalReproductiveRecordViewSet(viewsets.ModelViewSet):
     queryset = AnimalReproductiveRecord.objects.all()
@@ -30,25 +34,26 @@ class LivestockTaskViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return self.queryset.filter(livestock_unit__field__farm__owner=self.request.user)
+        return self.queryset.filter(owner=self.request.user)
 
 class LivestockEmployeeAssignmentViewSet(viewsets.ModelViewSet):
     queryset = LivestockEmployeeAssignment.objects.all()
     serializer_class = LivestockEmployeeAssignmentSerializer
     permission_classes = [IsAuthenticated]
+    keyset_ordering = ('-assigned_at', '-id')
 
-class LivestockExpenseViewSet(viewsets.ModelViewSet):
+class LivestockExpenseViewSet(ExportMixin, viewsets.ModelViewSet):
     queryset = LivestockExpense.objects.all()
     serializer_class = LivestockExpenseSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return self.queryset.filter(livestock_unit__field__farm__owner=self.request.user)
+        return self.queryset.filter(owner=self.request.user)
 
-class AnimalMedicalRecordViewSet(viewsets.ModelViewSet):
+class AnimalMedicalRecordViewSet(BulkModelMixin, viewsets.ModelViewSet):
     queryset = AnimalMedicalRecord.objects.all()
     serializer_class = AnimalMedicalRecordSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return self.queryset.filter(livestock_unit__field__farm__owner=self.request.user)
\ No newline at end of file
+        return self.queryset.filter(owner=self.request.user)
\ No newline at end of file
@@ -0,0 +1,76 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0001_initial"),
+        ("farms", "0002_access_path_indexes"),
+        ("livestock", "0001_initial"),
+        ("workforce", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="animal",
+            index=models.Index(
+                fields=["livestock_unit", "-created_at", "-id"],
+                name="animal_unit_created_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="animal",
+            index=models.Index(
+                fields=["livestock_unit", "tag_id"], name="animal_unit_tag_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="animalmedicalrecord",
+            index=models.Index(
+                fields=["livestock_unit", "-created_at", "-id"],
+                name="medrec_unit_created_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="animalmedicalrecord",
+            index=models.Index(
+                fields=["animal", "-date"], name="medrec_animal_date_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="livestockexpense",
+            index=models.Index(
+                fields=["livestock_unit", "-created_at", "-id"],
+                name="lsexp_unit_created_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="livestockexpense",
+            index=models.Index(
+                fields=["livestock_unit", "-incurred_on"],
+                name="lsexp_unit_incurred_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="livestocktask",
+            index=models.Index(
+                fields=["livestock_unit", "-created_at", "-id"],
+                name="lstask_unit_created_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="livestocktask",
+            index=models.Index(
+                fields=["livestock_unit", "status", "due_date"],
+                name="lstask_unit_status_due_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="livestockunit",
+            index=models.Index(
+                fields=["field", "-created_at", "-id"], name="lsunit_field_created_idx"
+            ),
+        ),
+    ]
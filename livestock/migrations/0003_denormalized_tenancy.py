@@ -0,0 +1,139 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:41
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0001_initial"),
+        ("farms", "0002_access_path_indexes"),
+        ("livestock", "0002_access_path_indexes"),
+        ("workforce", "0001_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="animal",
+            name="farm",
+            field=models.ForeignKey(
+                blank=True,
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="+",
+                to="farms.farm",
+            ),
+        ),
+        migrations.AddField(
+            model_name="animal",
+            name="owner",
+            field=models.ForeignKey(
+                blank=True,
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="+",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AddField(
+            model_name="animalmedicalrecord",
+            name="farm",
+            field=models.ForeignKey(
+                blank=True,
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="+",
+                to="farms.farm",
+            ),
+        ),
+        migrations.AddField(
+            model_name="animalmedicalrecord",
+            name="owner",
+            field=models.ForeignKey(
+                blank=True,
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="+",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AddField(
+            model_name="livestockexpense",
+            name="farm",
+            field=models.ForeignKey(
+                blank=True,
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="+",
+                to="farms.farm",
+            ),
+        ),
+        migrations.AddField(
+            model_name="livestockexpense",
+            name="owner",
+            field=models.ForeignKey(
+                blank=True,
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="+",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AddField(
+            model_name="livestocktask",
+            name="farm",
+            field=models.ForeignKey(
+                blank=True,
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="+",
+                to="farms.farm",
+            ),
+        ),
+        migrations.AddField(
+            model_name="livestocktask",
+            name="owner",
+            field=models.ForeignKey(
+                blank=True,
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="+",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="animal",
+            index=models.Index(
+                fields=["owner", "-created_at", "-id"], name="animal_owner_created_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="animalmedicalrecord",
+            index=models.Index(
+                fields=["owner", "-created_at", "-id"], name="medrec_owner_created_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="livestockexpense",
+            index=models.Index(
+                fields=["owner", "-created_at", "-id"], name="lsexp_owner_created_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="livestocktask",
+            index=models.Index(
+                fields=["owner", "-created_at", "-id"], name="lstask_owner_created_idx"
+            ),
+        ),
+    ]
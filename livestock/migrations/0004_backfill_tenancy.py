@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:10
+
+from django.db import migrations
+from django.db.models import OuterRef, Subquery
+
+BATCH_SIZE = 5000
+
+# Tables that gained farm/owner in 0003; all reach their Farm through livestock_unit.
+SCOPED_MODELS = ("animal", "livestocktask", "livestockexpense", "animalmedicalrecord")
+
+
+def backfill_tenancy(apps, schema_editor):
+    LivestockUnit = apps.get_model("livestock", "LivestockUnit")
+    units = LivestockUnit.objects.filter(pk=OuterRef("livestock_unit_id"))
+    farm_id = Subquery(units.values("field__farm")[:1])
+    owner_id = Subquery(units.values("field__farm__owner")[:1])
+    for model_name in SCOPED_MODELS:
+        model = apps.get_model("livestock", model_name)
+        last_pk = 0
+        while True:
+            pks = list(
+                model.objects.filter(pk__gt=last_pk, farm__isnull=True)
+                .order_by("pk")
+                .values_list("pk", flat=True)[:BATCH_SIZE]
+            )
+            if not pks:
+                break
+            model.objects.filter(pk__in=pks).update(farm_id=farm_id, owner_id=owner_id)
+            last_pk = pks[-1]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("livestock", "0003_denormalized_tenancy"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_tenancy, migrations.RunPython.noop),
+    ]
@@ -1,9 +1,11 @@
 from django.db import models
-from farms.models import Field
+from farms.models import Field, FarmScopedModel
 from workforce.models import Employee
 from accounts.models import Attachment
+from farms.cdc import track_changes
 
-class LivestockUnit(models.Model):
+@track_changes(farm_path='farm')
+class LivestockUnit(FarmScopedModel):
     field = models.ForeignKey(Field, on_delete=models.CASCADE)
     unit_name = models.CharField(max_length=255)
     animal_type = models.CharField(max_length=50)
@@ -13,7 +15,15 @@ class LivestockUnit(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
-class Animal(models.Model):
+    tenancy_path = 'field__farm'
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['field', '-created_at', '-id'], name='lsunit_field_created_idx'),
+        ]
+
+@track_changes(farm_path='farm')
+class Animal(FarmScopedModel):
     livestock_unit = models.ForeignKey(LivestockUnit, on_delete=models.CASCADE)
     tag_id = models.CharField(max_length=50)
     name = models.CharField(max_length=255, blank=True)
@@ -30,6 +40,15 @@ class Animal(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    tenancy_path = 'livestock_unit__field__farm'
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['owner', '-created_at', '-id'], name='animal_owner_created_idx'),
+            models.Index(fields=['livestock_unit', '-created_at', '-id'], name='animal_unit_created_idx'),
+            models.Index(fields=['livestock_unit', 'tag_id'], name='animal_unit_tag_idx'),
+        ]
+
 class AnimalReproductiveRecord(models.Model):
     animal = models.ForeignKey(Animal, on_delete=models.CASCADE)
     sex = models.CharField(max_length=10)
@@ -39,7 +58,8 @@ class AnimalReproductiveRecord(models.Model):
     offspring_ids = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
-class LivestockTask(models.Model):
+@track_changes(farm_path='farm')
+class LivestockTask(FarmScopedModel):
     livestock_unit = models.ForeignKey(LivestockUnit, on_delete=models.CASCADE)
     title = models.CharField(max_length=255)
     description = models.TextField(blank=True)
@@ -50,6 +70,15 @@ class LivestockTask(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     completed_at = models.DateTimeField(blank=True, null=True)
 
+    tenancy_path = 'livestock_unit__field__farm'
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['owner', '-created_at', '-id'], name='lstask_owner_created_idx'),
+            models.Index(fields=['livestock_unit', '-created_at', '-id'], name='lstask_unit_created_idx'),
+            models.Index(fields=['livestock_unit', 'status', 'due_date'], name='lstask_unit_status_due_idx'),
+        ]
+
 class LivestockEmployeeAssignment(models.Model):
     livestock_task = models.ForeignKey(LivestockTask, on_delete=models.CASCADE)
     employee = models.ForeignKey(Employee, on_delete=models.CASCADE)
@@ -58,7 +87,8 @@ class LivestockEmployeeAssignment(models.Model):
     removed_at = models.DateTimeField(blank=True, null=True)
     ai_recommended_duration = models.IntegerField(blank=True, null=True)
 
-class LivestockExpense(models.Model):
+@track_changes(farm_path='farm')
+class LivestockExpense(FarmScopedModel):
     livestock_unit = models.ForeignKey(LivestockUnit, on_delete=models.CASCADE)
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     currency = models.CharField(max_length=3, default='USD')
@@ -69,7 +99,17 @@ class LivestockExpense(models.Model):
     incurred_on = models.DateField()
     created_at = models.DateTimeField(auto_now_add=True)
 
-class AnimalMedicalRecord(models.Model):
+    tenancy_path = 'livestock_unit__field__farm'
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['owner', '-created_at', '-id'], name='lsexp_owner_created_idx'),
+            models.Index(fields=['livestock_unit', '-created_at', '-id'], name='lsexp_unit_created_idx'),
+            models.Index(fields=['livestock_unit', '-incurred_on'], name='lsexp_unit_incurred_idx'),
+        ]
+
+@track_changes(farm_path='farm')
+class AnimalMedicalRecord(FarmScopedModel):
     animal = models.ForeignKey(Animal, on_delete=models.CASCADE)
     livestock_unit = models.ForeignKey(LivestockUnit, on_delete=models.CASCADE)
     date = models.DateField()
@@ -82,3 +122,12 @@ class AnimalMedicalRecord(models.Model):
     additional_info = models.TextField(blank=True)
     attachment = models.ForeignKey(Attachment, on_delete=models.SET_NULL, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+
+    tenancy_path = 'livestock_unit__field__farm'
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['owner', '-created_at', '-id'], name='medrec_owner_created_idx'),
+            models.Index(fields=['livestock_unit', '-created_at', '-id'], name='medrec_unit_created_idx'),
+            models.Index(fields=['animal', '-date'], name='medrec_animal_date_idx'),
+        ]
@@ -1,3 +1,149 @@
-from django.test import TestCase
+import importlib
+import statistics
+import time
 
-# Create your tests here.
+from django.apps import apps
+from django.db import connection
+from django.test import tag
+
+from farms.models import Farm, Field
+from livestock.models import Animal, AnimalMedicalRecord, LivestockExpense, LivestockTask, LivestockUnit
+from utils.testing import QueryPlanMixin, ServiceTestCase, make_farm, make_field, make_unit, make_user
+
+
+class AccessPathIndexTests(QueryPlanMixin, ServiceTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = make_user('owner')
+        cls.unit = make_unit(make_field(make_farm(cls.owner)))
+
+    def test_owner_scoped_lists_use_owner_indexes(self):
+        for model, index in [
+            (Animal, 'animal_owner_created_idx'),
+            (LivestockTask, 'lstask_owner_created_idx'),
+            (LivestockExpense, 'lsexp_owner_created_idx'),
+            (AnimalMedicalRecord, 'medrec_owner_created_idx'),
+        ]:
+            with self.subTest(model=model.__name__):
+                self.assertUsesIndex(model.objects.filter(owner=self.owner).order_by('-created_at', '-id'), index)
+
+    def test_animal_list_cost_does_not_grow_with_rows(self):
+        self.client.force_authenticate(self.owner)
+        for count in (1, 20):
+            Animal.objects.bulk_create(Animal.assign_tenancy([
+                Animal(livestock_unit=self.unit, tag_id=f'T{count}-{i}', sex='female', age_group='adult', breed='Boran', status='active')
+                for i in range(count)
+            ]))
+            with self.subTest(rows=count), self.assertNumQueries(1):
+                self.client.get('/api/animals/')
+
+
+class TenancyTests(ServiceTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = make_user('owner')
+        cls.farm = make_farm(cls.owner)
+        cls.field = make_field(cls.farm)
+        cls.unit = make_unit(cls.field)
+        cls.animal = Animal.objects.create(
+            livestock_unit=cls.unit, tag_id='A1', sex='female', age_group='adult', breed='Boran', status='active'
+        )
+
+    def test_renaming_a_parent_leaves_children_alone(self):
+        field = Field.objects.get(pk=self.field.pk)
+        field.name = 'Upper paddock'
+        with self.assertNumQueries(1):
+            field.save()
+
+    def test_moving_a_parent_repoints_children(self):
+        other_owner = make_user('buyer')
+        other_farm = make_farm(other_owner)
+        field = Field.objects.get(pk=self.field.pk)
+        field.farm = other_farm
+        field.save()
+        self.animal.refresh_from_db()
+        self.assertEqual((self.animal.farm_id, self.animal.owner_id), (other_farm.pk, other_owner.pk))
+
+    def test_changing_farm_owner_repoints_children(self):
+        other_owner = make_user('heir')
+        farm = Farm.objects.get(pk=self.farm.pk)
+        farm.owner = other_owner
+        farm.save()
+        self.animal.refresh_from_db()
+        self.assertEqual(self.animal.owner_id, other_owner.pk)
+
+    def test_migration_backfills_existing_rows(self):
+        backfill = importlib.import_module('livestock.migrations.0004_backfill_tenancy').backfill_tenancy
+        Animal.objects.update(farm=None, owner=None)
+        backfill(apps, None)
+        self.animal.refresh_from_db()
+        self.assertEqual((self.animal.farm_id, self.animal.owner_id), (self.farm.pk, self.owner.pk))
+
+    def test_migration_backfills_livestock_units(self):
+        backfill = importlib.import_module('livestock.migrations.0005_livestockunit_tenancy').backfill_tenancy
+        LivestockUnit.objects.update(farm=None, owner=None)
+        backfill(apps, None)
+        self.assertEqual(list(LivestockUnit.objects.values_list('farm', 'owner')), [(self.farm.pk, self.owner.pk)])
+
+
+@tag('slow')
+class TenancyLatencyTests(ServiceTestCase):
+    """About a minute; run with `manage.py test --tag slow`."""
+    ROWS = 1_000_000
+    TENANTS = 200
+    LARGE_TENANT_UNITS = 20
+    PAGE = 50
+
+    @classmethod
+    def setUpTestData(cls):
+        # One large tenant with 100k animals across 20 herds; 900k more spread over 200 small tenants.
+        cls.large = make_user('large')
+        for i in range(cls.LARGE_TENANT_UNITS):
+            make_unit(make_field(make_farm(cls.large, name=f'Farm {i}')))
+        cls.small = [make_user(f'tenant{i}') for i in range(cls.TENANTS)]
+        for owner in cls.small:
+            make_unit(make_field(make_farm(owner)))
+        large_rows = cls.ROWS // 10
+        cls.insert(cls.large, large_rows // cls.LARGE_TENANT_UNITS)
+        cls.insert(cls.small, (cls.ROWS - large_rows) // cls.TENANTS)
+
+    @classmethod
+    def insert(cls, owners, per_unit):
+        owners = owners if isinstance(owners, list) else [owners]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {Animal._meta.db_table}
+                    (livestock_unit_id, farm_id, owner_id, tag_id, name, sex, age_group, breed, status,
+                     additional_notes, created_at, updated_at)
+                WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < %s)
+                SELECT u.id, u.farm_id, u.owner_id, 'T' || u.id || '-' || i, '', 'female', 'adult', 'Boran', 'active',
+                    '', datetime('2026-01-01', '+' || (i * 37 + u.id) || ' seconds'), '2026-01-01'
+                FROM n, {LivestockUnit._meta.db_table} u
+                WHERE u.owner_id IN ({', '.join(['%s'] * len(owners))})
+                """,
+                [per_unit, *(owner.pk for owner in owners)],
+            )
+
+    def latency(self, queryset, repeat=20):
+        samples = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            list(queryset.all())
+            samples.append(time.perf_counter() - started)
+        return statistics.median(samples) * 1000
+
+    def test_owner_column_beats_the_join(self):
+        self.assertEqual(Animal.objects.count(), self.ROWS)
+        for name, owner in [('large tenant', self.large), ('small tenant', self.small[0])]:
+            joined = Animal.objects.filter(livestock_unit__field__farm__owner=owner).order_by('-created_at', '-id')
+            direct = Animal.objects.filter(owner=owner).order_by('-created_at', '-id')
+            self.assertEqual(
+                list(joined.values_list('id', flat=True)[:self.PAGE]),
+                list(direct.values_list('id', flat=True)[:self.PAGE]),
+            )
+            old = self.latency(joined[:self.PAGE])
+            new = self.latency(direct[:self.PAGE])
+            print(f'\n{name}, first {self.PAGE} of {direct.count()} animals: join {old:.2f} ms, owner column {new:.2f} ms')
+            self.assertLess(new, old)
+            self.assertLess(new, 50)
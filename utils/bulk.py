@@ -0,0 +1,211 @@
+# utils/bulk.py
+from contextlib import contextmanager
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import serializers, status
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+from analytics.engine import counted_values, fold_bulk_update
+from farms.cdc import publish_bulk, publish_deletes
+from farms.models import Farm, FarmScopedModel
+
+
+class BulkListSerializer(serializers.ListSerializer):
+    """
+    ListSerializer that validates thousands of rows in one pass.
+
+    Every PrimaryKeyRelatedField is resolved with one `IN` query for all
+    rows instead of one lookup per row. Invalid rows do not stop validation:
+    their errors are collected in `row_errors` as {'index', 'errors'} and the
+    valid rows are kept in `validated_data`. create() and update() write
+    with bulk_create()/bulk_update().
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.row_errors = []
+        self.update_targets = []
+
+    def to_internal_value(self, data):
+        if not isinstance(data, list):
+            raise ValidationError({'non_field_errors': [f"Expected a list of items but got type \"{type(data).__name__}\"."]})
+        if self.max_length is not None and len(data) > self.max_length:
+            raise ValidationError({'non_field_errors': [f"Ensure this field has no more than {self.max_length} elements."]})
+
+        validated = []
+        self.row_errors = []
+        self.update_targets = []
+        with prefetched_relations(self.child, data):
+            for index, item in enumerate(data):
+                try:
+                    validated.append(self.run_child_validation(item))
+                except ValidationError as exc:
+                    self.row_errors.append({'index': index, 'errors': exc.detail})
+                else:
+                    if self.instance is not None:
+                        self.update_targets.append(self.child.instance)
+        return validated
+
+    def run_child_validation(self, data):
+        if self.instance is not None:
+            target = self.instance.get(_row_pk(data)) if isinstance(data, dict) else None
+            if target is None:
+                raise ValidationError({'id': ["Not found."]})
+            self.child.instance = target
+        return super().run_child_validation(data)
+
+    def create(self, validated_data):
+        model = self.child.Meta.model
+        objs = [model(**attrs) for attrs in validated_data]
+        if hasattr(model, 'assign_tenancy'):
+            model.assign_tenancy(objs)
+        created = model.objects.bulk_create(objs, batch_size=self.context.get('batch_size'))
+        publish_bulk(model, created, 'create')
+        return created
+
+    def update(self, instance, validated_data):
+        model = self.child.Meta.model
+        previous = {target.pk: counted_values(model, target) for target in self.update_targets}
+        fields = set()
+        for target, attrs in zip(self.update_targets, validated_data):
+            for name, value in attrs.items():
+                setattr(target, name, value)
+            fields.update(attrs)
+        if not fields:
+            return self.update_targets
+        # bulk_update() skips pre_save(), so stamp auto_now columns ourselves.
+        now = timezone.now()
+        for field in model._meta.concrete_fields:
+            if getattr(field, 'auto_now', False):
+                for target in self.update_targets:
+                    setattr(target, field.attname, now)
+                fields.add(field.name)
+        if hasattr(model, 'assign_tenancy') and fields & {model.tenancy_parent_field().name}:
+            model.assign_tenancy(self.update_targets)
+            fields.update({'farm', 'owner'})
+        model.objects.bulk_update(self.update_targets, sorted(fields), batch_size=self.context.get('batch_size'))
+        publish_bulk(model, self.update_targets, 'update', fields=fields)
+        fold_bulk_update(model, previous, self.update_targets)
+        return self.update_targets
+
+
+@contextmanager
+def prefetched_relations(serializer, rows):
+    """Resolve the primary keys of every writable related field in `rows` with one query per field."""
+    patched = []
+    for field in serializer.fields.values():
+        if field.read_only or not isinstance(field, serializers.PrimaryKeyRelatedField):
+            continue
+        pk_field = field.get_queryset().model._meta.pk
+        ids = set()
+        for row in rows:
+            if isinstance(row, dict) and row.get(field.field_name) not in (None, ''):
+                try:
+                    ids.add(pk_field.to_python(row[field.field_name]))
+                except (TypeError, ValueError, DjangoValidationError):
+                    pass
+        field.to_internal_value = _prefetched_lookup(field, pk_field, field.get_queryset().in_bulk(ids))
+        patched.append(field)
+    try:
+        yield
+    finally:
+        for field in patched:
+            del field.to_internal_value
+
+
+def _prefetched_lookup(field, pk_field, objects):
+    def to_internal_value(data):
+        if isinstance(data, bool):
+            field.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            pk = pk_field.to_python(data)
+        except (TypeError, ValueError, DjangoValidationError):
+            field.fail('incorrect_type', data_type=type(data).__name__)
+        if pk not in objects:
+            field.fail('does_not_exist', pk_value=data)
+        return objects[pk]
+    return to_internal_value
+
+
+def _row_pk(row):
+    try:
+        return int(row.get('id'))
+    except (TypeError, ValueError):
+        return None
+
+
+class BulkDestroySerializer(serializers.Serializer):
+    def __init__(self, *args, max_rows=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['ids'] = serializers.ListField(child=serializers.IntegerField(), max_length=max_rows)
+
+
+class BulkModelMixin:
+    """
+    Adds a `bulk/` route to a ModelViewSet whose serializer uses BulkListSerializer.
+
+    POST a list of rows to create them and PATCH a list of rows carrying `id`
+    to update them. DELETE {'ids': [...]} removes rows. Writes run in one
+    transaction. By default any invalid row rejects the whole request with
+    per-row errors. With ?on_error=skip the valid rows are written and the
+    invalid ones are reported.
+
+    Rows may only point at farms, and farm-scoped rows, that the requesting
+    user owns; see bulk_related_queryset().
+    """
+    bulk_max_rows = 5000
+    bulk_batch_size = 1000
+
+    def bulk_related_queryset(self, field):
+        """The rows a writable related `field` may point at: the user's own farms and farm-scoped rows."""
+        queryset = field.get_queryset()
+        if queryset.model is Farm or issubclass(queryset.model, FarmScopedModel):
+            return queryset.filter(owner=self.request.user)
+        return queryset
+
+    @action(detail=False, methods=['post', 'patch', 'delete'], url_path='bulk')
+    def bulk(self, request, *args, **kwargs):
+        if request.method == 'DELETE':
+            return self.bulk_destroy(request)
+
+        partial = request.method == 'PATCH'
+        instances = None
+        if partial:
+            ids = [_row_pk(row) for row in request.data if isinstance(row, dict)] if isinstance(request.data, list) else []
+            instances = self.get_queryset().in_bulk([pk for pk in ids if pk is not None])
+
+        context = {**self.get_serializer_context(), 'batch_size': self.bulk_batch_size}
+        serializer_class = self.get_serializer_class()
+        serializer = serializer_class(
+            instances, data=request.data, many=True, partial=partial,
+            max_length=self.bulk_max_rows, context=context,
+        )
+        for field in serializer.child.fields.values():
+            if isinstance(field, serializers.PrimaryKeyRelatedField) and not field.read_only:
+                field.queryset = self.bulk_related_queryset(field)
+        serializer.is_valid(raise_exception=True)
+
+        if serializer.row_errors and request.query_params.get('on_error') != 'skip':
+            return Response({'errors': serializer.row_errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            objs = serializer.save()
+        return Response(
+            {'count': len(objs), 'ids': [obj.pk for obj in objs], 'errors': serializer.row_errors},
+            status=status.HTTP_200_OK if partial else status.HTTP_201_CREATED,
+        )
+
+    def bulk_destroy(self, request):
+        serializer = BulkDestroySerializer(data=request.data, max_rows=self.bulk_max_rows)
+        serializer.is_valid(raise_exception=True)
+        # Deletes reach the analytics aggregates through the models' post_delete
+        # receivers, which QuerySet.delete() still sends.
+        with transaction.atomic():
+            queryset = self.get_queryset().filter(pk__in=serializer.validated_data['ids'])
+            publish_deletes(queryset)
+            deleted, _ = queryset.delete()
+        return Response({'count': deleted})
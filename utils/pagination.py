@@ -0,0 +1,200 @@
+# utils/pagination.py
+import base64
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (cursor) pagination over a compound ordering, `(created_at, id)` by default.
+
+    Unlike offset pagination, each page is fetched with a `WHERE (created_at, id) < (...)`
+    predicate, so page N costs the same as page 1. Views can override the ordering with
+    `keyset_ordering` and cap page sizes with `max_page_size`. Nullable columns sort
+    NULLs above every value: last going up, first going down.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    page_size = api_settings.PAGE_SIZE or 50
+    max_page_size = 1000
+    ordering = ('-created_at', '-id')
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request, view)
+        self.ordering = self.get_ordering(queryset, view)
+
+        position, reverse = self.decode_cursor(request)
+        ordering = self.ordering
+        if reverse:
+            ordering = tuple(self._flip(field) for field in ordering)
+
+        queryset = queryset.order_by(*self._order_by(queryset.model, ordering))
+        if position is not None:
+            queryset = queryset.filter(self._keyset_filter(queryset.model, ordering, position))
+
+        # Fetch one extra row to know whether another page follows.
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        if reverse:
+            self.page.reverse()
+
+        if reverse:
+            self.has_next = position is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = position is not None
+        return self.page
+
+    def get_page_size(self, request, view):
+        max_page_size = getattr(view, 'max_page_size', self.max_page_size)
+        page_size = self.page_size
+        if self.page_size_query_param:
+            try:
+                requested = int(request.query_params[self.page_size_query_param])
+                if requested > 0:
+                    page_size = requested
+            except (KeyError, ValueError):
+                pass
+        return min(page_size, max_page_size)
+
+    def get_ordering(self, queryset, view):
+        ordering = getattr(view, 'keyset_ordering', self.ordering)
+        opts = queryset.model._meta
+        fields = []
+        for field in ordering:
+            try:
+                opts.get_field(field.lstrip('-'))
+            except FieldDoesNotExist:
+                continue
+            fields.append(field)
+        # Always finish on the primary key so the ordering is total.
+        if not any(field.lstrip('-') in ('id', 'pk') for field in fields):
+            descending = fields[0].startswith('-') if fields else True
+            fields.append('-id' if descending else 'id')
+        return tuple(fields)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8'))
+            position = payload['p']
+            reverse = bool(payload.get('r', False))
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def encode_cursor(self, position, reverse=False):
+        payload = {'p': position}
+        if reverse:
+            payload['r'] = 1
+        encoded = base64.urlsafe_b64encode(json.dumps(payload).encode('utf-8')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_position(self, instance):
+        position = []
+        for field in self.ordering:
+            value = getattr(instance, field.lstrip('-'))
+            position.append(value.isoformat() if hasattr(value, 'isoformat') else value)
+        return position
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.get_position(self.page[-1]))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.get_position(self.page[0]), reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def _keyset_filter(self, model, ordering, position):
+        """
+        Expand `(a, b, c) > (x, y, z)` into
+        `a > x OR (a = x AND b > y) OR (a = x AND b = y AND c > z)`,
+        honouring the direction of each column.
+        """
+        opts = model._meta
+        values = []
+        for field, raw in zip(ordering, position):
+            try:
+                values.append(opts.get_field(field.lstrip('-')).to_python(raw))
+            except Exception:
+                raise NotFound(self.invalid_cursor_message)
+
+        condition = Q()
+        equal = Q()
+        for field, value in zip(ordering, values):
+            name = field.lstrip('-')
+            descending = field.startswith('-')
+            nullable = opts.get_field(name).null
+            if value is None:
+                if not nullable:
+                    raise NotFound(self.invalid_cursor_message)
+                # NULL is above every value: nothing follows it going up,
+                # every non-NULL value follows it going down.
+                if descending:
+                    condition |= equal & Q(**{f'{name}__isnull': False})
+                equal &= Q(**{f'{name}__isnull': True})
+                continue
+            after = Q(**{f"{name}__{'lt' if descending else 'gt'}": value})
+            if nullable and not descending:
+                after |= Q(**{f'{name}__isnull': True})
+            condition |= equal & after
+            equal &= Q(**{name: value})
+        return condition
+
+    @staticmethod
+    def _order_by(model, ordering):
+        """`ordering` with NULLs placed the same way on every database, to match _keyset_filter()."""
+        opts = model._meta
+        expressions = []
+        for field in ordering:
+            name = field.lstrip('-')
+            if not opts.get_field(name).null:
+                expressions.append(field)
+            elif field.startswith('-'):
+                expressions.append(F(name).desc(nulls_first=True))
+            else:
+                expressions.append(F(name).asc(nulls_last=True))
+        return expressions
+
+    @staticmethod
+    def _flip(field):
+        return field[1:] if field.startswith('-') else f'-{field}'
@@ -0,0 +1,186 @@
+# utils/request_logging.py
+from django.conf import settings
+from logging.handlers import QueueHandler, QueueListener
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+import time
+import weakref
+
+logger = logging.getLogger('agricore.requests')
+
+# Every AsyncStreamHandler, so a forked child can reset them all; see _after_fork().
+_async_handlers = weakref.WeakSet()
+
+
+class RequestLoggingMiddleware:
+    """
+    One structured log record per API request, shared by every view.
+
+    Successful requests are sampled at REQUEST_LOG_SAMPLE_RATE; 4xx and 5xx
+    responses are always logged. The request thread only collects references
+    (method, path, status, timing, payload): JSONFormatter serializes and
+    truncates them later, on the logging thread of AsyncStreamHandler.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        response = self.get_response(request)
+        if response.status_code < 400:
+            if not logger.isEnabledFor(logging.INFO) or random.random() >= settings.REQUEST_LOG_SAMPLE_RATE:
+                return response
+            level = logging.INFO
+        else:
+            level = logging.WARNING if response.status_code < 500 else logging.ERROR
+            if not logger.isEnabledFor(level):
+                return response
+
+        info = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'duration_ms': round((time.perf_counter() - started) * 1000, 2),
+            'user': getattr(getattr(request, 'user', None), 'pk', None),
+        }
+        renderer_context = getattr(response, 'renderer_context', None) or {}
+        view = renderer_context.get('view')
+        if view is not None:
+            info['view'] = type(view).__name__
+        if settings.REQUEST_LOG_PAYLOADS and 'request' in renderer_context:
+            try:
+                info['request_data'] = renderer_context['request'].data
+            except Exception:
+                pass
+            if response.status_code >= 400:
+                info['response_data'] = getattr(response, 'data', None)
+        logger.log(level, "%s %s %s", request.method, request.path, response.status_code, extra={'request_info': info})
+        return response
+
+
+def summarize_payload(data, limit):
+    """JSON text of `data`, with long lists cut to their first items and the result cut to `limit` characters."""
+    if isinstance(data, (list, tuple)) and len(data) > 3:
+        data = {'items': len(data), 'head': list(data[:3])}
+    try:
+        text = json.dumps(data, default=str)
+    except (TypeError, ValueError):
+        text = repr(data)
+    return text if len(text) <= limit else text[:limit] + f'...({len(text) - limit} more)'
+
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        info = getattr(record, 'request_info', None)
+        if info:
+            limit = settings.REQUEST_LOG_MAX_PAYLOAD
+            for key, value in info.items():
+                entry[key] = summarize_payload(value, limit) if key.endswith('_data') else value
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class _Listener(QueueListener):
+    def enqueue_sentinel(self):
+        # Stopping must wait for room in a full queue, not fail with queue.Full.
+        self.queue.put(self._sentinel)
+
+
+class AsyncStreamHandler(QueueHandler):
+    """
+    Logging handler that never blocks the caller on formatting or I/O.
+
+    Records go onto a bounded in-process queue; a QueueListener thread formats
+    them and writes them to stderr. When the queue is full the record is
+    dropped and counted in `dropped` instead of stalling the request.
+
+    The listener starts with the first record a process logs, so a worker
+    forked after logging was configured (gunicorn, Celery prefork) gets its
+    own queue and thread rather than the parent's queue with no thread
+    draining it.
+    """
+
+    def __init__(self, queue_size=None, stream=None):
+        self.queue_size = queue_size or settings.REQUEST_LOG_QUEUE_SIZE
+        super().__init__(queue.Queue(maxsize=self.queue_size))
+        self.target = logging.StreamHandler(stream or sys.stderr)
+        self.listener = None
+        self.dropped = 0
+        self._pid = None
+        self._stopped = False
+        self._start_lock = threading.Lock()
+        _async_handlers.add(self)
+        atexit.register(self.stop)
+
+    def setFormatter(self, fmt):
+        # Formatting happens on the listener thread, so the formatter belongs to the target.
+        self.target.setFormatter(fmt)
+
+    def prepare(self, record):
+        # The queue is in-process, so the record (payload references included)
+        # can cross threads as-is; formatting is left to the listener.
+        return record
+
+    def enqueue(self, record):
+        if self._pid != os.getpid() and not self._start():
+            self.dropped += 1
+            return
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def _start(self):
+        """Start this process's listener; False once the handler has been stopped."""
+        with self._start_lock:
+            if self._stopped:
+                return False
+            if self._pid != os.getpid():
+                self.listener = _Listener(self.queue, self.target, respect_handler_level=False)
+                self.listener.start()
+                self._pid = os.getpid()
+            return True
+
+    def _after_fork(self):
+        # The parent's listener thread did not survive the fork, and its lock
+        # or queue may have been mid-update; the child starts over with empty ones.
+        self._start_lock = threading.Lock()
+        self.queue = queue.Queue(maxsize=self.queue_size)
+        self.listener = None
+        self._pid = None
+        self.dropped = 0
+
+    def stop(self):
+        """Flush queued records and stop the listener thread; safe to call more than once."""
+        with self._start_lock:
+            self._stopped = True
+            if self.listener is not None and self._pid == os.getpid():
+                self.listener.stop()
+            self.listener = None
+            self._pid = None
+
+    def close(self):
+        self.stop()
+        super().close()
+
+
+def _reset_handlers_after_fork():
+    for handler in list(_async_handlers):
+        handler._after_fork()
+
+
+os.register_at_fork(after_in_child=_reset_handlers_after_fork)
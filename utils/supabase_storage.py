@@ -1,10 +1,24 @@
 # utils/supabase_storage.py
-from supabase import create_client, Client
 from django.conf import settings
+from django.core import signing
+from django.http import FileResponse, Http404
+from django.urls import reverse
+from pathlib import Path
+import shutil
+import time
 import uuid
 
-# Initialize Supabase client
-supabase: Client = create_client(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_ROLE_KEY)
+SIGNED_URL_SALT = "utils.supabase_storage.signed_url"
+
+_supabase = None
+
+def get_supabase():
+    """Supabase client, created on first use so the local backend works without supabase installed."""
+    global _supabase
+    if _supabase is None:
+        from supabase import create_client
+        _supabase = create_client(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_ROLE_KEY)
+    return _supabase
 
 def upload_file(file_obj, folder="general", filename=None):
     """
@@ -15,7 +29,7 @@ def upload_file(file_obj, folder="general", filename=None):
     path = f"{folder}/{filename}"
 
     # Upload the file
-    res = supabase.storage.from_("attachments").upload(
+    res = get_supabase().storage.from_("attachments").upload(
         path=path,
         file=file_obj.read(),
         content_type=file_obj.content_type,  # new API: use content_type param
@@ -27,7 +41,94 @@ def upload_file(file_obj, folder="general", filename=None):
         raise Exception(f"Upload failed: {res['error']}")
 
     # Get public URL
-    public_url_res = supabase.storage.from_("attachments").get_public_url(path)
+    public_url_res = get_supabase().storage.from_("attachments").get_public_url(path)
     public_url = public_url_res.get("public_url")
-    
-    return public_url, path
\ No newline at end of file
+
+    return public_url, path
+
+
+class SupabaseStorage:
+    """Stores generated files in a Supabase Storage bucket."""
+
+    def __init__(self, bucket="attachments"):
+        self.bucket = bucket
+
+    def save(self, path, local_path, content_type):
+        """Upload the file at `local_path` to `path` without reading it into memory here."""
+        res = get_supabase().storage.from_(self.bucket).upload(
+            path=path,
+            file=Path(local_path),
+            file_options={"content-type": content_type, "upsert": "true"},
+        )
+        if isinstance(res, dict) and res.get("error"):
+            raise Exception(f"Upload failed: {res['error']}")
+        return path
+
+    def url(self, path):
+        res = get_supabase().storage.from_(self.bucket).get_public_url(path)
+        return res.get("public_url") if isinstance(res, dict) else res
+
+    def signed_url(self, path, expires_in):
+        """URL that reads `path` from a private bucket for the next `expires_in` seconds."""
+        res = get_supabase().storage.from_(self.bucket).create_signed_url(path, expires_in)
+        if isinstance(res, dict):
+            return res.get("signedURL") or res.get("signedUrl")
+        return res
+
+
+class LocalStorage:
+    """
+    Stores generated files under FILE_STORAGE_LOCAL_ROOT, or a private bucket
+    under FILE_STORAGE_PRIVATE_ROOT; for development and tests.
+    """
+
+    def __init__(self, root=None, bucket=None):
+        self.bucket = bucket
+        if root is None:
+            root = settings.FILE_STORAGE_LOCAL_ROOT if bucket is None else Path(settings.FILE_STORAGE_PRIVATE_ROOT) / bucket
+        self.root = Path(root)
+
+    def save(self, path, local_path, content_type):
+        target = self.root / path
+        target.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(local_path, target)
+        return path
+
+    def url(self, path):
+        return f"{settings.MEDIA_URL}{path}"
+
+    def signed_url(self, path, expires_in):
+        token = signing.dumps(
+            {"bucket": self.bucket, "path": path, "expires": int(time.time()) + expires_in},
+            salt=SIGNED_URL_SALT,
+        )
+        return reverse("signed-file", args=[token])
+
+    def open(self, path):
+        return open(self.root / path, "rb")
+
+
+def get_storage(bucket=None):
+    """
+    Backend selected by FILE_STORAGE_BACKEND: 'supabase' (default) or 'local'.
+    With `bucket`, files go to that private bucket and are read through
+    signed_url() instead of url().
+    """
+    if settings.FILE_STORAGE_BACKEND == "local":
+        return LocalStorage(bucket=bucket)
+    return SupabaseStorage(bucket or "attachments")
+
+
+def serve_signed_file(request, token):
+    """Serve a file behind a LocalStorage.signed_url() until the URL expires."""
+    try:
+        grant = signing.loads(token, salt=SIGNED_URL_SALT)
+    except signing.BadSignature:
+        raise Http404("Invalid link.")
+    if grant["expires"] < time.time():
+        raise Http404("Link expired.")
+    try:
+        handle = LocalStorage(bucket=grant["bucket"]).open(grant["path"])
+    except FileNotFoundError:
+        raise Http404("File not found.")
+    return FileResponse(handle, as_attachment=True, filename=Path(grant["path"]).name)
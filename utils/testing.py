@@ -0,0 +1,115 @@
+# utils/testing.py
+from datetime import date
+from decimal import Decimal
+from unittest import mock
+
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from rest_framework.test import APIClient
+import fakeredis
+
+# Suites run without a Redis server: the Django cache and the channel layer
+# are per process, and farm broadcasts are sent inline. Successful requests
+# are not logged; tests expecting 4xx/5xx responses wrap them in assertLogs().
+local_services = override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer', 'CONFIG': {'capacity': 100000}}},
+    FARMS_BROADCAST_ASYNC=False,
+    SECURE_SSL_REDIRECT=False,
+    REQUEST_LOG_SAMPLE_RATE=0,
+)
+
+# Modules that keep their own Redis connection in a module global.
+REDIS_CLIENTS = (
+    'farms.broadcast._journal',
+    'farms.timeseries._buffer',
+    'communications.presence._registry',
+)
+
+
+class FakeRedisMixin:
+    """Points every module-level Redis connection at one in-memory fake, emptied before each test."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.redis = fakeredis.FakeRedis(decode_responses=True)
+        for target in REDIS_CLIENTS:
+            patcher = mock.patch(target, cls.redis)
+            patcher.start()
+            cls.addClassCleanup(patcher.stop)
+        super().setUpClass()
+
+    def setUp(self):
+        super().setUp()
+        self.redis.flushall()
+
+
+@local_services
+class ServiceTestCase(FakeRedisMixin, TestCase):
+    client_class = APIClient
+
+
+@local_services
+class ServiceTransactionTestCase(FakeRedisMixin, TransactionTestCase):
+    """For tests that need real commits: on_commit hooks, other threads, row locks."""
+    client_class = APIClient
+
+
+class QueryPlanMixin:
+    def assertUsesIndex(self, queryset, index_name):
+        """Assert that the database plans `queryset` through `index_name`."""
+        with transaction.atomic():
+            if connection.vendor == 'postgresql':
+                # Test tables are tiny; make the planner show which index it would pick at scale.
+                with connection.cursor() as cursor:
+                    cursor.execute('SET LOCAL enable_seqscan = off')
+            plan = queryset.explain()
+        self.assertIn(index_name, plan, f"{index_name} not used:\n{plan}")
+
+
+def make_user(username, **extra):
+    from accounts.models import CustomUser
+    return CustomUser.objects.create_user(username=username, email=f'{username}@example.com', password='pw', **extra)
+
+
+def make_farm(owner, **extra):
+    from farms.models import Farm
+    values = {
+        'name': 'Farm', 'type': 'mixed', 'country': 'KE', 'state': 'Nakuru', 'city': 'Nakuru',
+        'address': '1 Farm Road', 'total_size': Decimal('10.00'), 'size_unit': 'ha',
+    }
+    return Farm.objects.create(owner=owner, **{**values, **extra})
+
+
+def make_field(farm, **extra):
+    from farms.models import Field
+    values = {'name': 'Field', 'purpose': 'mixed', 'total_size': Decimal('5.00'), 'size_unit': 'ha', 'soil_type': 'loam'}
+    return Field.objects.create(farm=farm, **{**values, **extra})
+
+
+def make_crop(field, **extra):
+    from crops.models import Crop
+    values = {
+        'name': 'Maize', 'variety': 'H614', 'seed_source': 'Kenya Seed', 'planting_month_year': '03-2026',
+        'expected_harvest_month_year': '08-2026', 'status': 'growing',
+    }
+    return Crop.objects.create(field=field, **{**values, **extra})
+
+
+def make_unit(field, **extra):
+    from livestock.models import LivestockUnit
+    values = {'unit_name': 'Herd', 'animal_type': 'cattle', 'quantity': 10, 'breed': 'Boran'}
+    return LivestockUnit.objects.create(field=field, **{**values, **extra})
+
+
+def make_finance(farm, amount='100.00', **extra):
+    from analytics.models import FarmFinance
+    from django.utils import timezone
+    values = {'type': 'expense', 'category': 'feed', 'amount': Decimal(amount), 'date': timezone.now()}
+    return FarmFinance.objects.create(farm=farm, **{**values, **extra})
+
+
+def make_crop_expense(crop, amount='50.00', **extra):
+    from crops.models import CropExpense
+    values = {'amount': Decimal(amount), 'category': 'seed', 'incurred_on': date(2026, 3, 1)}
+    return CropExpense.objects.create(crop=crop, **{**values, **extra})
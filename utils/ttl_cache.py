@@ -0,0 +1,84 @@
+# utils/ttl_cache.py
+from collections import OrderedDict
+import asyncio
+import threading
+import time
+
+
+class TTLCache:
+    """
+    Bounded in-process LRU whose entries expire after `ttl` seconds.
+
+    Lookups never leave the process, so they are cheap enough to call from
+    the event loop. Entries are not shared between workers: whatever a
+    cached value depends on must be invalidated locally and tolerate being
+    stale for up to `ttl` seconds elsewhere.
+    """
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._loading = {}
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        """Store `value`; `ttl` may shorten (never extend) the cache's own lifetime for this entry."""
+        if self.maxsize <= 0:
+            return
+        lifetime = self.ttl if ttl is None else min(ttl, self.ttl)
+        if lifetime <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + lifetime, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    async def get_or_load(self, key, load):
+        """
+        Return the cached value or await `load()` for it. Concurrent misses on
+        one key share a single load, so a burst of requests for the same key
+        costs one round trip. A None result is returned but not cached.
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+        pending = self._loading.get(key)
+        if pending is None:
+            pending = self._loading[key] = asyncio.ensure_future(self._load(key, load))
+        return await asyncio.shield(pending)
+
+    async def _load(self, key, load):
+        # The value is stored before the load is forgotten, so a miss arriving
+        # in between finds one or the other and never starts a second load.
+        try:
+            value = await load()
+            if value is not None:
+                self.set(key, value)
+            return value
+        finally:
+            self._loading.pop(key, None)
+
+    def pop(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
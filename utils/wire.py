@@ -0,0 +1,127 @@
+# utils/wire.py
+from django.conf import settings
+import json
+import msgpack
+import orjson
+import zlib
+
+# WebSocket encodings. A client that offers none of SUBPROTOCOLS keeps the
+# original JSON text frames (LEGACY). The compact protocols use binary frames
+# both ways: one flag byte, then the MessagePack or UTF-8 JSON body. With
+# FLAG_DEFLATE set the body is raw DEFLATE (RFC 1951, as permessage-deflate
+# uses); frames of WS_COMPRESS_MIN_BYTES or more are sent that way when it
+# makes them smaller.
+LEGACY = 'legacy'
+MSGPACK = 'agricore.msgpack'
+JSON = 'agricore.json'
+SUBPROTOCOLS = (MSGPACK, JSON)
+PROTOCOLS = (LEGACY,) + SUBPROTOCOLS
+
+FLAG_DEFLATE = 0x01
+
+# WebSocket close codes (RFC 6455) for frames decode() refuses.
+INVALID_PAYLOAD = 1007
+MESSAGE_TOO_BIG = 1009
+
+
+class FrameError(ValueError):
+    """A client frame that cannot be decoded; `code` is the close code to answer it with."""
+
+    def __init__(self, message, code=INVALID_PAYLOAD):
+        super().__init__(message)
+        self.code = code
+
+
+def choose_protocol(scope):
+    """The first of the client's offered subprotocols that is supported, else LEGACY."""
+    for protocol in scope.get('subprotocols') or ():
+        if protocol in SUBPROTOCOLS:
+            return protocol
+    return LEGACY
+
+
+def _frame(body):
+    threshold = settings.WS_COMPRESS_MIN_BYTES
+    if threshold and len(body) >= threshold:
+        compressor = zlib.compressobj(wbits=-15)
+        deflated = compressor.compress(body) + compressor.flush()
+        if len(deflated) < len(body):
+            return bytes([FLAG_DEFLATE]) + deflated
+    return b'\x00' + body
+
+
+def encode(protocol, payload, compact=None):
+    """One frame of `payload` in `protocol`. The compact protocols send `compact` instead when given."""
+    if protocol == LEGACY:
+        return json.dumps(payload)
+    body = payload if compact is None else compact
+    if protocol == MSGPACK:
+        return _frame(msgpack.packb(body))
+    return _frame(orjson.dumps(body))
+
+
+def encode_frames(payload, compact=None, protocols=PROTOCOLS):
+    """
+    The frame for each of `protocols`, keyed by protocol. Group events carry
+    this so the sender serializes once and each recipient sends its frame
+    as is.
+    """
+    return {protocol: encode(protocol, payload, compact) for protocol in protocols}
+
+
+def decode(protocol, text_data=None, bytes_data=None):
+    """
+    The payload of one client frame. Raises FrameError for an empty frame or
+    one that is, or inflates to, more than WS_MAX_FRAME_BYTES; inflating
+    stops at the limit, so a small deflate bomb costs no more than that.
+    """
+    limit = settings.WS_MAX_FRAME_BYTES
+    if bytes_data is None:
+        if len(text_data) > limit:
+            raise FrameError(f'Frame is over {limit} bytes', MESSAGE_TOO_BIG)
+        return json.loads(text_data)
+    if not bytes_data:
+        raise FrameError('Empty frame')
+    body = bytes_data[1:]
+    if bytes_data[0] & FLAG_DEFLATE:
+        decompressor = zlib.decompressobj(-15)
+        try:
+            body = decompressor.decompress(body, limit)
+        except zlib.error as e:
+            raise FrameError(f'Bad deflate body: {e}')
+        if decompressor.unconsumed_tail:
+            raise FrameError(f'Frame inflates to over {limit} bytes', MESSAGE_TOO_BIG)
+    elif len(body) > limit:
+        raise FrameError(f'Frame is over {limit} bytes', MESSAGE_TOO_BIG)
+    if protocol == MSGPACK:
+        return msgpack.unpackb(body)
+    return orjson.loads(body)
+
+
+class WireProtocolMixin:
+    """
+    Negotiates the encoding for an AsyncWebsocketConsumer when it accepts.
+
+    Send events prepared with encode_frames() through send_frames(), and
+    anything addressed to this socket alone through send_payload().
+    """
+    protocol = LEGACY
+
+    async def accept(self, subprotocol=None, headers=None):
+        self.protocol = choose_protocol(self.scope)
+        if self.protocol != LEGACY:
+            subprotocol = self.protocol
+        await super().accept(subprotocol, headers)
+
+    async def send_frames(self, frames):
+        frame = frames[self.protocol]
+        if self.protocol == LEGACY:
+            await self.send(text_data=frame)
+        else:
+            await self.send(bytes_data=frame)
+
+    async def send_payload(self, payload, compact=None):
+        await self.send_frames(encode_frames(payload, compact, protocols=(self.protocol,)))
+
+    def decode(self, text_data=None, bytes_data=None):
+        return decode(self.protocol, text_data, bytes_data)